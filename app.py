@@ -1,51 +1,181 @@
 import logging
-import sqlite3
+import os
 import threading
-import time
-import base64
-import json
+import asyncio
 import hmac
-import hashlib
-import requests
+import json
+import signal
+import time
+import http_client
+import metrics
+from balance_aggregator import fetch_portfolio, format_portfolio
+from exchange_adapters import MARKET_LABELS, create_adapter
+from exchange_policy import error_result, request_policy
+from flow_state import flow_state
+from key_vault import key_vault
+from kline_store import kline_store
+from market_cache import market_cache
+from logging_setup import setup_logging
+from market_stream import market_stream
+from order_book import book_from_depth
+from position_book import position_book, ticker_price
+from rate_limiter import rate_limiter
+from signing import SigningKey
+from symbol_registry import symbol_registry
+from trader_cache import trader_cache
+from update_dispatcher import UserUpdateProcessor
+from update_queue import UpdateQueue
+from user_api_store import user_store
+from user_stream import user_stream
 from flask import Flask, request
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+from telegram.request import HTTPXRequest
 
 # 로깅 설정
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Flask 앱 설정
 app = Flask(__name__)
 
-# 전역 변수
-PYXTLIB_AVAILABLE = False
-try:
-    from pyxt import XTClient
-    PYXTLIB_AVAILABLE = True
-except ImportError:
-    logger.warning("pyxt 라이브러리가 설치되지 않았습니다. 기본 HTTP 요청을 사용합니다.")
-
-# SigningKey 전역 변수로 초기화
-try:
-    from nacl.signing import SigningKey
-except ImportError:
-    SigningKey = None
+if SigningKey is None:
     logger.error("pynacl 패키지가 필요합니다. 설치: pip install pynacl")
 
+SUPPORTED_EXCHANGES = ('xt', 'backpack')
+
+# 텔레그램 API 주소 (로컬 가짜 서버로 부하 테스트할 때 변경, 거래소 주소는 exchange_adapters.py)
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+QUOTE_TIMEOUT = 2.0
+
+# 일괄 주문 설정
+ORDER_CONCURRENCY = int(os.getenv('ORDER_CONCURRENCY', '5'))
+ORDER_SIDES = ('buy', 'sell', 'long', 'short')
+# (스팟 여부, 매수 여부) → 결과 메시지에 쓰는 주문 이름
+ORDER_ACTIONS = {
+    (False, True): '롱 포지션 오픈',
+    (False, False): '숏 포지션 오픈',
+    (True, True): '스팟 매수',
+    (True, False): '스팟 매도',
+}
+
+# 웹훅 설정
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+
+# 동시에 처리할 업데이트 수 (같은 사용자의 업데이트는 항상 순서대로 처리)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '32'))
+
+telegram_app = None
+
+# 지표 (값은 /metrics 요청 때 계산)
+metrics.gauge('market_cache_hit_rate', '시세 캐시 적중률', lambda: market_cache.stats()['hit_rate'])
+metrics.gauge('trader_cache_size', '트레이더 캐시 항목 수', lambda: trader_cache.stats()['size'])
+metrics.gauge('trader_cache_hit_rate', '트레이더 캐시 적중률', lambda: _hit_rate(trader_cache.stats()))
+metrics.gauge('rate_limit_ip_remaining', '거래소별 남은 IP 요청 예산', lambda: rate_limiter.stats()['ip_remaining'], ('exchange',))
+metrics.gauge('rate_limit_queued', '거래소별 예산 대기 중인 요청 수', lambda: rate_limiter.stats()['queued'], ('exchange',))
+metrics.gauge('circuit_open', '호스트별 서킷 상태 (1=열림)',
+              lambda: {h: int(s != 'closed') for h, s in request_policy.stats()['circuits'].items()}, ('host',))
+metrics.gauge('position_book_positions', '메모리에 올라온 포지션 수', lambda: position_book.stats()['positions'])
+metrics.gauge('market_stream_symbols', '시세 스트림으로 구독 중인 심볼 수', lambda: market_stream.stats()['symbols'])
+metrics.gauge('user_stream_accounts', '개인 스트림을 유지 중인 계정 수', lambda: user_stream.stats()['accounts'])
+metrics.gauge('user_stream_live', '개인 스트림이 연결된 계정 수', lambda: user_stream.stats()['live'])
+metrics.gauge('key_cache_hit_rate', '복호화된 API 시크릿 캐시 적중률', lambda: key_vault.stats()['hit_rate'])
+metrics.gauge('flow_state_dirty', 'DB에 아직 기록되지 않은 흐름 상태·레버리지 변경 수', lambda: flow_state.stats()['dirty'])
+metrics.gauge('kline_series', '메모리에 올라온 캔들 시리즈 수', lambda: kline_store.stats()['series'])
+
+# 1분봉 스트림 캔들을 캔들 저장소로 전달 (지표를 조회한 시리즈만 갱신)
+market_stream.candle_sink = kline_store.add_stream_candle
+
+
+def _hit_rate(stats):
+    total = stats['hits'] + stats['misses']
+    return stats['hits'] / total if total else 0.0
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """텔레그램 Bot API 요청 시간 기록"""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+            return status, payload
+        finally:
+            metrics.TELEGRAM_LATENCY.observe(time.perf_counter() - started, url.rsplit('/', 1)[-1], status)
+
 class TelegramApp:
     def __init__(self, bot_token):
         self.bot_token = bot_token
-        self.bot = None
-        self.app = Application.builder().token(bot_token).build()
+        self.app = (
+            Application.builder()
+            .token(bot_token)
+            .base_url(TELEGRAM_BASE_URL)
+            .request(InstrumentedRequest(connection_pool_size=256))
+            .concurrent_updates(UserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+            .persistence(flow_state)
+            .post_init(self.on_startup)
+            .post_shutdown(self.on_shutdown)
+            .build()
+        )
+        self.bot = self.app.bot
+        self.updates = UpdateQueue(self.app, max_size=WEBHOOK_QUEUE_SIZE)
         self.setup_handlers()
+        processor = self.app.update_processor
+        metrics.gauge('update_queue_depth', '처리 대기·진행 중인 업데이트 수', processor.queue_depth)
+        metrics.gauge('update_active_users', '업데이트 처리 중인 사용자 수', lambda: processor.stats()['active_users'])
+        metrics.gauge('webhook_queue_depth', '웹훅 큐에 쌓였거나 처리 중인 업데이트 수', self.updates.depth)
+
+    def run_polling(self, port):
+        """롱 폴링 모드로 실행 (/health, /metrics용 Flask는 별도 스레드)"""
+        threading.Thread(target=run_flask, args=(port,), daemon=True).start()
+        self.app.run_polling(allowed_updates=Update.ALL_TYPES)
+
+    def run_webhook(self, url, secret, port):
+        """웹훅 모드로 실행 (Flask가 업데이트를 받아 큐에 넣고 디스패처가 처리 태스크 실행)"""
+        asyncio.run(self._serve_webhook(url, secret, port))
+
+    async def _serve_webhook(self, url, secret, port):
+        await self.app.initialize()
+        await self.on_startup(self.app)
+        await self.app.start()
+        await self.updates.start()
+        await self.bot.set_webhook(url=url, secret_token=secret or None, allowed_updates=Update.ALL_TYPES)
+        threading.Thread(target=run_flask, args=(port,), daemon=True).start()
+        logger.info(f"웹훅 모드 시작: {url} (포트 {port})")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            await self.updates.stop()
+            await self.app.stop()
+            await self.app.shutdown()
+            await self.on_shutdown(self.app)
+
+    async def on_startup(self, application):
+        """봇 시작 시 심볼 정보 로드, 흐름 상태 기록, API 시크릿 재암호화, 시세·개인 스트림 활성화"""
+        symbol_registry.start()
+        flow_state.start()
+        key_vault.start(user_store)
+        if os.getenv('MARKET_STREAM_ENABLED', '1') == '1':
+            market_stream.start()
+        if os.getenv('USER_STREAM_ENABLED', '1') == '1':
+            user_stream.start()
+
+    async def on_shutdown(self, application):
+        """봇 종료 시 심볼 정보 갱신, 흐름 상태 기록, 시세·개인 스트림과 공용 HTTP 클라이언트 정리"""
+        await symbol_registry.stop()
+        await flow_state.stop()
+        await key_vault.stop()
+        await market_stream.stop()
+        await user_stream.stop()
+        await http_client.close_client()
 
     def setup_handlers(self):
         """핸들러 설정"""
@@ -53,6 +183,7 @@ class TelegramApp:
         self.app.add_handler(CommandHandler("setapi", self.set_api))
         self.app.add_handler(CommandHandler("test", self.test_api))
         self.app.add_handler(CommandHandler("trade", self.handle_trade_command))
+        self.app.add_handler(CommandHandler("indicators", self.handle_indicators_command))
         self.app.add_handler(CallbackQueryHandler(self.handle_callback))
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
 
@@ -78,7 +209,7 @@ class TelegramApp:
             return
         exchange, api_key, api_secret = args[0].lower(), args[1], ' '.join(args[2:])
         try:
-            save_user_api_keys(user_id, exchange, api_key, api_secret)
+            await save_user_api_keys(user_id, exchange, api_key, api_secret)
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=f"✅ {exchange.upper()} API 키가 설정되었습니다.\n"
@@ -98,8 +229,8 @@ class TelegramApp:
         """API 연결 테스트 명령어"""
         chat_id = update.effective_chat.id
         user_id = update.effective_user.id
-        user_keys = get_user_api_keys(user_id)
-        if not user_keys:
+        traders = {exchange: await get_user_trader(user_id, exchange) for exchange in SUPPORTED_EXCHANGES}
+        if not any(traders.values()):
             await context.bot.send_message(
                 chat_id=chat_id,
                 text="❌ API 키가 설정되지 않았습니다. 먼저 /setapi 명령어로 설정하세요.",
@@ -107,12 +238,9 @@ class TelegramApp:
             )
             return
         text = "🔍 **API 연결 테스트 결과**\n\n"
-        for exchange in ['xt', 'backpack']:
-            if user_keys.get(f'{exchange}_api_key'):
-                api_key = user_keys.get(f'{exchange}_api_key')
-                api_secret = user_keys.get(f'{exchange}_api_secret') or user_keys.get(f'{exchange}_private_key')
-                trader = UnifiedFuturesTrader(exchange, api_key=api_key, api_secret=api_secret)
-                result = trader.test_api_connection()
+        for exchange, trader in traders.items():
+            if trader:
+                result = await trader.test_api_connection()
                 text += f"**{exchange.upper()}**: {result['message']}\n"
         await context.bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
 
@@ -121,7 +249,7 @@ class TelegramApp:
         query = update.callback_query
         data = query.data
         chat_id = query.message.chat_id
-        user_id = query.effective_user.id
+        user_id = update.effective_user.id
         if data == "main_menu":
             await show_main_menu(self, chat_id)
         elif data == "api_management":
@@ -131,7 +259,7 @@ class TelegramApp:
         elif data.startswith("balance_"):
             await handle_balance_callback(self, chat_id, user_id, data, query)
         elif data.startswith("trade_") or data.startswith("order_type_") or data.startswith("leverage_") or data.startswith("futures_"):
-            await handle_trade_callback(self, chat_id, user_id, data, query)
+            await handle_trade_callback(self, chat_id, user_id, data, query, context)
         elif data == "position_menu":
             await show_position_menu(self, chat_id, user_id, query)
         elif data == "position_list":
@@ -146,6 +274,17 @@ class TelegramApp:
             await show_help(self, chat_id, query)
         await query.answer()
 
+    async def handle_trade_command(self, update, context):
+        """거래 명령어"""
+        chat_id = update.effective_chat.id
+        user_id = update.effective_user.id
+        await handle_trade_command(self, chat_id, user_id, update.message.text, context)
+
+    async def handle_indicators_command(self, update, context):
+        """지표 조회 명령어"""
+        chat_id = update.effective_chat.id
+        await handle_indicators_command(self, chat_id, update.message.text)
+
     async def handle_text(self, update, context):
         """텍스트 메시지 처리"""
         chat_id = update.effective_chat.id
@@ -166,10 +305,6 @@ class UnifiedFuturesTrader:
     def __init__(self, exchange, **kwargs):
         self.exchange = exchange.lower()
         self.is_trading = True
-        self.total_profit = 0.0
-        self.lock = threading.Lock()
-        self.active_orders = {}
-        self.positions = {}
         self.risk_settings = {
             'max_loss': 100,
             'stop_loss_percent': 5,
@@ -177,571 +312,279 @@ class UnifiedFuturesTrader:
             'max_position_size': 1000,
             'max_leverage': 10
         }
-        
-        if self.exchange == 'xt':
-            self.api_key = kwargs.get('api_key')
-            self.api_secret = kwargs.get('api_secret')
-            self.base_url = "https://fapi.xt.com"
-            self.spot_base_url = "https://sapi.xt.com"
-        elif self.exchange == 'backpack':
-            self.api_key = kwargs.get('api_key')
-            self.private_key = kwargs.get('private_key') or kwargs.get('api_secret')
-            self.base_url = "https://api.backpack.exchange/api/v1"
-            self.signing_key = None
-        else:
-            raise ValueError('지원하지 않는 거래소입니다: xt, backpack만 지원')
+        self.api_key = kwargs.get('api_key')
+        # 거래소별 요청 구성·서명·응답 해석은 어댑터가 담당 (생성 시 한 번만 선택)
+        self.adapter = create_adapter(self.exchange, self.api_key, kwargs.get('private_key') or kwargs.get('api_secret'))
 
-    def test_api_connection(self):
+    async def test_api_connection(self):
         """API 연결 테스트"""
         try:
-            if self.exchange == 'xt':
-                url = f"{self.base_url}/v4/public/time"
-                response = requests.get(url)
-                if response.status_code == 200:
-                    return {'status': 'success', 'message': 'XT API 연결 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT API 연결 실패: {response.status_code}'}
-            elif self.exchange == 'backpack':
-                try:
-                    global SigningKey
-                    if SigningKey is None:
-                        from nacl.signing import SigningKey
-                    if self.private_key:
-                        self.signing_key = SigningKey(base64.b64decode(self.private_key))
-                    url = "https://api.backpack.exchange/api/v1/account"
-                    headers = self._get_headers_backpack("accountQuery")
-                    response = requests.get(url, headers=headers)
-                    logger.debug(f"Backpack API test response: {response.status_code} - {response.text}")
-                    if response.status_code == 200:
-                        return {'status': 'success', 'message': 'Backpack API 연결 성공'}
-                    else:
-                        return {'status': 'error', 'message': f'Backpack API 연결 실패: {response.status_code} - {response.text}'}
-                except ImportError:
-                    return {'status': 'error', 'message': 'pynacl 패키지가 필요합니다. pip install pynacl로 설치해주세요.'}
-                except Exception as e:
-                    return {'status': 'error', 'message': f'Backpack API 연결 테스트 오류: {str(e)}'}
+            return await self.adapter.test_connection()
         except Exception as e:
-            return {'status': 'error', 'message': f'API 연결 테스트 오류: {str(e)}'}
-
-    def _get_headers_backpack(self, instruction, params=None):
-        from nacl.signing import SigningKey
-        from nacl.encoding import RawEncoder
-        import base64
-        import time
-        import json
-
-        for attempt in range(3):
-            if self.signing_key is None and self.private_key:
-                try:
-                    self.signing_key = SigningKey(base64.b64decode(self.private_key), encoder=RawEncoder)
-                except Exception as e:
-                    logger.error(f"Backpack signing key initialization failed: {e}")
-                    raise ValueError(f"Invalid private key: {e}")
-
-            timestamp = int(time.time() * 1000)
-            window = 5000
-            params = params or {}
-            items = sorted(params.items(), key=lambda x: x[0])
-            parts = []
-            for k, v in items:
-                if isinstance(v, (int, float)):
-                    v = str(round(float(v), 8))
-                parts.append(f"{k}={v}")
-
-            sign_str = f"instruction={instruction}"
-            if parts:
-                sign_str += "&" + "&".join(parts)
-            sign_str += f"&timestamp={timestamp}&window={window}"
-
-            logger.debug(f"Backpack signature string (attempt {attempt + 1}): {sign_str}")
-            logger.debug(f"Backpack request params: {params}")
-
-            try:
-                sig = self.signing_key.sign(sign_str.encode('utf-8')).signature
-                signature_b64 = base64.b64encode(sig).decode('utf-8')
-                headers = {
-                    "X-API-Key": self.api_key,
-                    "X-Signature": signature_b64,
-                    "X-Timestamp": str(timestamp),
-                    "X-Window": str(window),
-                    "Content-Type": "application/json; charset=utf-8"
-                }
-                logger.debug(f"Backpack headers: {headers}")
-                return headers
-            except Exception as e:
-                logger.error(f"Backpack signature creation failed (attempt {attempt + 1}): {e}")
-                if attempt == 2:
-                    raise ValueError(f"Signature creation error after 3 attempts: {e}")
-                time.sleep(1)
-
-    def _get_headers_xt(self, params=None):
-        """XT API 헤더 생성"""
-        timestamp = str(int(time.time() * 1000))
-        params = params or {}
-        sorted_params = sorted(params.items())
-        query_string = '&'.join([f"{k}={str(v)}" for k, v in sorted_params])
-        sign_string = f"access_key={self.api_key}&{query_string}&timestamp={timestamp}" if query_string else f"access_key={self.api_key}&timestamp={timestamp}"
-        signature = hmac.new(
-            self.api_secret.encode('utf-8'),
-            sign_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        headers = {
-            "access_key": self.api_key,
-            "signature": signature,
-            "timestamp": timestamp,
-            "Content-Type": "application/json"
-        }
-        logger.debug(f"XT sign string: {sign_string}")
-        logger.debug(f"XT headers: {headers}")
-        return headers
+            return error_result(f'API 연결 테스트 오류: {str(e)}', e)
 
-    def open_long_position(self, symbol, size, leverage=1, order_type='market', market_type='futures'):
-        """롱 포지션 오픈"""
+    async def _submit(self, order):
+        """주문 하나 정규화 후 제출"""
+        action = None
         try:
-            if self.exchange == 'xt':
-                url = f"{self.base_url}/v4/order"
-                params = {
-                    'symbol': symbol,
-                    'side': 'buy',
-                    'type': order_type,
-                    'quantity': str(size)
-                }
-                if market_type == 'futures' and leverage > 1:
-                    params['leverage'] = leverage
-                headers = self._get_headers_xt(params)
-                response = requests.post(url, headers=headers, json=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    order_id = data.get('orderId', 'unknown')
-                    return {'status': 'success', 'order_id': order_id, 'message': 'XT 롱 포지션 오픈 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT 롱 포지션 오픈 실패: {response.status_code} - {response.text}'}
-            elif self.exchange == 'backpack':
-                url = f"{self.base_url}/order"
-                backpack_order_type = 'Market' if order_type == 'market' else 'Limit'
-                backpack_symbol = f"{symbol}_USDC_PERP" if market_type == 'futures' else f"{symbol}_USDC"
-                body = {
-                    "symbol": backpack_symbol,
-                    "side": "Bid",
-                    "orderType": backpack_order_type,
-                    "quantity": str(round(float(size), 8))
-                }
-                if backpack_order_type == "Limit":
-                    body["timeInForce"] = "GTC"
-                if market_type == 'futures' and leverage > 1:
-                    body['leverage'] = str(leverage)
-                headers = self._get_headers_backpack("orderExecute", body)
-                logger.debug(f"Backpack request body: {body}")
-                response = requests.post(url, headers=headers, json=body)
-                logger.debug(f"Backpack response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'order_id': data.get('orderId'), 'message': 'Backpack 롱 포지션 오픈 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 롱 포지션 오픈 실패: {response.status_code} - {response.text}'}
+            spec = self._order_spec(order)
+            if spec['reduce_only']:
+                action = '포지션 종료'
+            else:
+                action = ORDER_ACTIONS[(spec['market_type'] == 'spot', spec['side'] in ('buy', 'long'))]
+            return await self.adapter.place_order(spec, action)
         except Exception as e:
-            logger.error(f"Long position error: {str(e)}")
-            return {'status': 'error', 'message': f'롱 포지션 오픈 오류: {str(e)}'}
+            action = action or '주문'
+            logger.error(f"Order error ({action}): {str(e)}")
+            return error_result(f'{action} 오류: {str(e)}', e)
+
+    async def open_long_position(self, symbol, size, leverage=1, order_type='market', market_type='futures'):
+        """롱 포지션 오픈"""
+        return await self._submit({'symbol': symbol, 'side': 'long', 'size': size, 'order_type': order_type, 'leverage': leverage, 'market_type': market_type})
 
-    def open_short_position(self, symbol, size, leverage=1, order_type='market', market_type='futures'):
+    async def open_short_position(self, symbol, size, leverage=1, order_type='market', market_type='futures'):
         """숏 포지션 오픈"""
+        return await self._submit({'symbol': symbol, 'side': 'short', 'size': size, 'order_type': order_type, 'leverage': leverage, 'market_type': market_type})
+
+    async def get_position(self, symbol, market_type='futures'):
+        """거래소 포지션 조회 (positions: {'long': 수량, 'short': 수량})"""
         try:
-            if self.exchange == 'xt':
-                url = f"{self.base_url}/v4/order"
-                params = {
-                    'symbol': symbol,
-                    'side': 'sell',
-                    'type': order_type,
-                    'quantity': str(size)
-                }
-                if market_type == 'futures' and leverage > 1:
-                    params['leverage'] = leverage
-                headers = self._get_headers_xt(params)
-                response = requests.post(url, headers=headers, json=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    order_id = data.get('orderId', 'unknown')
-                    return {'status': 'success', 'order_id': order_id, 'message': 'XT 숏 포지션 오픈 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT 숏 포지션 오픈 실패: {response.status_code} - {response.text}'}
-            elif self.exchange == 'backpack':
-                url = f"{self.base_url}/order"
-                backpack_order_type = 'Market' if order_type == 'market' else 'Limit'
-                backpack_symbol = f"{symbol}_USDC_PERP" if market_type == 'futures' else f"{symbol}_USDC"
-                body = {
-                    "symbol": backpack_symbol,
-                    "side": "Ask",
-                    "orderType": backpack_order_type,
-                    "quantity": str(round(float(size), 8))
-                }
-                if backpack_order_type == "Limit":
-                    body["timeInForce"] = "GTC"
-                if market_type == 'futures' and leverage > 1:
-                    body['leverage'] = str(leverage)
-                headers = self._get_headers_backpack("orderExecute", body)
-                logger.debug(f"Backpack request body: {body}")
-                response = requests.post(url, headers=headers, json=body)
-                logger.debug(f"Backpack response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'order_id': data.get('orderId'), 'message': 'Backpack 숏 포지션 오픈 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 숏 포지션 오픈 실패: {response.status_code} - {response.text}'}
+            return await self.adapter.fetch_position(market_type, symbol)
         except Exception as e:
-            logger.error(f"Short position error: {str(e)}")
-            return {'status': 'error', 'message': f'숏 포지션 오픈 오류: {str(e)}'}
+            return error_result(f'포지션 조회 오류: {str(e)}', e)
+
+    async def close_position(self, symbol, side, size, market_type='futures'):
+        """side(long/short) 포지션을 size만큼 reduce-only 시장가 반대 주문으로 종료"""
+        return await self._submit({'symbol': symbol, 'side': 'short' if side == 'long' else 'long', 'size': size, 'order_type': 'market',
+                                   'leverage': 1, 'market_type': market_type, 'reduce_only': True, 'position_side': side})
 
-    def spot_buy(self, symbol, size, order_type='market', price=None):
+    async def spot_buy(self, symbol, size, order_type='market', price=None):
         """스팟 매수"""
-        try:
-            if self.exchange == 'xt':
-                url = f"{self.base_url}/v4/order"
-                params = {
-                    'symbol': symbol,
-                    'side': 'buy',
-                    'type': order_type,
-                    'quantity': str(size)
-                }
-                if order_type == 'limit' and price:
-                    params['price'] = str(price)
-                headers = self._get_headers_xt(params)
-                response = requests.post(url, headers=headers, json=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    order_id = data.get('orderId', 'unknown')
-                    return {'status': 'success', 'order_id': order_id, 'message': 'XT 스팟 매수 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT 스팟 매수 실패: {response.status_code} - {response.text}'}
-            elif self.exchange == 'backpack':
-                url = f"{self.base_url}/order"
-                backpack_order_type = 'Market' if order_type == 'market' else 'Limit'
-                backpack_symbol = f"{symbol}_USDC"
-                body = {
-                    "symbol": backpack_symbol,
-                    "side": "Bid",
-                    "orderType": backpack_order_type,
-                    "quantity": str(round(float(size), 8))
-                }
-                if order_type == 'limit' and price:
-                    body["price"] = str(round(float(price), 8))
-                    body["timeInForce"] = "GTC"
-                headers = self._get_headers_backpack("orderExecute", body)
-                logger.debug(f"Backpack spot buy request body: {body}")
-                response = requests.post(url, headers=headers, json=body)
-                logger.debug(f"Backpack spot buy response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'order_id': data.get('orderId'), 'message': 'Backpack 스팟 매수 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 스팟 매수 실패: {response.status_code} - {response.text}'}
-        except Exception as e:
-            logger.error(f"Spot buy error: {str(e)}")
-            return {'status': 'error', 'message': f'스팟 매수 오류: {str(e)}'}
+        return await self._submit({'symbol': symbol, 'side': 'buy', 'size': size, 'order_type': order_type, 'price': price, 'market_type': 'spot'})
 
-    def spot_sell(self, symbol, size, order_type='market', price=None):
+    async def spot_sell(self, symbol, size, order_type='market', price=None):
         """스팟 매도"""
-        try:
-            if self.exchange == 'xt':
-                url = f"{self.base_url}/v4/order"
-                params = {
-                    'symbol': symbol,
-                    'side': 'sell',
-                    'type': order_type,
-                    'quantity': str(size)
-                }
-                if order_type == 'limit' and price:
-                    params['price'] = str(price)
-                headers = self._get_headers_xt(params)
-                response = requests.post(url, headers=headers, json=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    order_id = data.get('orderId', 'unknown')
-                    return {'status': 'success', 'order_id': order_id, 'message': 'XT 스팟 매도 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT 스팟 매도 실패: {response.status_code} - {response.text}'}
-            elif self.exchange == 'backpack':
-                url = f"{self.base_url}/order"
-                backpack_order_type = 'Market' if order_type == 'market' else 'Limit'
-                backpack_symbol = f"{symbol}_USDC"
-                body = {
-                    "symbol": backpack_symbol,
-                    "side": "Ask",
-                    "orderType": backpack_order_type,
-                    "quantity": str(round(float(size), 8))
-                }
-                if order_type == 'limit' and price:
-                    body["price"] = str(round(float(price), 8))
-                    body["timeInForce"] = "GTC"
-                headers = self._get_headers_backpack("orderExecute", body)
-                logger.debug(f"Backpack spot sell request body: {body}")
-                response = requests.post(url, headers=headers, json=body)
-                logger.debug(f"Backpack spot sell response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'order_id': data.get('orderId'), 'message': 'Backpack 스팟 매도 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 스팟 매도 실패: {response.status_code} - {response.text}'}
-        except Exception as e:
-            logger.error(f"Spot sell error: {str(e)}")
-            return {'status': 'error', 'message': f'스팟 매도 오류: {str(e)}'}
+        return await self._submit({'symbol': symbol, 'side': 'sell', 'size': size, 'order_type': order_type, 'price': price, 'market_type': 'spot'})
 
-    def get_futures_balance(self):
-        """선물 계좌 잔고 조회"""
-        try:
-            if self.exchange == 'xt':
-                if PYXTLIB_AVAILABLE:
-                    try:
-                        xt_client = XTClient(self.api_key, self.api_secret)
-                        if xt_client.futures is None:
-                            raise Exception("XTClient futures client initialization failed")
-                        balance_result = xt_client.get_futures_balance()
-                        if balance_result.get('status') == 'success':
-                            return {'status': 'success', 'balance': balance_result.get('balance'), 'message': 'XT 선물 잔고 조회 성공'}
-                        else:
-                            raise Exception(f"pyxt error: {balance_result.get('message')}")
-                    except Exception as e:
-                        logger.error(f"pyxt 라이브러리 선물 잔고 조회 실패: {e}")
-                url = f"{self.base_url}/v4/account/futures/balance"
-                headers = self._get_headers_xt()
-                response = requests.get(url, headers=headers)
-                logger.debug(f"XT futures balance response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('rc') == 0:
-                        return {'status': 'success', 'balance': data.get('result', {}), 'message': 'XT 선물 잔고 조회 성공'}
-                    else:
-                        return {'status': 'error', 'message': f'XT 선물 잔고 조회 실패: {data.get("mc", "Unknown error")}'}
-                return {'status': 'error', 'message': f'XT 선물 잔고 조회 실패: {response.status_code} - {response.text}'}
-            elif self.exchange == 'backpack':
-                url = "https://api.backpack.exchange/api/v1/capital"
-                headers = self._get_headers_backpack("balanceQuery")
-                response = requests.get(url, headers=headers)
-                logger.debug(f"Backpack futures balance response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'balance': data, 'message': 'Backpack 잔고 조회 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 잔고 조회 실패: {response.status_code} - {response.text}'}
-        except Exception as e:
-            logger.error(f"Futures balance error: {str(e)}")
-            return {'status': 'error', 'message': f'선물 잔고 조회 오류: {str(e)}'}
+    @staticmethod
+    def _order_spec(order):
+        """주문 dict 정규화 (side: buy/sell은 스팟, long/short는 선물이 기본)"""
+        side = str(order.get('side', '')).lower()
+        if side not in ORDER_SIDES:
+            raise ValueError(f"잘못된 방향: {order.get('side')}")
+        size = float(order['size'])
+        if size <= 0:
+            raise ValueError("수량은 0보다 커야 합니다.")
+        return {
+            'symbol': order['symbol'],
+            'side': side,
+            'size': size,
+            'order_type': order.get('order_type', 'market'),
+            'price': order.get('price'),
+            'leverage': int(order.get('leverage', 1)),
+            'market_type': order.get('market_type') or ('spot' if side in ('buy', 'sell') else 'futures'),
+            'reduce_only': bool(order.get('reduce_only')),
+            'position_side': order.get('position_side'),
+        }
+
+    async def place_orders(self, orders):
+        """여러 주문 제출. 결과는 입력 순서대로 반환
+
+        orders 항목: {'symbol', 'side'(buy/sell/long/short), 'size',
+                     'order_type'(기본 market), 'price', 'leverage', 'market_type'}
+        일괄 주문을 지원하는 거래소(Backpack)는 일괄 주문 엔드포인트를 사용하고,
+        나머지는 동시 요청 수를 제한해 개별 제출합니다.
+        """
+        results = [None] * len(orders)
+        pending = []
+        for i, order in enumerate(orders):
+            try:
+                spec = self._order_spec(order)
+                self.adapter.normalize_order(spec)
+                pending.append((i, spec))
+            except (KeyError, TypeError, ValueError) as e:
+                results[i] = error_result(f'잘못된 주문: {str(e)}', e)
+
+        batch_size = self.adapter.batch_size
+        if batch_size:
+            chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+            chunk_results = await asyncio.gather(*[self.adapter.place_batch([spec for _, spec in chunk]) for chunk in chunks])
+            for chunk, chunk_result in zip(chunks, chunk_results):
+                for (i, _), result in zip(chunk, chunk_result):
+                    results[i] = result
+        else:
+            semaphore = asyncio.Semaphore(ORDER_CONCURRENCY)
+
+            async def submit(i, spec):
+                async with semaphore:
+                    results[i] = await self._submit(spec)
+
+            await asyncio.gather(*[submit(i, spec) for i, spec in pending])
+        return results
+
+    async def get_listen_key(self, market_type):
+        """개인 스트림 listen key 발급 (XT)"""
+        return await self.adapter.get_listen_key(market_type)
+
+    async def get_futures_balance(self):
+        """선물 계좌 잔고 조회 (개인 스트림 잔고 우선, 없으면 REST)"""
+        return await self._get_balance('futures')
+
+    async def get_spot_balance(self):
+        """스팟 계좌 잔고 조회 (개인 스트림 잔고 우선, 없으면 REST)"""
+        return await self._get_balance('spot')
 
-    def get_spot_balance(self):
-        """스팟 계좌 잔고 조회"""
+    async def _get_balance(self, market_type):
+        cached = user_stream.balance(self.exchange, self.api_key, market_type)
+        if cached is not None:
+            return {'status': 'success', 'balance': cached, 'message': f'{self.exchange.upper()} {MARKET_LABELS[market_type]} 잔고 (스트림)'}
+        result = await self._fetch_balance(market_type)
+        if result.get('status') == 'success':
+            user_stream.store_balance(self.exchange, self.api_key, market_type, result.get('balance'))
+        return result
+
+    async def _fetch_balance(self, market_type):
+        """계좌 잔고 조회"""
         try:
-            if self.exchange == 'xt':
-                if PYXTLIB_AVAILABLE:
-                    try:
-                        xt_client = XTClient(self.api_key, self.api_secret)
-                        if xt_client.spot is None:
-                            raise Exception("XTClient spot client initialization failed")
-                        balance_result = xt_client.get_spot_balance()
-                        if balance_result.get('status') == 'success':
-                            return {'status': 'success', 'balance': balance_result.get('balance'), 'message': 'XT 스팟 잔고 조회 성공'}
-                        else:
-                            raise Exception(f"pyxt error: {balance_result.get('message')}")
-                    except Exception as e:
-                        logger.error(f"pyxt 라이브러리 스팟 잔고 조회 실패: {e}")
-                url = f"{self.spot_base_url}/v4/account/spot/balance"
-                headers = self._get_headers_xt()
-                response = requests.get(url, headers=headers)
-                logger.debug(f"XT spot balance response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('rc') == 0:
-                        return {'status': 'success', 'balance': data.get('result', {}), 'message': 'XT 스팟 잔고 조회 성공'}
-                    else:
-                        return {'status': 'error', 'message': f'XT 스팟 잔고 조회 실패: {data.get("mc", "Unknown error")}'}
-                return {'status': 'error', 'message': f'XT 스팟 잔고 조회 실패: {response.status_code} - {response.text}'}
-            elif self.exchange == 'backpack':
-                url = "https://api.backpack.exchange/api/v1/capital"
-                headers = self._get_headers_backpack("balanceQuery")
-                response = requests.get(url, headers=headers)
-                logger.debug(f"Backpack spot balance response: {response.status_code} - {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'balance': data, 'message': 'Backpack 스팟 잔고 조회 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 스팟 잔고 조회 실패: {response.status_code} - {response.text}'}
+            return await self.adapter.fetch_balance(market_type)
         except Exception as e:
-            logger.error(f"Spot balance error: {str(e)}")
-            return {'status': 'error', 'message': f'스팟 잔고 조회 오류: {str(e)}'}
+            logger.error(f"{market_type.capitalize()} balance error: {str(e)}")
+            return error_result(f'{MARKET_LABELS[market_type]} 잔고 조회 오류: {str(e)}', e)
+
+    async def get_order_book(self, symbol, market_type='futures'):
+        """호가창 조회 (스트림 호가 우선, 없으면 REST 스냅샷)"""
+        book = market_stream.order_book(self.exchange, market_type, symbol)
+        if book is not None:
+            return book
+        result = await self._get_market_data(market_type, symbol, 'depth')
+        if result.get('status') != 'success':
+            return None
+        return book_from_depth(result.get('data'), symbol)
+
+    async def quote_market_order(self, symbol, side, size, market_type='futures'):
+        """시장가 주문 예상 체결 정보 (side: 'buy'/'sell')"""
+        book = await self.get_order_book(symbol, market_type)
+        if book is None:
+            return None
+        return book.vwap_for_size(side, float(size))
+
+    async def get_market_data(self, symbol, data_type='ticker'):
+        """시장 데이터 조회 (스트림 데이터 우선, 없으면 공용 캐시 경유 REST)"""
+        return await self._get_market_data('futures', symbol, data_type)
+
+    async def get_spot_market_data(self, symbol, data_type='ticker'):
+        """스팟 시장 데이터 조회 (스트림 데이터 우선, 없으면 공용 캐시 경유 REST)"""
+        return await self._get_market_data('spot', symbol, data_type)
 
-    def get_market_data(self, symbol, data_type='ticker'):
+    async def _get_market_data(self, market_type, symbol, data_type):
+        streamed = market_stream.snapshot(self.exchange, market_type, symbol, data_type)
+        if streamed is not None:
+            prefix = '' if market_type == 'futures' else '스팟 '
+            return {'status': 'success', 'data': streamed, 'message': f'{self.exchange.upper()} {prefix}{data_type} 스트림 데이터'}
+        market_stream.ensure_subscribed(self.exchange, market_type, symbol)
+        key = (self.exchange, market_type, symbol, data_type)
+        return await market_cache.get_or_fetch(key, lambda: self._fetch_market_data(market_type, symbol, data_type))
+
+    async def _fetch_market_data(self, market_type, symbol, data_type):
         """시장 데이터 조회"""
         try:
-            if self.exchange == 'xt':
-                if data_type == 'ticker':
-                    url = f"{self.base_url}/v4/public/ticker/24hr"
-                    if symbol:
-                        url += f"?symbol={symbol}"
-                    response = requests.get(url)
-                elif data_type == 'depth':
-                    url = f"{self.base_url}/v4/public/depth"
-                    params = {'symbol': symbol, 'limit': 10}
-                    response = requests.get(url, params=params)
-                elif data_type == 'kline':
-                    url = f"{self.base_url}/v4/public/kline"
-                    params = {'symbol': symbol, 'interval': '1m', 'limit': 10}
-                    response = requests.get(url, params=params)
-                else:
-                    return {'status': 'error', 'message': f'지원하지 않는 데이터 타입: {data_type}'}
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'data': data.get('result', {}), 'message': f'XT {data_type} 데이터 조회 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT {data_type} 데이터 조회 실패: {response.status_code}'}
-            elif self.exchange == 'backpack':
-                if data_type == 'ticker':
-                    url = f"{self.base_url}/tickers"
-                    if symbol:
-                        url += f"?symbol={symbol}_USDC_PERP"
-                    response = requests.get(url)
-                elif data_type == 'depth':
-                    url = f"{self.base_url}/depth"
-                    params = {'symbol': f"{symbol}_USDC_PERP", 'limit': 10}
-                    response = requests.get(url, params=params)
-                elif data_type == 'kline':
-                    url = f"{self.base_url}/klines"
-                    params = {'symbol': f"{symbol}_USDC_PERP", 'interval': '1m', 'limit': 10}
-                    response = requests.get(url, params=params)
-                else:
-                    return {'status': 'error', 'message': f'지원하지 않는 데이터 타입: {data_type}'}
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'data': data, 'message': f'Backpack {data_type} 데이터 조회 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack {data_type} 데이터 조회 실패: {response.status_code}'}
+            return await self.adapter.fetch_market_data(market_type, symbol, data_type)
         except Exception as e:
             logger.error(f"Market data error: {str(e)}")
-            return {'status': 'error', 'message': f'시장 데이터 조회 오류: {str(e)}'}
-
-    def get_spot_market_data(self, symbol, data_type='ticker'):
-        """스팟 시장 데이터 조회"""
-        try:
-            if self.exchange == 'xt':
-                if data_type == 'ticker':
-                    url = f"{self.spot_base_url}/v4/public/ticker/24hr"
-                    if symbol:
-                        url += f"?symbol={symbol}"
-                    response = requests.get(url)
-                elif data_type == 'depth':
-                    url = f"{self.spot_base_url}/v4/public/depth"
-                    params = {'symbol': symbol, 'limit': 10}
-                    response = requests.get(url, params=params)
-                elif data_type == 'kline':
-                    url = f"{self.spot_base_url}/v4/public/kline"
-                    params = {'symbol': symbol, 'interval': '1m', 'limit': 10}
-                    response = requests.get(url, params=params)
-                else:
-                    return {'status': 'error', 'message': f'지원하지 않는 데이터 타입: {data_type}'}
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'data': data.get('result', {}), 'message': f'XT 스팟 {data_type} 데이터 조회 성공'}
-                else:
-                    return {'status': 'error', 'message': f'XT 스팟 {data_type} 데이터 조회 실패: {response.status_code}'}
-            elif self.exchange == 'backpack':
-                if data_type == 'ticker':
-                    url = f"{self.base_url}/tickers"
-                    if symbol:
-                        url += f"?symbol={symbol}_USDC"
-                    response = requests.get(url)
-                elif data_type == 'depth':
-                    url = f"{self.base_url}/depth"
-                    params = {'symbol': f"{symbol}_USDC", 'limit': 10}
-                    response = requests.get(url, params=params)
-                elif data_type == 'kline':
-                    url = f"{self.base_url}/klines"
-                    params = {'symbol': f"{symbol}_USDC", 'interval': '1m', 'limit': 10}
-                    response = requests.get(url, params=params)
-                else:
-                    return {'status': 'error', 'message': f'지원하지 않는 데이터 타입: {data_type}'}
-                if response.status_code == 200:
-                    data = response.json()
-                    return {'status': 'success', 'data': data, 'message': f'Backpack 스팟 {data_type} 데이터 조회 성공'}
-                else:
-                    return {'status': 'error', 'message': f'Backpack 스팟 {data_type} 데이터 조회 실패: {response.status_code}'}
-        except Exception as e:
-            logger.error(f"Spot market data error: {str(e)}")
-            return {'status': 'error', 'message': f'스팟 시장 데이터 조회 오류: {str(e)}'}
+            return error_result(f'시장 데이터 조회 오류: {str(e)}', e)
 
 def init_database():
     """사용자 API 키 데이터베이스 초기화"""
     try:
-        conn = sqlite3.connect('user_apis.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_api_keys (
-                user_id INTEGER PRIMARY KEY,
-                xt_api_key TEXT,
-                xt_api_secret TEXT,
-                backpack_api_key TEXT,
-                backpack_private_key TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_leverage_settings (
-                user_id INTEGER,
-                exchange TEXT,
-                symbol TEXT,
-                direction TEXT,
-                leverage INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, exchange, symbol, direction)
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        user_store.init_schema()
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
 
-def save_user_api_keys(user_id, exchange, api_key, api_secret):
-    """사용자 API 키 저장"""
-    conn = sqlite3.connect('user_apis.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO user_api_keys (
-            user_id, 
-            xt_api_key, xt_api_secret, 
-            backpack_api_key, backpack_private_key,
-            updated_at
-        )
-        SELECT ?, 
-               CASE WHEN ? = 'xt' THEN ? ELSE xt_api_key END,
-               CASE WHEN ? = 'xt' THEN ? ELSE xt_api_secret END,
-               CASE WHEN ? = 'backpack' THEN ? ELSE backpack_api_key END,
-               CASE WHEN ? = 'backpack' THEN ? ELSE backpack_private_key END,
-               CURRENT_TIMESTAMP
-        FROM user_api_keys WHERE user_id = ? OR NOT EXISTS (SELECT 1 FROM user_api_keys WHERE user_id = ?)
-    ''', (
-        user_id,
-        exchange, api_key, exchange, api_secret,
-        exchange, api_key, exchange, api_secret,
-        user_id, user_id
-    ))
-    conn.commit()
-    conn.close()
-
-def get_user_api_keys(user_id):
+async def save_user_api_keys(user_id, exchange, api_key, api_secret):
+    """사용자 API 키 저장 (시크릿은 암호화)"""
+    await user_store.save_api_keys(user_id, exchange, api_key, key_vault.encrypt(api_secret))
+    trader_cache.invalidate(user_id, exchange)
+    await user_stream.remove_user(user_id, exchange)
+
+async def get_user_api_keys(user_id):
     """사용자 API 키 조회"""
-    conn = sqlite3.connect('user_apis.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM user_api_keys WHERE user_id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {
-            'xt_api_key': row[1],
-            'xt_api_secret': row[2],
-            'backpack_api_key': row[3],
-            'backpack_private_key': row[4]
-        }
+    return await user_store.get_api_keys(user_id)
+
+async def get_user_trader(user_id, exchange):
+    """사용자 트레이더 조회 (캐시 우선, API 키가 없으면 None)"""
+    if exchange not in SUPPORTED_EXCHANGES:
+        return None
+    trader = trader_cache.get(user_id, exchange)
+    if trader is not None:
+        user_stream.ensure(user_id, trader)
+        return trader
+    user_keys = await get_user_api_keys(user_id)
+    if not user_keys:
+        return None
+    api_key = user_keys.get(f'{exchange}_api_key')
+    api_secret = user_keys.get(f'{exchange}_api_secret') or user_keys.get(f'{exchange}_private_key')
+    if not api_key or not api_secret:
+        return None
+    try:
+        api_secret = key_vault.decrypt(api_secret)
+    except ValueError as e:
+        logger.error(f"User {user_id} {exchange} key error: {e}")
+        return None
+    trader = UnifiedFuturesTrader(exchange, api_key=api_key, api_secret=api_secret)
+    trader_cache.put(user_id, exchange, trader)
+    user_stream.ensure(user_id, trader)
+    return trader
+
+async def quote_before_order(trader, symbol, direction, size, order_type, market_type):
+    """시장가 주문 전 예상 체결가 계산 (실패해도 주문은 그대로 진행)"""
+    if order_type != 'market':
+        return None
+    side = 'buy' if direction in ('buy', 'long') else 'sell'
+    try:
+        return await asyncio.wait_for(trader.quote_market_order(symbol, side, size, market_type), QUOTE_TIMEOUT)
+    except Exception as e:
+        logger.debug(f"Market order quote failed: {e}")
+        return None
+
+def format_quote(quote):
+    """예상 체결가 표시 문자열"""
+    if not quote:
+        return ""
+    text = f"예상 체결가: {quote['vwap']:.8g}\n"
+    if not quote['complete']:
+        text += f"⚠️ 호가 잔량 부족 (체결 가능 수량: {quote['filled']:.8g})\n"
+    return text
+
+def cached_mark_price(exchange, market_type, symbol):
+    """네트워크 요청 없이 얻을 수 있는 마크 가격 (스트림 호가 중간가 → 스트림/캐시 티커)"""
+    for name in dict.fromkeys((symbol, symbol.lower())):
+        book = market_stream.order_book(exchange, market_type, name)
+        if book is not None and book.mid_price() is not None:
+            return book.mid_price()
+        price = ticker_price(market_stream.snapshot(exchange, market_type, name, 'ticker'))
+        if price is None:
+            cached = market_cache.peek((exchange, market_type, name, 'ticker'))
+            price = ticker_price(cached.get('data')) if cached else None
+        if price is not None:
+            return price
     return None
 
+position_book.mark_source = cached_mark_price
+
+async def record_order_fill(user_id, exchange, market_type, symbol, direction, size, order_type, result, quote=None):
+    """성공한 시장가 주문을 포지션 장부에 반영 (예상 체결가가 있으면 체결가로 사용)
+
+    수량은 입력한 size가 아니라 주문 결과의 체결 수량(filled_qty) 또는 실제로 보낸 수량(quantity)을 씁니다.
+    지정가 주문은 체결 시점을 알 수 없으므로 체결 스트림으로만 반영합니다.
+    """
+    if order_type != 'market':
+        return
+    try:
+        price = quote['vwap'] if quote and quote.get('filled') else None
+        await position_book.record_order(user_id, exchange, market_type, symbol, direction, size, result, price)
+    except Exception as e:
+        logger.error(f"Position record error: {e}")
+
 async def show_main_menu(telegram_app, chat_id):
     """메인 메뉴 표시"""
     try:
@@ -774,7 +617,7 @@ async def show_main_menu(telegram_app, chat_id):
 async def show_api_management_menu(telegram_app, chat_id, user_id, callback_query=None):
     """API 관리 메뉴 표시"""
     try:
-        user_keys = get_user_api_keys(user_id)
+        user_keys = await get_user_api_keys(user_id)
         keyboard = [
             [InlineKeyboardButton(f"XT Exchange {'✅ 설정됨' if user_keys and user_keys.get('xt_api_key') else '❌ 미설정'}", callback_data="api_xt")],
             [InlineKeyboardButton(f"Backpack Exchange {'✅ 설정됨' if user_keys and user_keys.get('backpack_api_key') else '❌ 미설정'}", callback_data="api_backpack")],
@@ -806,6 +649,7 @@ async def show_balance_menu(telegram_app, chat_id, user_id, callback_query=None)
         keyboard = [
             [InlineKeyboardButton("XT Exchange", callback_data="balance_xt")],
             [InlineKeyboardButton("Backpack Exchange", callback_data="balance_backpack")],
+            [InlineKeyboardButton("📊 전체 포트폴리오", callback_data="balance_all")],
             [InlineKeyboardButton("🔙 메인 메뉴", callback_data="main_menu")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -926,7 +770,8 @@ async def show_help(telegram_app, chat_id, callback_query):
         "• `/start`: 메인 메뉴 표시\n"
         "• `/setapi [거래소] [API_KEY] [SECRET_KEY]`: API 키 설정\n"
         "• `/test`: API 연결 테스트\n"
-        "• `/trade [거래소] [심볼] [long/short/buy/sell] [주문타입] [수량] [레버리지/가격]`: 거래 실행\n\n"
+        "• `/trade [거래소] [심볼] [long/short/buy/sell] [주문타입] [수량] [레버리지/가격]`: 거래 실행\n"
+        "• `/indicators [거래소] [심볼] [주기] [spot]`: 기술 지표 조회 (EMA, RSI, ATR, VWAP, 볼린저 밴드)\n\n"
         "**지원 거래소:**\n"
         "• XT Exchange\n"
         "• Backpack Exchange\n\n"
@@ -951,7 +796,7 @@ async def handle_api_callback(telegram_app, chat_id, user_id, data, callback_que
             "backpack": "Backpack Exchange"
         }
         
-        user_keys = get_user_api_keys(user_id)
+        user_keys = await get_user_api_keys(user_id)
         has_api_key = False
         if user_keys:
             if exchange == 'backpack':
@@ -1018,29 +863,26 @@ async def handle_api_callback(telegram_app, chat_id, user_id, data, callback_que
 async def handle_balance_callback(telegram_app, chat_id, user_id, data, callback_query):
     """잔고 조회 콜백 처리"""
     exchange = data.replace("balance_", "")
-    user_keys = get_user_api_keys(user_id)
-    if not user_keys or not user_keys.get(f'{exchange}_api_key'):
+    if exchange == "menu":
+        await show_balance_menu(telegram_app, chat_id, user_id, callback_query)
+        return
+    exchanges = SUPPORTED_EXCHANGES if exchange == "all" else (exchange,)
+    traders = {}
+    for name in exchanges:
+        trader = await get_user_trader(user_id, name)
+        if trader is not None:
+            traders[name] = trader
+    if not traders:
+        target = "거래소" if exchange == "all" else exchange.upper()
         await telegram_app.bot.edit_message_text(
             chat_id=chat_id,
             message_id=callback_query.message.message_id,
-            text=f"❌ {exchange.upper()} API 키가 설정되지 않았습니다. 먼저 /setapi 명령어로 설정하세요.",
+            text=f"❌ {target} API 키가 설정되지 않았습니다. 먼저 /setapi 명령어로 설정하세요.",
             parse_mode='Markdown'
         )
         return
-    api_key = user_keys.get(f'{exchange}_api_key')
-    api_secret = user_keys.get(f'{exchange}_api_secret') or user_keys.get(f'{exchange}_private_key')
-    trader = UnifiedFuturesTrader(exchange, api_key=api_key, api_secret=api_secret)
-    futures_result = trader.get_futures_balance()
-    spot_result = trader.get_spot_balance()
-    text = f"💰 **{exchange.upper()} 잔고 조회**\n\n"
-    if futures_result.get('status') == 'success':
-        text += f"**선물 잔고**: {futures_result.get('balance')}\n"
-    else:
-        text += f"**선물 잔고**: 조회 실패 - {futures_result.get('message')}\n"
-    if spot_result.get('status') == 'success':
-        text += f"**스팟 잔고**: {spot_result.get('balance')}\n"
-    else:
-        text += f"**스팟 잔고**: 조회 실패 - {spot_result.get('message')}\n"
+    portfolio = await fetch_portfolio(traders)
+    text = format_portfolio(portfolio)
     keyboard = [[InlineKeyboardButton("🔙 잔고 메뉴", callback_data="balance_menu")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await telegram_app.bot.edit_message_text(
@@ -1167,7 +1009,7 @@ async def show_leverage_menu(telegram_app, chat_id, user_id, trade_type, exchang
         reply_markup=reply_markup
     )
 
-async def show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, leverage=1, callback_query=None):
+async def show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, leverage=1, callback_query=None, context=None):
     """수량 입력 요청"""
     context.user_data['trade_info'] = {
         'trade_type': trade_type,
@@ -1178,6 +1020,9 @@ async def show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchan
         'leverage': leverage
     }
     context.user_data['quantity'] = True
+    context.user_data.pop('leverage', None)
+    if market_type == 'futures':
+        flow_state.set_leverage(user_id, exchange, symbol, trade_type, leverage)
     text = (
         f"🔄 **{trade_type.upper()} 거래 - {exchange.upper()} ({market_type.upper()}) {symbol} ({order_type.upper()})**\n\n"
         f"레버리지: {leverage}x\n"
@@ -1197,7 +1042,7 @@ async def show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchan
             parse_mode='Markdown'
         )
 
-async def show_futures_leverage_input(telegram_app, chat_id, user_id, exchange, direction, symbol, callback_query=None):
+async def show_futures_leverage_input(telegram_app, chat_id, user_id, exchange, direction, symbol, callback_query=None, context=None):
     """선물 거래 레버리지 입력 요청"""
     context.user_data['trade_info'] = {
         'trade_type': direction,
@@ -1207,22 +1052,30 @@ async def show_futures_leverage_input(telegram_app, chat_id, user_id, exchange,
         'order_type': 'market'
     }
     context.user_data['leverage'] = True
-    text = (
-        f"🔄 **선물 {direction.upper()} 거래 - {exchange.upper()} {symbol}**\n\n"
-        f"레버리지를 입력하세요 (예: 5):"
-    )
+    text = f"🔄 **선물 {direction.upper()} 거래 - {exchange.upper()} {symbol}**\n\n"
+    reply_markup = None
+    saved = await flow_state.get_leverage(user_id, exchange, symbol, direction)
+    if saved:
+        text += f"지난 레버리지: {saved}x\n버튼을 누르거나 다른 레버리지를 입력하세요 (예: 5):"
+        reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton(
+            f"✅ {saved}x 사용", callback_data=f"leverage_{direction}_{exchange}_futures_{symbol}_market_{saved}"
+        )]])
+    else:
+        text += "레버리지를 입력하세요 (예: 5):"
     if callback_query:
         await telegram_app.bot.edit_message_text(
             chat_id=chat_id,
             message_id=callback_query.message.message_id,
             text=text,
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            reply_markup=reply_markup
         )
     else:
         await telegram_app.bot.send_message(
             chat_id=chat_id,
             text=text,
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            reply_markup=reply_markup
         )
 
 async def handle_quantity_input(telegram_app, chat_id, user_id, text, context):
@@ -1239,8 +1092,8 @@ async def handle_quantity_input(telegram_app, chat_id, user_id, text, context):
         order_type = trade_info.get('order_type')
         leverage = trade_info.get('leverage', 1)
         
-        user_keys = get_user_api_keys(user_id)
-        if not user_keys or not user_keys.get(f'{exchange}_api_key'):
+        trader = await get_user_trader(user_id, exchange)
+        if trader is None:
             await telegram_app.bot.send_message(
                 chat_id=chat_id,
                 text=f"❌ {exchange.upper()} API 키가 설정되지 않았습니다. 먼저 /setapi 명령어로 설정하세요.",
@@ -1248,29 +1101,28 @@ async def handle_quantity_input(telegram_app, chat_id, user_id, text, context):
             )
             return
         
-        api_key = user_keys.get(f'{exchange}_api_key')
-        api_secret = user_keys.get(f'{exchange}_api_secret') or user_keys.get(f'{exchange}_private_key')
-        trader = UnifiedFuturesTrader(exchange, api_key=api_key, api_secret=api_secret)
-        
+        quote = await quote_before_order(trader, symbol, trade_type, size, order_type, market_type)
         if market_type == 'spot':
             if trade_type == 'buy':
-                result = trader.spot_buy(symbol, size, order_type)
+                result = await trader.spot_buy(symbol, size, order_type)
             else:
-                result = trader.spot_sell(symbol, size, order_type)
+                result = await trader.spot_sell(symbol, size, order_type)
         else:
             if trade_type == 'long':
-                result = trader.open_long_position(symbol, size, leverage, order_type, market_type)
+                result = await trader.open_long_position(symbol, size, leverage, order_type, market_type)
             else:
-                result = trader.open_short_position(symbol, size, leverage, order_type, market_type)
+                result = await trader.open_short_position(symbol, size, leverage, order_type, market_type)
         
         if result.get('status') == 'success':
+            await record_order_fill(user_id, exchange, market_type, symbol, trade_type, size, order_type, result, quote)
             success_message = (
                 f"✅ **{trade_type.upper()} {'거래' if market_type == 'spot' else '포지션 오픈'} 성공**\n\n"
                 f"거래소: {exchange.upper()}\n"
                 f"심볼: {symbol}\n"
-                f"수량: {size}\n"
+                f"수량: {result.get('quantity', size)}\n"
                 f"주문 유형: {order_type.upper()}\n"
                 f"레버리지: {leverage}x\n"
+                f"{format_quote(quote)}"
                 f"주문 ID: {result.get('order_id', 'N/A')}"
             )
             await telegram_app.bot.send_message(chat_id=chat_id, text=success_message, parse_mode='Markdown')
@@ -1311,7 +1163,7 @@ async def handle_leverage_input(telegram_app, chat_id, user_id, text, context):
         symbol = trade_info.get('symbol')
         order_type = trade_info.get('order_type')
         
-        await show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, leverage)
+        await show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, leverage, context=context)
         context.user_data.pop('leverage', None)
     except ValueError as e:
         await telegram_app.bot.send_message(
@@ -1327,7 +1179,7 @@ async def handle_leverage_input(telegram_app, chat_id, user_id, text, context):
             parse_mode='Markdown'
         )
 
-async def handle_trade_callback(telegram_app, chat_id, user_id, data, callback_query):
+async def handle_trade_callback(telegram_app, chat_id, user_id, data, callback_query, context):
     """거래 콜백 처리"""
     logger.debug(f"Trade callback: {data}")
     try:
@@ -1366,7 +1218,7 @@ async def handle_trade_callback(telegram_app, chat_id, user_id, data, callback_q
             if market_type == "futures":
                 await show_leverage_menu(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, callback_query)
             else:
-                await show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, callback_query=callback_query)
+                await show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, callback_query=callback_query, context=context)
         elif data.startswith("leverage_"):
             parts = data.split("_")
             trade_type = parts[1]
@@ -1375,7 +1227,7 @@ async def handle_trade_callback(telegram_app, chat_id, user_id, data, callback_q
             symbol = parts[4]
             order_type = parts[5]
             leverage = parts[6]
-            await show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, leverage, callback_query)
+            await show_quantity_input(telegram_app, chat_id, user_id, trade_type, exchange, market_type, symbol, order_type, leverage, callback_query, context)
         elif data.startswith("futures_direction_"):
             parts = data.split("_")
             exchange = parts[2]
@@ -1390,13 +1242,16 @@ async def handle_trade_callback(telegram_app, chat_id, user_id, data, callback_q
             exchange = parts[2]
             direction = parts[3]
             symbol = parts[4]
-            await show_futures_leverage_input(telegram_app, chat_id, user_id, exchange, direction, symbol, callback_query)
+            await show_futures_leverage_input(telegram_app, chat_id, user_id, exchange, direction, symbol, callback_query, context)
     except Exception as e:
         logger.error(f"Trade callback error: {e}")
         await callback_query.answer("❌ 오류가 발생했습니다.")
 
-async def handle_trade_command(telegram_app, chat_id, user_id, text):
+async def handle_trade_command(telegram_app, chat_id, user_id, text, context):
     """거래 명령어 처리"""
+    if ';' in text:
+        await handle_multi_leg_trade(telegram_app, chat_id, user_id, text)
+        return
     parts = text.split()
     if len(parts) < 5:
         await telegram_app.bot.send_message(
@@ -1406,7 +1261,9 @@ async def handle_trade_command(telegram_app, chat_id, user_id, text):
                  "예시: `/trade backpack BTC buy market 0.001`\n"
                  "예시: `/trade backpack BTC sell limit 0.001 50000`\n\n"
                  "**선물 거래**: `/trade [거래소] [심볼] [long/short] [주문타입] [수량] [레버리지]`\n"
-                 "예시: `/trade backpack BTC long market 0.001 10`",
+                 "예시: `/trade backpack BTC long market 0.001 10`\n\n"
+                 "**여러 주문**: `;`로 구분 (두 번째부터는 거래소 생략)\n"
+                 "예시: `/trade backpack BTC buy limit 0.001 50000; ETH buy limit 0.01 3000`",
             parse_mode='Markdown'
         )
         return
@@ -1428,19 +1285,13 @@ async def handle_trade_command(telegram_app, chat_id, user_id, text):
         size = float(parts[5])
         price = None
         if len(parts) < 7 or not parts[6].isdigit():
-            await show_futures_leverage_input(telegram_app, chat_id, user_id, exchange, direction, symbol, callback_query=None)
+            await show_futures_leverage_input(telegram_app, chat_id, user_id, exchange, direction, symbol, context=context)
             return
         leverage = int(parts[6])
+        flow_state.set_leverage(user_id, exchange, symbol, direction, leverage)
     
-    user_keys = get_user_api_keys(user_id)
-    has_api_key = False
-    if user_keys:
-        if exchange == 'backpack':
-            has_api_key = bool(user_keys.get('backpack_api_key') and user_keys.get('backpack_private_key'))
-        else:
-            has_api_key = bool(user_keys.get(f'{exchange}_api_key') and user_keys.get(f'{exchange}_api_secret'))
-    
-    if not has_api_key:
+    trader = await get_user_trader(user_id, exchange)
+    if trader is None:
         exchange_names = {"xt": "XT Exchange", "backpack": "Backpack Exchange"}
         await telegram_app.bot.send_message(
             chat_id=chat_id, 
@@ -1452,15 +1303,12 @@ async def handle_trade_command(telegram_app, chat_id, user_id, text):
         return
     
     try:
-        api_key = user_keys.get(f'{exchange}_api_key')
-        api_secret = user_keys.get(f'{exchange}_api_secret') or user_keys.get(f'{exchange}_private_key')
-        trader = UnifiedFuturesTrader(exchange, api_key=api_key, api_secret=api_secret)
-        
+        quote = await quote_before_order(trader, symbol, direction, size, order_type, market_type)
         if market_type == 'spot':
             if direction == 'buy':
-                result = trader.spot_buy(symbol, size, order_type, price)
+                result = await trader.spot_buy(symbol, size, order_type, price)
             elif direction == 'sell':
-                result = trader.spot_sell(symbol, size, order_type, price)
+                result = await trader.spot_sell(symbol, size, order_type, price)
             else:
                 await telegram_app.bot.send_message(
                     chat_id=chat_id,
@@ -1470,9 +1318,9 @@ async def handle_trade_command(telegram_app, chat_id, user_id, text):
                 return
         else:
             if direction == 'long':
-                result = trader.open_long_position(symbol, size, leverage, order_type, market_type)
+                result = await trader.open_long_position(symbol, size, leverage, order_type, market_type)
             elif direction == 'short':
-                result = trader.open_short_position(symbol, size, leverage, order_type, market_type)
+                result = await trader.open_short_position(symbol, size, leverage, order_type, market_type)
             else:
                 await telegram_app.bot.send_message(
                     chat_id=chat_id,
@@ -1482,18 +1330,21 @@ async def handle_trade_command(telegram_app, chat_id, user_id, text):
                 return
         
         if result.get('status') == 'success':
+            await record_order_fill(user_id, exchange, market_type, symbol, direction, size, order_type, result, quote)
             if market_type == 'spot':
                 success_message = f"✅ **{direction.upper()} 거래 성공**\n\n"
                 success_message += f"거래소: {exchange.upper()}\n"
                 success_message += f"심볼: {symbol}\n"
-                success_message += f"수량: {size}\n"
+                success_message += f"수량: {result.get('quantity', size)}\n"
+                success_message += format_quote(quote)
                 success_message += f"주문 ID: {result.get('order_id', 'N/A')}"
             else:
                 success_message = f"✅ **{direction.upper()} 포지션 오픈 성공**\n\n"
                 success_message += f"거래소: {exchange.upper()}\n"
                 success_message += f"심볼: {symbol}\n"
-                success_message += f"수량: {size}\n"
+                success_message += f"수량: {result.get('quantity', size)}\n"
                 success_message += f"레버리지: {leverage}배\n"
+                success_message += format_quote(quote)
                 success_message += f"주문 ID: {result.get('order_id', 'N/A')}"
             await telegram_app.bot.send_message(chat_id=chat_id, text=success_message, parse_mode='Markdown')
         else:
@@ -1503,32 +1354,293 @@ async def handle_trade_command(telegram_app, chat_id, user_id, text):
     except Exception as e:
         await telegram_app.bot.send_message(chat_id=chat_id, text=f"❌ **오류 발생**\n\n{str(e)}", parse_mode='Markdown')
 
-async def handle_position_callback(telegram_app, chat_id, user_id, data, callback_query):
-    """포지션 관련 콜백 처리"""
-    parts = data.split("_")
-    action = parts[0]
-    exchange = parts[2]
-    text = f"📊 **{exchange.upper()} 포지션 {action.replace('position_', '')}**\n\n현재 구현 중입니다."
-    keyboard = [[InlineKeyboardButton("🔙 포지션 메뉴", callback_data="position_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+def parse_trade_leg(parts):
+    """'[심볼] [방향] [주문타입] [수량] [가격/레버리지]'를 place_orders 주문 dict로 변환"""
+    if len(parts) < 4:
+        raise ValueError(f"주문 형식이 잘못되었습니다: {' '.join(parts)}")
+    symbol, side, order_type = parts[0].upper(), parts[1].lower(), parts[2].lower()
+    order = {'symbol': symbol, 'side': side, 'order_type': order_type, 'size': float(parts[3])}
+    if side in ('buy', 'sell'):
+        if order_type == 'limit':
+            if len(parts) < 5:
+                raise ValueError(f"{symbol} 지정가 주문에는 가격이 필요합니다.")
+            order['price'] = float(parts[4])
+    elif side in ('long', 'short'):
+        if len(parts) < 5 or not parts[4].isdigit():
+            raise ValueError(f"{symbol} 선물 주문에는 레버리지가 필요합니다.")
+        order['leverage'] = int(parts[4])
+    else:
+        raise ValueError(f"잘못된 방향: {side}")
+    return order
+
+async def handle_multi_leg_trade(telegram_app, chat_id, user_id, text):
+    """';'로 구분된 여러 주문을 한 번에 제출"""
+    legs = [leg.split() for leg in text.split(';') if leg.strip()]
+    first = legs[0]
+    if len(first) < 2:
+        await telegram_app.bot.send_message(chat_id=chat_id, text="❌ 거래소를 입력하세요.", parse_mode='Markdown')
+        return
+    exchange = first[1].lower()
+    legs[0] = first[2:]
+    try:
+        orders = [parse_trade_leg(leg) for leg in legs]
+    except ValueError as e:
+        await telegram_app.bot.send_message(chat_id=chat_id, text=f"❌ {str(e)}", parse_mode='Markdown')
+        return
+
+    trader = await get_user_trader(user_id, exchange)
+    if trader is None:
+        await telegram_app.bot.send_message(
+            chat_id=chat_id,
+            text=f"❌ {exchange.upper()} API 키가 설정되지 않았습니다. 먼저 /setapi 명령어로 설정하세요.",
+            parse_mode='Markdown'
+        )
+        return
+
+    results = await trader.place_orders(orders)
+    for order, result in zip(orders, results):
+        market_type = 'spot' if order['side'] in ('buy', 'sell') else 'futures'
+        await record_order_fill(user_id, exchange, market_type, order['symbol'], order['side'], order['size'], order['order_type'], result)
+    succeeded = sum(1 for r in results if r.get('status') == 'success')
+    lines = [f"📋 **{exchange.upper()} 주문 {len(orders)}건 중 {succeeded}건 성공**\n"]
+    for order, result in zip(orders, results):
+        leg = f"{order['symbol']} {order['side'].upper()} {order['size']}"
+        if result.get('status') == 'success':
+            lines.append(f"✅ {leg} - 주문 ID: {result.get('order_id', 'N/A')}")
+        else:
+            error_msg = result.get('message', '알 수 없는 오류').replace('*', '\\*').replace('_', '\\_').replace('`', '\\`').replace('[', '\\[').replace(']', '\\]')
+            lines.append(f"❌ {leg} - {error_msg}")
+    await telegram_app.bot.send_message(chat_id=chat_id, text="\n".join(lines), parse_mode='Markdown')
+
+def format_indicators(exchange, market_type, symbol, values):
+    """지표 조회 결과 메시지"""
+    lower, mid, upper = values['bollinger']
+    rsi = f"{values['rsi']:.1f}" if values['rsi'] is not None else '-'
+    emas = ' / '.join(f"{value:,.4f}" for value in values['ema'].values())
+    return (
+        f"📈 **{exchange.upper()} {MARKET_LABELS[market_type]} {symbol} {values['interval']} 지표**\n\n"
+        f"종가: {values['close']:,.4f}\n"
+        f"EMA({'/'.join(str(period) for period in values['ema'])}): {emas}\n"
+        f"RSI(14): {rsi}\n"
+        f"ATR(14): {values['atr']:,.4f}\n"
+        f"VWAP(60): {values['vwap']:,.4f}\n"
+        f"볼린저(20, 2): {lower:,.4f} / {mid:,.4f} / {upper:,.4f}\n\n"
+        f"캔들 {values['candles']}개 기준"
+    )
+
+
+async def handle_indicators_command(telegram_app, chat_id, text):
+    """지표 조회 명령어 처리"""
+    parts = text.split()
+    if len(parts) < 3:
+        await telegram_app.bot.send_message(
+            chat_id=chat_id,
+            text="❌ 사용법: `/indicators [거래소] [심볼] [주기] [spot]`\n"
+                 "예시: `/indicators xt BTC`\n"
+                 "예시: `/indicators backpack ETH 15m spot`\n"
+                 "주기: 1m, 5m, 15m, 30m, 1h, 4h, 1d (기본 1m, spot을 붙이지 않으면 선물)",
+            parse_mode='Markdown'
+        )
+        return
+
+    exchange = parts[1].lower()
+    symbol = parts[2].upper()
+    options = [part.lower() for part in parts[3:]]
+    market_type = 'spot' if 'spot' in options else 'futures'
+    intervals = [option for option in options if option not in ('spot', 'futures')]
+    interval = intervals[0] if intervals else '1m'
+
+    result = await kline_store.indicators(exchange, market_type, symbol, interval)
+    if result.get('status') != 'success':
+        await telegram_app.bot.send_message(chat_id=chat_id, text=f"❌ {result.get('message')}")
+        return
+    await telegram_app.bot.send_message(
+        chat_id=chat_id,
+        text=format_indicators(exchange, market_type, symbol, result['indicators']),
+        parse_mode='Markdown'
+    )
+
+
+def format_position(position):
+    """포지션 한 줄 요약"""
+    mark = position_book.mark_price(position.exchange, position.market_type, position.symbol, position)
+    unrealized = position.unrealized_pnl(mark)
+    symbol = position.symbol.replace('_', '\\_')
+    direction = {'long': '🟢 LONG', 'short': '🔴 SHORT', 'spot': '🟡 SPOT'}.get(position.direction, position.direction)
+    text = f"{direction} **{symbol}** ({position.market_type})\n"
+    text += f"수량: {abs(position.qty):.8g} / 평균가: {position.avg_price:.8g}\n"
+    text += f"마크: {mark:.8g} / 미실현: {unrealized:+.4f}\n" if mark else "마크: N/A\n"
+    text += f"실현 손익: {position.realized_pnl:+.4f}\n"
+    return text
+
+async def show_position_list(telegram_app, chat_id, user_id, exchange, callback_query):
+    """포지션 장부로 포지션/손익 표시 (거래소 조회 없음)"""
+    positions = await position_book.open_positions(user_id, exchange)
+    summary = await position_book.summary(user_id, exchange)
+    text = f"📊 **{exchange.upper()} 포지션**\n\n"
+    if positions:
+        text += "\n".join(format_position(p) for p in positions)
+    else:
+        text += "열린 포지션이 없습니다.\n"
+    text += f"\n💰 실현 손익 합계: {summary['realized']:+.4f}\n"
+    text += f"📈 미실현 손익 합계: {summary['unrealized']:+.4f}"
+    keyboard = [
+        [InlineKeyboardButton("🔄 새로고침", callback_data=f"position_list_{exchange}")],
+        [InlineKeyboardButton("🔙 포지션 메뉴", callback_data="position_menu")]
+    ]
+    try:
+        await telegram_app.bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=callback_query.message.message_id,
+            text=text,
+            parse_mode='Markdown',
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    except Exception as e:
+        # 새로고침 시 내용이 같으면 텔레그램이 'message is not modified' 오류를 반환
+        logger.debug(f"Position list edit error: {e}")
+
+async def show_position_close_list(telegram_app, chat_id, user_id, exchange, callback_query):
+    """종료할 포지션 선택"""
+    positions = await position_book.open_positions(user_id, exchange)
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{p.direction.upper()} {p.symbol} {abs(p.qty):.8g} ({p.market_type})",
+            callback_data=f"position_close_{exchange}_{p.market_type}_{p.symbol}"
+        )]
+        for p in positions
+    ]
+    keyboard.append([InlineKeyboardButton("🔙 포지션 메뉴", callback_data="position_menu")])
+    text = f"❌ **{exchange.upper()} 포지션 종료**\n\n"
+    text += "종료할 포지션을 선택하세요. 선물은 거래소 포지션 전체를 reduce-only 시장가 주문으로 종료합니다." if positions else "열린 포지션이 없습니다."
     await telegram_app.bot.edit_message_text(
         chat_id=chat_id,
         message_id=callback_query.message.message_id,
         text=text,
         parse_mode='Markdown',
-        reply_markup=reply_markup
+        reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
+async def close_position(telegram_app, chat_id, user_id, exchange, market_type, symbol):
+    """포지션 종료
+
+    선물은 거래소 포지션 수량을 조회해 그 수량만큼 reduce-only 시장가 반대 주문을 냅니다
+    (장부 수량이 어긋나도 반대 포지션을 열지 않고, 헤지 모드에서는 같은 방향 포지션만 줄임).
+    스팟은 장부 보유 수량을 시장가로 매도합니다.
+    """
+    position = await position_book.get(user_id, exchange, market_type, symbol)
+    if position is None or not position.is_open:
+        await telegram_app.bot.send_message(chat_id=chat_id, text="❌ 열린 포지션이 없습니다.", parse_mode='Markdown')
+        return
+    trader = await get_user_trader(user_id, exchange)
+    if trader is None:
+        await telegram_app.bot.send_message(
+            chat_id=chat_id,
+            text=f"❌ {exchange.upper()} API 키가 설정되지 않았습니다. 먼저 /setapi 명령어로 설정하세요.",
+            parse_mode='Markdown'
+        )
+        return
+    if market_type == 'spot':
+        size = abs(position.qty)
+        direction = 'sell'
+        quote = await quote_before_order(trader, symbol, direction, size, 'market', market_type)
+        result = await trader.spot_sell(symbol, size, 'market')
+    else:
+        side = position.direction
+        found = await trader.get_position(symbol, market_type)
+        size = found.get('positions', {}).get(side, 0.0) if found.get('status') == 'success' else 0.0
+        if size <= 0:
+            reason = found.get('message', '') if found.get('status') != 'success' else f"거래소에 열린 {side.upper()} 포지션이 없습니다."
+            reason = reason.replace('*', '\\*').replace('_', '\\_').replace('`', '\\`').replace('[', '\\[').replace(']', '\\]')
+            await telegram_app.bot.send_message(chat_id=chat_id, text=f"❌ **포지션 종료 실패**\n\n오류: {reason}", parse_mode='Markdown')
+            return
+        direction = 'short' if side == 'long' else 'long'
+        quote = await quote_before_order(trader, symbol, direction, size, 'market', market_type)
+        result = await trader.close_position(symbol, side, size, market_type)
+
+    if result.get('status') == 'success':
+        realized_before = position.realized_pnl
+        symbol_text = symbol.replace('_', '\\_')
+        await record_order_fill(user_id, exchange, market_type, symbol, direction, size, 'market', result, quote)
+        text = (
+            f"✅ **포지션 종료 주문 성공**\n\n"
+            f"거래소: {exchange.upper()}\n"
+            f"심볼: {symbol_text}\n"
+            f"수량: {result.get('quantity', size):.8g}\n"
+            f"{format_quote(quote)}"
+            f"실현 손익: {position.realized_pnl - realized_before:+.4f}\n"
+            f"주문 ID: {result.get('order_id', 'N/A')}"
+        )
+    else:
+        error_msg = result.get('message', '알 수 없는 오류').replace('*', '\\*').replace('_', '\\_').replace('`', '\\`').replace('[', '\\[').replace(']', '\\]')
+        text = f"❌ **포지션 종료 실패**\n\n오류: {error_msg}"
+    await telegram_app.bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
+
+async def handle_position_callback(telegram_app, chat_id, user_id, data, callback_query):
+    """포지션 관련 콜백 처리
+
+    position_list_<거래소>, position_close_<거래소>, position_close_<거래소>_<마켓>_<심볼>
+    """
+    parts = data.split("_", 4)
+    action = parts[1]
+    exchange = parts[2]
+    if exchange not in SUPPORTED_EXCHANGES:
+        return
+    if action == "list":
+        await show_position_list(telegram_app, chat_id, user_id, exchange, callback_query)
+    elif len(parts) == 5:
+        await close_position(telegram_app, chat_id, user_id, exchange, parts[3], parts[4])
+    else:
+        await show_position_close_list(telegram_app, chat_id, user_id, exchange, callback_query)
+
+@app.route('/health', methods=['GET'])
+def health():
+    """헬스 체크"""
+    body = {
+        'status': 'ok',
+        'bot': telegram_app is not None,
+        'uptime': int(time.time() - metrics.START_TIME),
+    }
+    return app.response_class(json.dumps(body), mimetype='application/json')
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 지표"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Flask 웹훅 엔드포인트
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    update = request.get_json()
-    telegram_app.app.process_update(update)
-    return '', 200
+    """텔레그램 웹훅: 검증 후 큐에 넣고 바로 응답"""
+    if WEBHOOK_SECRET:
+        token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(token, WEBHOOK_SECRET):
+            return '', 403
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return '', 400
+    if telegram_app is None:
+        return '', 503
+    try:
+        accepted = telegram_app.updates.submit_threadsafe(data)
+    except Exception as e:
+        logger.error(f"Webhook enqueue error: {e}")
+        accepted = False
+    # 큐가 가득 차면 503을 돌려 텔레그램이 나중에 다시 보내게 함
+    return ('', 200) if accepted else ('', 503)
 
-def run_flask():
-    app.run(host='0.0.0.0', port=5000)
+def run_flask(port=5000):
+    app.run(host='0.0.0.0', port=port, threaded=True)
 
 if __name__ == '__main__':
     init_database()
-    telegram_app = TelegramApp("YOUR_BOT_TOKEN")  # 여기에
\ No newline at end of file
+    bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not bot_token:
+        raise SystemExit("TELEGRAM_BOT_TOKEN 환경 변수를 설정해주세요.")
+    telegram_app = TelegramApp(bot_token)
+    if os.getenv('BOT_MODE', 'polling') == 'webhook':
+        if not WEBHOOK_URL:
+            raise SystemExit("웹훅 모드에는 WEBHOOK_URL 환경 변수가 필요합니다.")
+        telegram_app.run_webhook(WEBHOOK_URL, WEBHOOK_SECRET, int(os.getenv('PORT', '5000')))
+    else:
+        telegram_app.run_polling(int(os.getenv('PORT', '5000')))
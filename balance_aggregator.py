@@ -0,0 +1,67 @@
+"""
+여러 거래소 잔고 동시 조회
+
+사용자가 설정한 모든 거래소의 선물·스팟 잔고를 동시에 요청하고,
+호출마다 시간 제한을 두어 느린 거래소가 있어도 나머지 결과는 보여줍니다.
+전체 지연 시간은 각 호출의 합이 아니라 가장 느린 호출만큼 걸립니다.
+"""
+
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BALANCE_TIMEOUT = float(os.getenv('BALANCE_TIMEOUT', '8'))
+
+MARKET_TYPES = ('futures', 'spot')
+MARKET_TYPE_NAMES = {'futures': '선물 잔고', 'spot': '스팟 잔고'}
+
+
+async def _fetch_one(trader, market_type, timeout):
+    """잔고 조회 1건 (시간 초과·예외도 결과 dict로 변환)"""
+    fetch = trader.get_futures_balance if market_type == 'futures' else trader.get_spot_balance
+    try:
+        return await asyncio.wait_for(fetch(), timeout)
+    except asyncio.TimeoutError:
+        return {'status': 'error', 'message': f'시간 초과 ({timeout:g}초)'}
+    except Exception as e:
+        logger.error(f"{trader.exchange} {market_type} balance error: {e}")
+        return {'status': 'error', 'message': str(e)}
+
+
+async def fetch_portfolio(traders, timeout=BALANCE_TIMEOUT):
+    """{exchange: trader}의 선물·스팟 잔고를 동시에 조회
+
+    반환: {exchange: {'futures': result, 'spot': result}}
+    """
+    keys = [(exchange, market_type) for exchange in traders for market_type in MARKET_TYPES]
+    results = await asyncio.gather(*(
+        _fetch_one(traders[exchange], market_type, timeout) for exchange, market_type in keys
+    ))
+    portfolio = {exchange: {} for exchange in traders}
+    for (exchange, market_type), result in zip(keys, results):
+        portfolio[exchange][market_type] = result
+    return portfolio
+
+
+def format_portfolio(portfolio):
+    """포트폴리오 조회 결과를 하나의 메시지로 변환"""
+    if len(portfolio) == 1:
+        exchange = next(iter(portfolio))
+        text = f"💰 **{exchange.upper()} 잔고 조회**\n\n"
+    else:
+        text = "💰 **전체 포트폴리오**\n\n"
+    for exchange, results in portfolio.items():
+        if len(portfolio) > 1:
+            text += f"**[{exchange.upper()}]**\n"
+        for market_type in MARKET_TYPES:
+            result = results.get(market_type, {})
+            name = MARKET_TYPE_NAMES[market_type]
+            if result.get('status') == 'success':
+                text += f"**{name}**: {result.get('balance')}\n"
+            else:
+                text += f"**{name}**: 조회 실패 - {result.get('message')}\n"
+        if len(portfolio) > 1:
+            text += "\n"
+    return text
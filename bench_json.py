@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+응답 디코딩 마이크로 벤치마크
+
+XT/Backpack 응답 형식을 그대로 본뜬 본문으로 기존 방식(response.json(), 오류 시 response.text)과
+fast_json.py(orjson 사용 시 bytes 직접 디코딩, 오류 본문 앞부분만 디코딩)를 초당 처리 수로 비교합니다.
+두 방식의 디코딩 결과가 같은지도 확인합니다.
+
+실행: python bench_json.py [반복 횟수]
+"""
+
+import json
+import sys
+import time
+
+import httpx
+
+import fast_json
+
+
+def xt_order_ack():
+    return {'rc': 0, 'mc': 'SUCCESS', 'ma': [], 'result': {'orderId': '412345678901234567'}}
+
+
+def xt_futures_balance():
+    return {'rc': 0, 'mc': 'SUCCESS', 'ma': [], 'result': [
+        {'coin': coin, 'walletBalance': '1000.12345678', 'openOrderMarginFrozen': '0', 'isolatedMargin': '12.5',
+         'crossedMargin': '0', 'availableBalance': '987.62345678', 'bonus': '0', 'coupon': '0'}
+        for coin in ('usdt', 'btc', 'eth', 'sol', 'xrp', 'doge', 'ada', 'bnb')
+    ]}
+
+
+def xt_depth(levels):
+    return {'rc': 0, 'mc': 'SUCCESS', 'ma': [], 'result': {
+        'timestamp': 1700000000000, 'lastUpdateId': 123456789,
+        'bids': [[f"{43000 - i * 0.1:.1f}", f"{0.5 + i * 0.01:.3f}"] for i in range(levels)],
+        'asks': [[f"{43000.1 + i * 0.1:.1f}", f"{0.5 + i * 0.01:.3f}"] for i in range(levels)],
+    }}
+
+
+def xt_kline(count):
+    return {'rc': 0, 'mc': 'SUCCESS', 'ma': [], 'result': [
+        {'t': 1700000000000 + i * 60000, 'o': '43000.1', 'c': '43005.4', 'h': '43010.2', 'l': '42990.3',
+         'q': '12.345', 'v': '530000.12'}
+        for i in range(count)
+    ]}
+
+
+def backpack_order_ack():
+    return {'id': '112233445566', 'clientId': 1234567, 'symbol': 'BTC_USDC_PERP', 'side': 'Bid',
+            'orderType': 'Market', 'quantity': '0.001', 'executedQuantity': '0.001',
+            'executedQuoteQuantity': '43.0051', 'status': 'Filled', 'timeInForce': 'GTC',
+            'selfTradePrevention': 'RejectTaker', 'createdAt': 1700000000000}
+
+
+def backpack_capital():
+    return {asset: {'available': '1000.12345678', 'locked': '0', 'staked': '0'}
+            for asset in ('USDC', 'BTC', 'ETH', 'SOL', 'JUP', 'PYTH', 'WIF', 'BONK')}
+
+
+def backpack_klines(count):
+    return [
+        {'start': f'2023-11-14 22:{i % 60:02d}:00', 'end': f'2023-11-14 22:{i % 60:02d}:59', 'open': '43000.1',
+         'high': '43010.2', 'low': '42990.3', 'close': '43005.4', 'volume': '12.345', 'quoteVolume': '530000.12',
+         'trades': '57'}
+        for i in range(count)
+    ]
+
+
+PAYLOADS = [
+    ("XT 주문 응답", xt_order_ack()),
+    ("XT 선물 잔고", xt_futures_balance()),
+    ("XT 호가 10단계", xt_depth(10)),
+    ("XT 캔들 1000개", xt_kline(1000)),
+    ("Backpack 주문 응답", backpack_order_ack()),
+    ("Backpack 잔고", backpack_capital()),
+    ("Backpack 캔들 1000개", backpack_klines(1000)),
+]
+ERROR_PAGE = ("<html><head><title>502 Bad Gateway</title></head><body>"
+              + "<p>upstream connect error or disconnect/reset before headers</p>" * 2000 + "</body></html>")
+
+
+def rate(fn, iterations):
+    """초당 실행 횟수"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"🧮 JSON 백엔드: {fast_json.BACKEND}")
+    responses = [(name, httpx.Response(200, content=json.dumps(payload).encode('utf-8'))) for name, payload in PAYLOADS]
+
+    print("\n🔍 디코딩 결과 일치 확인")
+    same = all(response.json() == fast_json.response_json(response) for _, response in responses)
+    print(f"  {'✅' if same else '❌'}")
+
+    print(f"\n⏱️ 초당 디코딩 수 (기본 {iterations}회, 큰 본문은 비례해서 줄임)")
+    print(f"  {'응답':<20} {'크기':>9} {'response.json()':>16} {'fast_json':>12} {'배율':>6}")
+    for name, response in responses:
+        size = len(response.content)
+        count = max(20, iterations * 200 // max(size, 200))
+        before = rate(response.json, count)
+        after = rate(lambda: fast_json.response_json(response), count)
+        print(f"  {name:<20} {size:>8,}B {before:>14,.0f}/s {after:>10,.0f}/s {after / before:>5.1f}x")
+
+    print("\n⏱️ 오류 경로 (502 HTML 본문)")
+    count = max(20, iterations // 50)
+    results = []
+    for label, make in (("response.text", lambda r: r.text), ("fast_json.error_text", fast_json.error_text)):
+        # response.text는 응답 객체에 캐시되므로 매번 새 응답으로 측정
+        pages = [httpx.Response(502, content=ERROR_PAGE.encode('utf-8')) for _ in range(count)]
+        started = time.perf_counter()
+        for page in pages:
+            make(page)
+        results.append((label, count / (time.perf_counter() - started)))
+    for label, per_second in results:
+        print(f"  {label:<22} {per_second:>12,.0f} /s")
+
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
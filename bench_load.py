@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+부하 테스트 / 지연 시간 벤치마크
+
+로컬 가짜 서버(fake_rest_server.py)를 XT, Backpack, 텔레그램 API 대신 띄우고,
+가상 사용자 N명이 /trade 명령, 잔고 조회, 메뉴 콜백을 반복하도록
+텔레그램 업데이트를 만들어 봇의 업데이트 처리 경로(UserUpdateProcessor 포함)에 넣습니다.
+흐름별 p50/p95/p99 지연 시간, 처리량, 오류율을 출력합니다.
+
+실행: python bench_load.py --users 50 --iterations 5 --latency 0.02 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from telegram import Update
+
+from fake_rest_server import FakeRestServer
+
+BOT_TOKEN = '123456:' + 'A' * 35
+BACKPACK_PRIVATE_KEY = base64.b64encode(bytes(range(32))).decode()
+ERROR_MARKERS = ('❌', '조회 실패')
+
+FLOWS = {
+    'trade_xt': ('message', '/trade xt btc_usdt buy market 0.01'),
+    'trade_backpack': ('message', '/trade backpack BTC long market 0.01 5'),
+    'balance': ('callback', 'balance_all'),
+    'menu': ('callback', 'balance_menu'),
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class UpdateFactory:
+    """가상 사용자의 텔레그램 업데이트 JSON 생성"""
+
+    def __init__(self):
+        self.update_id = 0
+        self.message_id = 0
+
+    def _user(self, user_id):
+        return {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+
+    def _message(self, user_id, text, from_bot=False):
+        self.message_id += 1
+        return {
+            'message_id': self.message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': True, 'first_name': 'bench'} if from_bot else self._user(user_id),
+            'text': text,
+        }
+
+    def message(self, user_id, text):
+        self.update_id += 1
+        data = {'update_id': self.update_id, 'message': self._message(user_id, text)}
+        if text.startswith('/'):
+            command = text.split()[0]
+            data['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return data
+
+    def callback(self, user_id, callback_data):
+        self.update_id += 1
+        return {'update_id': self.update_id, 'callback_query': {
+            'id': str(self.update_id),
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'message': self._message(user_id, 'menu', from_bot=True),
+            'data': callback_data,
+        }}
+
+
+async def run(args):
+    servers = {
+        name: await FakeRestServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+        for name in ('xt', 'backpack')
+    }
+    telegram = await FakeRestServer().start()
+    db_dir = tempfile.mkdtemp(prefix='bench_load_')
+    os.environ.update({
+        'XT_FUTURES_BASE_URL': servers['xt'].url,
+        'XT_SPOT_BASE_URL': servers['xt'].url,
+        'BACKPACK_BASE_URL': f"{servers['backpack'].url}/api/v1",
+        'TELEGRAM_BASE_URL': f"{telegram.url}/bot",
+        'USER_DB_PATH': os.path.join(db_dir, 'bench.db'),
+        'MARKET_STREAM_ENABLED': '0',
+        'LOG_FILE': '',
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'ERROR'),
+    })
+    bot = importlib.import_module('app')
+    bot.init_database()
+    telegram_app = bot.TelegramApp(BOT_TOKEN)
+    application = telegram_app.app
+    await application.initialize()
+
+    user_ids = [100000 + i for i in range(args.users)]
+    for user_id in user_ids:
+        await bot.save_user_api_keys(user_id, 'xt', f'bench-key-{user_id}', 'bench-secret')
+        await bot.save_user_api_keys(user_id, 'backpack', f'bench-key-{user_id}', BACKPACK_PRIVATE_KEY)
+
+    factory = UpdateFactory()
+    flows = [name for name in args.flows.split(',') if name in FLOWS]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    async def virtual_user(user_id):
+        for _ in range(args.iterations):
+            for flow in flows:
+                kind, payload = FLOWS[flow]
+                data = factory.message(user_id, payload) if kind == 'message' else factory.callback(user_id, payload)
+                update = Update.de_json(data, application.bot)
+                sent_before = len(telegram.sent[user_id])
+                started = time.perf_counter()
+                try:
+                    await application.update_processor.process_update(update, application.process_update(update))
+                    replies = telegram.sent[user_id][sent_before:]
+                    if not replies or any(marker in text for text in replies for marker in ERROR_MARKERS):
+                        errors[flow] += 1
+                except Exception:
+                    errors[flow] += 1
+                latencies[flow].append(time.perf_counter() - started)
+                if args.think_time:
+                    await asyncio.sleep(random.uniform(0, args.think_time))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[virtual_user(user_id) for user_id in user_ids])
+    elapsed = time.perf_counter() - started
+
+    print(f"🚀 부하 테스트: 사용자 {args.users}명 × {args.iterations}회, 흐름 {', '.join(flows)}")
+    print(f"   거래소 지연 {args.latency * 1000:.0f}ms (+0~{args.jitter * 1000:.0f}ms), 오류 주입 {args.error_rate:.1%}")
+    print("=" * 78)
+    print(f"{'흐름':<16}{'건수':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'최대(ms)':>10}{'오류율':>10}")
+    total = 0
+    total_errors = 0
+    for flow in flows:
+        values = latencies[flow]
+        total += len(values)
+        total_errors += errors[flow]
+        print(f"{flow:<16}{len(values):>8}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+              f"{errors[flow] / len(values):>10.1%}")
+    print("=" * 78)
+    print(f"처리량: {total / elapsed:.1f} 흐름/초 ({total}건, {elapsed:.2f}초), 전체 오류율 {total_errors / max(total, 1):.1%}")
+    exchange_requests = sum(sum(server.requests.values()) for server in servers.values())
+    print(f"거래소 요청: {exchange_requests}건 (주입된 오류 {sum(s.errors for s in servers.values())}건)")
+    print(f"시세 캐시: {bot.market_cache.stats()}")
+    print(f"속도 제한: {bot.rate_limiter.stats()}")
+    print(f"업데이트 처리기: {application.update_processor.stats()}")
+
+    await application.shutdown()
+    await bot.http_client.close_client()
+    bot.user_store.close()
+    for server in (*servers.values(), telegram):
+        await server.stop()
+    shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='봇 부하 테스트')
+    parser.add_argument('--users', type=int, default=20, help='가상 사용자 수')
+    parser.add_argument('--iterations', type=int, default=3, help='사용자별 반복 횟수')
+    parser.add_argument('--flows', default=','.join(FLOWS), help=f"실행할 흐름 ({', '.join(FLOWS)})")
+    parser.add_argument('--latency', type=float, default=0.02, help='거래소 응답 지연(초)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='추가 무작위 지연 최대값(초)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500 응답 비율 (0~1)')
+    parser.add_argument('--think-time', type=float, default=0.0, help='흐름 사이 최대 대기(초)')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+호가창 마이크로 벤치마크
+
+레벨 수를 바꿔 가며 "증분 1건 적용 + 누적 잔량 조회 + 시장가 VWAP 조회" 한 번에 걸리는 시간을
+order_book.BookSide(펜윅 트리)와 정렬 배열 + 누적 합 재계산 방식(이전 구현)으로 비교합니다.
+두 방식의 조회 결과가 같은지도 확인합니다.
+
+실행: python bench_order_book.py [반복 횟수]
+"""
+
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from order_book import BookSide
+
+
+class ArrayBookSide:
+    """비교용: 정렬 배열 + 조회 때 누적 합 재계산 (레벨 변경·조회 O(n))"""
+
+    def __init__(self):
+        self.keys = array('d')
+        self.sizes = array('d')
+
+    def set_level(self, price, size):
+        i = bisect_left(self.keys, price)
+        exists = i < len(self.keys) and self.keys[i] == price
+        if size <= 0:
+            if exists:
+                del self.keys[i]
+                del self.sizes[i]
+        elif exists:
+            self.sizes[i] = size
+        else:
+            self.keys.insert(i, price)
+            self.sizes.insert(i, size)
+
+    def _prefix_sums(self):
+        cum_size, cum_notional = [], []
+        size_total = notional_total = 0.0
+        for key, size in zip(self.keys, self.sizes):
+            size_total += size
+            notional_total += key * size
+            cum_size.append(size_total)
+            cum_notional.append(notional_total)
+        return cum_size, cum_notional
+
+    def depth_to_price(self, price):
+        cum_size, _ = self._prefix_sums()
+        i = bisect_right(self.keys, price)
+        return cum_size[i - 1] if i else 0.0
+
+    def fill(self, size):
+        cum_size, cum_notional = self._prefix_sums()
+        i = bisect_left(cum_size, size)
+        if i >= len(cum_size):
+            return cum_notional[-1] / cum_size[-1], cum_size[-1], self.keys[-1]
+        prev_size = cum_size[i - 1] if i else 0.0
+        prev_notional = cum_notional[i - 1] if i else 0.0
+        return (prev_notional + (size - prev_size) * self.keys[i]) / size, size, self.keys[i]
+
+
+def build(side, levels, rng):
+    for i in range(levels):
+        side.set_level(round(50000 + i * 0.1, 1), round(rng.uniform(0.1, 5), 3))
+
+
+def step(side, levels, rng):
+    """증분 1건 + 조회 2건"""
+    price = round(50000 + rng.randrange(levels) * 0.1, 1)
+    side.set_level(price, round(rng.uniform(0.1, 5), 3) if rng.random() < 0.8 else 0.0)
+    side.depth_to_price(price)
+    side.fill(25.0)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("🔍 조회 결과 일치 확인")
+    rng = random.Random(1)
+    fenwick, reference = BookSide(is_bid=False), ArrayBookSide()
+    same = True
+    for _ in range(3000):
+        price = round(50000 + rng.randrange(500) * 0.1, 1)
+        size = round(rng.uniform(0.1, 5), 3) if rng.random() < 0.7 else 0.0
+        fenwick.set_level(price, size)
+        reference.set_level(price, size)
+        if reference.keys:
+            a, b = fenwick.fill(40.0), reference.fill(40.0)
+            same = same and abs(a[0] - b[0]) < 1e-6 and abs(a[1] - b[1]) < 1e-9 and a[2] == b[2]
+            same = same and abs(fenwick.depth_to_price(price) - reference.depth_to_price(price)) < 1e-6
+    print(f"  {'✅' if same else '❌'}")
+
+    print(f"\n⏱️ 증분 1건 + 누적 잔량 + VWAP 조회 ({iterations}회 평균)")
+    print(f"  {'레벨 수':>8} {'정렬 배열':>12} {'펜윅 트리':>12} {'배율':>6}")
+    for levels in (20, 200, 2000, 20000):
+        timings = []
+        for side in (ArrayBookSide(), BookSide(is_bid=False)):
+            rng = random.Random(levels)
+            build(side, levels, rng)
+            count = iterations if levels <= 2000 else max(20, iterations // 10)
+            started = time.perf_counter()
+            for _ in range(count):
+                step(side, levels, rng)
+            timings.append((time.perf_counter() - started) / count * 1e6)
+        before, after = timings
+        print(f"  {levels:>8,} {before:>10.1f}µs {after:>10.1f}µs {before / after:>5.1f}x")
+
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
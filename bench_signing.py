@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+서명 마이크로 벤치마크
+
+요청마다 키를 다시 만드는 기존 방식과 signing.py의 재사용 서명 객체를
+초당 서명 수로 비교합니다. 같은 timestamp에서 서명이 같은지도 확인합니다.
+ - 문자열·실수 파라미터: 기존 방식과 같은 서명
+ - 정수·bool 파라미터(clientId, leverage, reduceOnly): 기존 Backpack 방식은 '5.0'/'1.0'으로 서명해
+   JSON body의 5/true와 달랐으므로, 거래소처럼 실제 JSON body 값으로 다시 만든 서명 문자열과 비교
+
+실행: python bench_signing.py [반복 횟수]
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import sys
+import time
+
+from nacl.signing import SigningKey
+
+from signing import BackpackSigner, XtSigner, canonical_query
+
+API_KEY = "bench-api-key"
+XT_SECRET = "bench-secret-0123456789abcdef"
+BACKPACK_PRIVATE_KEY = base64.b64encode(bytes(range(32))).decode()
+ORDER_PARAMS = {
+    'symbol': 'BTC_USDC_PERP',
+    'side': 'Bid',
+    'orderType': 'Limit',
+    'quantity': '0.001',
+    'price': '50000.5',
+    'timeInForce': 'GTC',
+}
+# 실수 값 (기존 방식도 같은 문자열로 서명)
+FLOAT_PARAMS = {
+    'symbol': 'BTC_USDC_PERP',
+    'quantity': 0.001,
+    'price': 50000.5,
+    'triggerPrice': 49999.12345678,
+}
+# 정수·bool 값 (어댑터가 보내는 주문 body와 같은 형태)
+INT_PARAMS = {
+    'symbol': 'BTC_USDC_PERP',
+    'side': 'Ask',
+    'orderType': 'Market',
+    'quantity': '1',
+    'clientId': 757047164,
+    'leverage': 5,
+    'reduceOnly': True,
+}
+TIMESTAMP = 1700000000000
+
+
+def legacy_xt(params, timestamp):
+    """기존 _get_headers_xt 서명 방식"""
+    query_string = '&'.join([f"{k}={str(v)}" for k, v in sorted(params.items())])
+    sign_string = f"access_key={API_KEY}&{query_string}&timestamp={timestamp}"
+    return hmac.new(XT_SECRET.encode('utf-8'), sign_string.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def legacy_backpack(params, timestamp):
+    """기존 _get_headers_backpack 서명 방식 (매번 키 디코딩)"""
+    signing_key = SigningKey(base64.b64decode(BACKPACK_PRIVATE_KEY))
+    parts = []
+    for k, v in sorted(params.items()):
+        if isinstance(v, (int, float)):
+            v = str(round(float(v), 8))
+        parts.append(f"{k}={v}")
+    sign_str = "instruction=orderExecute&" + "&".join(parts) + f"&timestamp={timestamp}&window=5000"
+    return base64.b64encode(signing_key.sign(sign_str.encode('utf-8')).signature).decode('utf-8')
+
+
+def body_query(params):
+    """거래소가 받은 JSON body로 다시 만드는 서명 파라미터 (값은 body에 실린 텍스트 그대로)"""
+    body = json.loads(json.dumps(params))
+    return '&'.join(f"{k}={v if isinstance(v, str) else json.dumps(v)}" for k, v in sorted(body.items()))
+
+
+def body_xt(params, timestamp):
+    sign_string = f"access_key={API_KEY}&{body_query(params)}&timestamp={timestamp}"
+    return hmac.new(XT_SECRET.encode('utf-8'), sign_string.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def body_backpack(params, timestamp):
+    signing_key = SigningKey(base64.b64decode(BACKPACK_PRIVATE_KEY))
+    sign_str = f"instruction=orderExecute&{body_query(params)}&timestamp={timestamp}&window=5000"
+    return base64.b64encode(signing_key.sign(sign_str.encode('utf-8')).signature).decode('utf-8')
+
+
+def rate(fn, iterations):
+    """초당 실행 횟수"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    xt_signer = XtSigner(API_KEY, XT_SECRET)
+    backpack_signer = BackpackSigner(API_KEY, BACKPACK_PRIVATE_KEY)
+
+    print("🔏 서명 일치 확인")
+    checks = []
+    for name, params in (("문자열", ORDER_PARAMS), ("실수", FLOAT_PARAMS)):
+        xt_same = xt_signer.sign(params, TIMESTAMP)[0] == legacy_xt(params, TIMESTAMP)
+        bp_same = backpack_signer.sign('orderExecute', params, TIMESTAMP)[0] == legacy_backpack(params, TIMESTAMP)
+        checks += [xt_same, bp_same]
+        print(f"  {name} 파라미터 = 기존 방식  XT: {'✅' if xt_same else '❌'}  Backpack: {'✅' if bp_same else '❌'}")
+    for name, params in (("실수", FLOAT_PARAMS), ("정수·bool", INT_PARAMS)):
+        xt_same = xt_signer.sign(params, TIMESTAMP)[0] == body_xt(params, TIMESTAMP)
+        bp_same = backpack_signer.sign('orderExecute', params, TIMESTAMP)[0] == body_backpack(params, TIMESTAMP)
+        checks += [xt_same, bp_same]
+        print(f"  {name} 파라미터 = JSON body  XT: {'✅' if xt_same else '❌'}  Backpack: {'✅' if bp_same else '❌'}")
+    legacy_int = legacy_backpack(INT_PARAMS, TIMESTAMP) == body_backpack(INT_PARAMS, TIMESTAMP)
+    print(f"  (참고) 기존 Backpack 방식의 정수·bool 서명 = JSON body: {'✅' if legacy_int else '❌'}")
+
+    print(f"\n⏱️ 초당 서명 수 ({iterations}회)")
+    results = [
+        ("파라미터 직렬화", rate(lambda: canonical_query(ORDER_PARAMS), iterations)),
+        ("XT 기존", rate(lambda: legacy_xt(ORDER_PARAMS, TIMESTAMP), iterations)),
+        ("XT XtSigner", rate(lambda: xt_signer.sign(ORDER_PARAMS, TIMESTAMP), iterations)),
+        ("Backpack 기존", rate(lambda: legacy_backpack(ORDER_PARAMS, TIMESTAMP), iterations // 4)),
+        ("Backpack BackpackSigner", rate(lambda: backpack_signer.sign('orderExecute', ORDER_PARAMS, TIMESTAMP), iterations // 4)),
+    ]
+    for name, per_second in results:
+        print(f"  {name:<24} {per_second:>12,.0f} /s")
+
+    if not all(checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,728 @@
+"""
+거래소 어댑터
+
+UnifiedFuturesTrader가 메서드마다 거래소별 if/elif로 나누던 URL 구성, 서명, 응답 해석, 오류 메시지를
+거래소 어댑터 클래스 하나로 모았습니다. 트레이더는 생성 시 어댑터를 한 번 고르고, 이후 호출은
+분기 없이 어댑터 메서드로 바로 갑니다.
+ - RestAdapter: 요청 전송(속도 제한·호출 정책·지표)과 공통 흐름 (요청 구성 → 전송 → 응답 해석)
+ - XtAdapter / BackpackAdapter: 요청 구성·서명·응답 해석만 구현
+ - CcxtAdapter: 등록되지 않은 거래소는 ccxt(동기 라이브러리)를 스레드에서 호출 (호출 정책은 RestAdapter와 같음)
+새 거래소는 ExchangeAdapter를 상속한 클래스를 @register_adapter로 등록하면 됩니다.
+어댑터는 트레이더 없이도 만들 수 있어 거래소별로 따로 측정할 수 있습니다.
+
+환경 변수:
+    XT_FUTURES_BASE_URL, XT_SPOT_BASE_URL, BACKPACK_BASE_URL   (로컬 가짜 서버로 부하 테스트할 때 변경)
+    CCXT_QUOTE        ccxt 심볼에 쓰는 기본 결제 통화 (기본 USDT)
+"""
+
+import abc
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import httpx
+
+import http_client
+import metrics
+from exchange_policy import ExchangeError, error_result, new_client_order_id, request_policy
+from fast_json import error_text, response_json
+from rate_limiter import endpoint_class, rate_limiter
+from signing import BackpackSigner, XtSigner
+from symbol_registry import symbol_registry
+
+logger = logging.getLogger(__name__)
+
+PYXTLIB_AVAILABLE = False
+try:
+    from pyxt import XTClient
+    PYXTLIB_AVAILABLE = True
+except ImportError:
+    logger.warning("pyxt 라이브러리가 설치되지 않았습니다. 기본 HTTP 요청을 사용합니다.")
+
+XT_FUTURES_BASE_URL = os.getenv('XT_FUTURES_BASE_URL', 'https://fapi.xt.com')
+XT_SPOT_BASE_URL = os.getenv('XT_SPOT_BASE_URL', 'https://sapi.xt.com')
+BACKPACK_BASE_URL = os.getenv('BACKPACK_BASE_URL', 'https://api.backpack.exchange/api/v1')
+BACKPACK_BATCH_SIZE = 20
+CCXT_QUOTE = os.getenv('CCXT_QUOTE', 'USDT')
+
+MARKET_LABELS = {'futures': '선물', 'spot': '스팟'}
+DATA_TYPES = ('ticker', 'depth', 'kline')
+# 캔들 주기 → 초
+INTERVAL_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '12h': 43200, '1d': 86400,
+}
+
+ADAPTERS = {}
+
+
+def register_adapter(cls):
+    """거래소 이름(cls.name)으로 어댑터 클래스 등록"""
+    ADAPTERS[cls.name] = cls
+    return cls
+
+
+def create_adapter(exchange, api_key=None, api_secret=None):
+    """거래소 어댑터 생성 (등록된 어댑터 우선, 없으면 ccxt)"""
+    cls = ADAPTERS.get(exchange)
+    if cls is not None:
+        return cls(api_key, api_secret)
+    return CcxtAdapter(exchange, api_key, api_secret)
+
+
+def _market_prefix(market_type):
+    return '' if market_type == 'futures' else '스팟 '
+
+
+def _order_side(spec):
+    return 'buy' if spec['side'] in ('buy', 'long') else 'sell'
+
+
+def _order_result(order_id, order, message, filled_qty=None, fill_price=None):
+    """주문 성공 결과
+
+    quantity/price는 심볼 규칙에 맞춰 실제로 보낸 값, filled_qty/fill_price는 거래소가 알려준 체결 값(있을 때만).
+    """
+    _, quantity, price = order
+    result = {
+        'status': 'success',
+        'order_id': order_id,
+        'quantity': float(quantity),
+        'price': float(price) if price else None,
+        'message': message,
+    }
+    if filled_qty:
+        result['filled_qty'] = float(filled_qty)
+    if fill_price:
+        result['fill_price'] = float(fill_price)
+    return result
+
+
+def candle_time(value):
+    """캔들 시작 시각 → 밀리초 (밀리초/초 숫자, 숫자 문자열, 'YYYY-MM-DD HH:MM:SS' UTC 문자열)"""
+    if isinstance(value, str) and not value.isdigit():
+        parsed = datetime.fromisoformat(value.replace(' ', 'T').rstrip('Z'))
+        return int(parsed.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    value = int(float(value))
+    return value * 1000 if value < 10 ** 11 else value
+
+
+def _candle_row(start, open_, high, low, close, volume):
+    """(시작 시각 ms, 시가, 고가, 저가, 종가, 거래량) 실수 튜플"""
+    close = float(close)
+    return (
+        float(candle_time(start)),
+        float(open_ if open_ not in (None, '') else close),
+        float(high if high not in (None, '') else close),
+        float(low if low not in (None, '') else close),
+        close,
+        float(volume or 0),
+    )
+
+
+class ExchangeAdapter(abc.ABC):
+    """거래소 어댑터 인터페이스 (결과는 {'status': 'success'/'error', ...} dict)"""
+
+    name = None
+    label = None
+    # 일괄 주문 한 번에 보낼 수 있는 최대 건수 (0이면 주문마다 개별 제출)
+    batch_size = 0
+
+    def __init__(self, api_key=None, api_secret=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+
+    def normalize_order(self, spec):
+        """(거래소 심볼, 수량, 가격). 규칙에 맞지 않으면 ValueError"""
+        return symbol_registry.normalize_order(self.name, spec['market_type'], spec['symbol'], spec['size'], spec['price'])
+
+    @abc.abstractmethod
+    async def test_connection(self):
+        ...
+
+    @abc.abstractmethod
+    async def place_order(self, spec, action):
+        """정규화된 주문(spec) 하나 제출. action은 메시지용 이름 ('롱 포지션 오픈' 등)
+
+        성공 결과에는 실제로 보낸 quantity/price와, 거래소가 알려주면 filled_qty/fill_price가 들어갑니다.
+        """
+
+    async def place_batch(self, specs):
+        """주문 여러 개를 한 번에 제출 (batch_size > 0인 어댑터만)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def fetch_balance(self, market_type):
+        ...
+
+    @abc.abstractmethod
+    async def fetch_market_data(self, market_type, symbol, data_type):
+        ...
+
+    @abc.abstractmethod
+    async def fetch_klines(self, market_type, symbol, interval, limit):
+        """캔들 조회. data는 시작 시각 순서와 상관없는 (시작 ms, 시가, 고가, 저가, 종가, 거래량) 목록"""
+
+    @abc.abstractmethod
+    async def fetch_position(self, market_type, symbol):
+        """거래소 포지션 조회. positions는 {'long': 수량, 'short': 수량} (헤지 모드면 둘 다 있을 수 있음)"""
+
+    async def get_listen_key(self, market_type):
+        raise NotImplementedError(f"{self.label}은(는) listen key를 지원하지 않습니다.")
+
+
+class RestAdapter(ExchangeAdapter):
+    """공용 HTTP 클라이언트로 REST API를 호출하는 어댑터
+
+    하위 클래스는 (method, url, kwargs) 요청을 만드는 *_request 메서드와 응답 해석(parse_*)만 구현합니다.
+    서명이 필요한 요청은 kwargs에 헤더 대신 sign(헤더를 만드는 함수)을 넣습니다.
+    """
+
+    async def request(self, method, url, sign=None, **kwargs):
+        """타임아웃·재시도·서킷 브레이커 정책을 적용해 요청 전송
+
+        sign은 서명 헤더를 만드는 함수로, 재시도 때마다 새 타임스탬프로 다시 서명합니다.
+        """
+        def build():
+            return dict(kwargs, headers=sign()) if sign else dict(kwargs)
+        return await request_policy.call(method, url, self._send, build)
+
+    async def _send(self, method, url, **kwargs):
+        """속도 제한 예산 안에서 공용 비동기 HTTP 클라이언트로 요청 전송"""
+        signed = 'headers' in kwargs
+        kind = endpoint_class(method, url, signed)
+        await rate_limiter.acquire(self.name, kind, self.api_key if signed else None)
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = await http_client.request(method, url, **kwargs)
+            status = response.status_code
+        finally:
+            metrics.EXCHANGE_LATENCY.observe(time.perf_counter() - started, self.name, urlsplit(url).path, status)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get('Retry-After', '1'))
+            except ValueError:
+                retry_after = 1.0
+            rate_limiter.penalize(self.name, retry_after)
+        return response
+
+    def _signed(self, sign, *args):
+        """서명 시간을 기록하며 서명 헤더 생성"""
+        started = time.perf_counter()
+        headers = sign(*args)
+        metrics.SIGNING_LATENCY.observe(time.perf_counter() - started, self.name)
+        return headers
+
+    # --------- 하위 클래스 구현 ---------
+    @abc.abstractmethod
+    def test_request(self):
+        ...
+
+    @abc.abstractmethod
+    def order_request(self, spec, order):
+        """order: normalize_order 결과 (거래소 심볼, 수량, 가격)"""
+
+    @abc.abstractmethod
+    def parse_order_id(self, data):
+        ...
+
+    def parse_fill(self, data):
+        """주문 응답의 (체결 수량, 평균 체결가). 응답에 없으면 (None, None)"""
+        return None, None
+
+    @abc.abstractmethod
+    def balance_request(self, market_type):
+        ...
+
+    def parse_balance(self, data, market_type):
+        return {'status': 'success', 'balance': data, 'message': f'{self.label} {MARKET_LABELS[market_type]} 잔고 조회 성공'}
+
+    @abc.abstractmethod
+    def market_request(self, market_type, symbol, data_type):
+        """시세 요청 (지원하지 않는 data_type이면 None)"""
+
+    def parse_market(self, data):
+        return data
+
+    @abc.abstractmethod
+    def kline_request(self, market_type, symbol, interval, limit):
+        ...
+
+    @abc.abstractmethod
+    def position_request(self, market_type, symbol):
+        ...
+
+    @abc.abstractmethod
+    def parse_position(self, data, market_type, symbol):
+        """{'long': 수량, 'short': 수량}"""
+
+    @abc.abstractmethod
+    def parse_klines(self, data):
+        ...
+
+    # --------- 공통 흐름 ---------
+    async def test_connection(self):
+        method, url, kwargs = self.test_request()
+        response = await self.request(method, url, **kwargs)
+        if response.status_code != 200:
+            return error_result(f'{self.label} API 연결 실패: {response.status_code} - {error_text(response)}', response=response)
+        return {'status': 'success', 'message': f'{self.label} API 연결 성공'}
+
+    async def place_order(self, spec, action):
+        order = self.normalize_order(spec)
+        method, url, kwargs = self.order_request(spec, order)
+        response = await self.request(method, url, **kwargs)
+        if response.status_code != 200:
+            return error_result(f'{self.label} {action} 실패: {response.status_code} - {error_text(response)}', response=response)
+        data = response_json(response)
+        return _order_result(self.parse_order_id(data), order, f'{self.label} {action} 성공', *self.parse_fill(data))
+
+    async def fetch_balance(self, market_type):
+        method, url, kwargs = self.balance_request(market_type)
+        response = await self.request(method, url, **kwargs)
+        if response.status_code != 200:
+            return error_result(
+                f'{self.label} {MARKET_LABELS[market_type]} 잔고 조회 실패: {response.status_code} - {error_text(response)}',
+                response=response)
+        return self.parse_balance(response_json(response), market_type)
+
+    async def fetch_market_data(self, market_type, symbol, data_type):
+        request = self.market_request(market_type, symbol, data_type)
+        if request is None:
+            return {'status': 'error', 'message': f'지원하지 않는 데이터 타입: {data_type}'}
+        method, url, kwargs = request
+        response = await self.request(method, url, **kwargs)
+        prefix = _market_prefix(market_type)
+        if response.status_code != 200:
+            return error_result(f'{self.label} {prefix}{data_type} 데이터 조회 실패: {response.status_code}', response=response)
+        return {'status': 'success', 'data': self.parse_market(response_json(response)), 'message': f'{self.label} {prefix}{data_type} 데이터 조회 성공'}
+
+    async def fetch_position(self, market_type, symbol):
+        method, url, kwargs = self.position_request(market_type, symbol)
+        response = await self.request(method, url, **kwargs)
+        if response.status_code != 200:
+            return error_result(f'{self.label} 포지션 조회 실패: {response.status_code} - {error_text(response)}', response=response)
+        positions = self.parse_position(response_json(response), market_type, symbol)
+        return {'status': 'success', 'positions': positions, 'message': f'{self.label} 포지션 조회 성공'}
+
+    async def fetch_klines(self, market_type, symbol, interval, limit):
+        method, url, kwargs = self.kline_request(market_type, symbol, interval, limit)
+        response = await self.request(method, url, **kwargs)
+        prefix = _market_prefix(market_type)
+        if response.status_code != 200:
+            return error_result(f'{self.label} {prefix}캔들 조회 실패: {response.status_code} - {error_text(response)}', response=response)
+        return {'status': 'success', 'data': self.parse_klines(response_json(response)), 'message': f'{self.label} {prefix}캔들 조회 성공'}
+
+
+@register_adapter
+class XtAdapter(RestAdapter):
+    """XT (HMAC 서명, 선물·스팟 호스트 분리)"""
+
+    name = 'xt'
+    label = 'XT'
+
+    def __init__(self, api_key=None, api_secret=None):
+        super().__init__(api_key, api_secret)
+        self.base_url = XT_FUTURES_BASE_URL
+        self.spot_base_url = XT_SPOT_BASE_URL
+        self.signer = XtSigner(api_key, api_secret) if api_key and api_secret else None
+
+    def headers(self, params=None):
+        """XT API 헤더 생성"""
+        if self.signer is None:
+            raise ValueError('XT API 키가 설정되지 않았습니다.')
+        return self._signed(self.signer.headers, params)
+
+    def test_request(self):
+        return 'GET', f"{self.base_url}/v4/public/time", {}
+
+    def order_params(self, spec, order):
+        """XT 주문 파라미터 (order: 심볼 규칙에 맞춰 반올림한 (심볼, 수량, 가격))"""
+        symbol, quantity, price = order
+        params = {
+            'symbol': symbol,
+            'side': _order_side(spec),
+            'type': spec['order_type'],
+            'quantity': quantity,
+            'clientOrderId': str(new_client_order_id())
+        }
+        if spec['order_type'] == 'limit' and price:
+            params['price'] = price
+        if spec['market_type'] == 'futures' and spec['leverage'] > 1:
+            params['leverage'] = spec['leverage']
+        if spec.get('reduce_only'):
+            # 헤지 모드에서는 positionSide가 있어야 반대 포지션을 새로 열지 않고 기존 포지션을 줄임
+            params['reduceOnly'] = True
+            if spec.get('position_side'):
+                params['positionSide'] = spec['position_side'].upper()
+        return params
+
+    def order_request(self, spec, order):
+        params = self.order_params(spec, order)
+        return 'POST', f"{self.base_url}/v4/order", {'sign': lambda: self.headers(params), 'json': params}
+
+    def parse_order_id(self, data):
+        return (data.get('result') or {}).get('orderId') or data.get('orderId', 'unknown')
+
+    def balance_request(self, market_type):
+        if market_type == 'futures':
+            url = f"{self.base_url}/v4/account/futures/balance"
+        else:
+            url = f"{self.spot_base_url}/v4/account/spot/balance"
+        return 'GET', url, {'sign': self.headers}
+
+    def parse_balance(self, data, market_type):
+        if data.get('rc') != 0:
+            return {'status': 'error', 'message': f'XT {MARKET_LABELS[market_type]} 잔고 조회 실패: {data.get("mc", "Unknown error")}'}
+        return super().parse_balance(data.get('result', {}), market_type)
+
+    def _get_pyxt_balance(self, market_type):
+        """pyxt 라이브러리 잔고 조회 (블로킹 호출이므로 스레드에서 실행)"""
+        xt_client = XTClient(self.api_key, self.api_secret)
+        if market_type == 'futures':
+            if xt_client.futures is None:
+                raise Exception("XTClient futures client initialization failed")
+            return xt_client.get_futures_balance()
+        if xt_client.spot is None:
+            raise Exception("XTClient spot client initialization failed")
+        return xt_client.get_spot_balance()
+
+    async def fetch_balance(self, market_type):
+        """pyxt가 있으면 먼저 시도하고, 실패하면 REST로 조회"""
+        if PYXTLIB_AVAILABLE:
+            try:
+                balance_result = await asyncio.to_thread(self._get_pyxt_balance, market_type)
+                if balance_result.get('status') == 'success':
+                    return super().parse_balance(balance_result.get('balance'), market_type)
+                raise Exception(f"pyxt error: {balance_result.get('message')}")
+            except Exception as e:
+                logger.error(f"pyxt 라이브러리 {MARKET_LABELS[market_type]} 잔고 조회 실패: {e}")
+        return await super().fetch_balance(market_type)
+
+    def market_request(self, market_type, symbol, data_type):
+        base_url = self.base_url if market_type == 'futures' else self.spot_base_url
+        if data_type == 'ticker':
+            url = f"{base_url}/v4/public/ticker/24hr"
+            if symbol:
+                url += f"?symbol={symbol}"
+            return 'GET', url, {}
+        if data_type == 'depth':
+            return 'GET', f"{base_url}/v4/public/depth", {'params': {'symbol': symbol, 'limit': 10}}
+        if data_type == 'kline':
+            return 'GET', f"{base_url}/v4/public/kline", {'params': {'symbol': symbol, 'interval': '1m', 'limit': 10}}
+        return None
+
+    def parse_market(self, data):
+        return data.get('result', {})
+
+    def kline_request(self, market_type, symbol, interval, limit):
+        base_url = self.base_url if market_type == 'futures' else self.spot_base_url
+        return 'GET', f"{base_url}/v4/public/kline", {'params': {'symbol': symbol_registry.native('xt', market_type, symbol), 'interval': interval, 'limit': limit}}
+
+    def position_request(self, market_type, symbol):
+        params = {'symbol': symbol_registry.native('xt', market_type, symbol)}
+        return 'GET', f"{self.base_url}/future/user/v1/position", {'params': params, 'sign': lambda: self.headers(params)}
+
+    def parse_position(self, data, market_type, symbol):
+        native = symbol_registry.native('xt', market_type, symbol)
+        positions = {'long': 0.0, 'short': 0.0}
+        for item in data.get('result') or []:
+            side = str(item.get('positionSide', '')).lower()
+            if item.get('symbol', native) == native and side in positions:
+                positions[side] += abs(float(item.get('positionSize') or 0))
+        return positions
+
+    def parse_klines(self, data):
+        # q: 거래량, v: 거래대금
+        return [
+            _candle_row(item['t'], item.get('o'), item.get('h'), item.get('l'), item['c'], item.get('q', item.get('v')))
+            for item in data.get('result') or []
+        ]
+
+    async def get_listen_key(self, market_type):
+        """XT 개인 스트림 listen key 발급 (스팟: ws-token, 선물: listen-key)"""
+        if market_type == 'spot':
+            response = await self.request('POST', f"{self.spot_base_url}/v4/ws-token", sign=self.headers)
+        else:
+            response = await self.request('GET', f"{self.base_url}/future/user/v1/user/listen-key", sign=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"XT listen key 발급 실패: {response.status_code} - {error_text(response)}")
+        result = response_json(response).get('result')
+        listen_key = result.get('accessToken') if isinstance(result, dict) else result
+        if not listen_key:
+            raise Exception(f"XT listen key 응답 오류: {error_text(response)}")
+        return listen_key
+
+
+@register_adapter
+class BackpackAdapter(RestAdapter):
+    """Backpack (Ed25519 서명, 일괄 주문 지원)"""
+
+    name = 'backpack'
+    label = 'Backpack'
+    batch_size = BACKPACK_BATCH_SIZE
+
+    def __init__(self, api_key=None, api_secret=None):
+        super().__init__(api_key, api_secret)
+        self.base_url = BACKPACK_BASE_URL
+        self._signer = None
+
+    @property
+    def signer(self):
+        """서명 키는 처음 쓸 때 한 번만 파싱"""
+        if self._signer is None:
+            self._signer = BackpackSigner(self.api_key, self.api_secret)
+        return self._signer
+
+    def headers(self, instruction, params=None):
+        """Backpack API 헤더 생성"""
+        return self._signed(self.signer.headers, instruction, params)
+
+    def test_request(self):
+        return 'GET', f"{self.base_url}/account", {'sign': lambda: self.headers("accountQuery")}
+
+    def order_body(self, spec, order):
+        """Backpack 주문 body (order: 심볼 규칙에 맞춰 반올림한 (심볼, 수량, 가격))"""
+        symbol, quantity, price = order
+        backpack_order_type = 'Market' if spec['order_type'] == 'market' else 'Limit'
+        body = {
+            "symbol": symbol,
+            "side": "Bid" if spec['side'] in ('buy', 'long') else "Ask",
+            "orderType": backpack_order_type,
+            "quantity": quantity,
+            "clientId": new_client_order_id()
+        }
+        if backpack_order_type == "Limit":
+            if price:
+                body["price"] = price
+            body["timeInForce"] = "GTC"
+        if spec['market_type'] == 'futures' and spec['leverage'] > 1:
+            body['leverage'] = str(spec['leverage'])
+        if spec.get('reduce_only'):
+            body['reduceOnly'] = True
+        return body
+
+    def order_request(self, spec, order):
+        body = self.order_body(spec, order)
+        return 'POST', f"{self.base_url}/order", {'sign': lambda: self.headers("orderExecute", body), 'json': body}
+
+    def parse_order_id(self, data):
+        return data.get('id') or data.get('orderId')
+
+    def parse_fill(self, data):
+        try:
+            filled = float(data.get('executedQuantity') or 0)
+            quote = float(data.get('executedQuoteQuantity') or 0)
+        except (TypeError, ValueError):
+            return None, None
+        return (filled, quote / filled) if filled > 0 else (None, None)
+
+    async def place_batch(self, specs):
+        """Backpack 일괄 주문 엔드포인트(/orders)로 한 번에 제출"""
+        bodies = []
+        try:
+            orders = [self.normalize_order(spec) for spec in specs]
+            bodies = [self.order_body(spec, order) for spec, order in zip(specs, orders)]
+            response = await self.request('POST', f"{self.base_url}/orders", json=bodies,
+                                          sign=lambda: self._signed(self.signer.batch_headers, "orderExecute", bodies))
+            if response.status_code != 200:
+                return [error_result(f'Backpack 일괄 주문 실패: {response.status_code} - {error_text(response)}', response=response) for _ in bodies]
+            data = response_json(response)
+            if not isinstance(data, list):
+                data = []
+            results = []
+            for order, item in zip(orders, data):
+                if isinstance(item, dict) and item.get('id'):
+                    results.append(_order_result(item.get('id'), order, 'Backpack 주문 성공', *self.parse_fill(item)))
+                else:
+                    message = item.get('message', item) if isinstance(item, dict) else item
+                    results.append(error_result(f'Backpack 주문 실패: {message}'))
+            for _ in range(len(bodies) - len(results)):
+                results.append(error_result('Backpack 일괄 주문 응답에 결과가 없습니다.'))
+            return results
+        except Exception as e:
+            logger.error(f"Batch order error: {str(e)}")
+            return [error_result(f'일괄 주문 오류: {str(e)}', e) for _ in specs]
+
+    def position_request(self, market_type, symbol):
+        return 'GET', f"{self.base_url}/position", {'sign': lambda: self.headers("positionQuery")}
+
+    def parse_position(self, data, market_type, symbol):
+        # 순포지션(netQuantity) 하나만 있음 (양수 롱, 음수 숏)
+        native = symbol_registry.native('backpack', market_type, symbol)
+        positions = {'long': 0.0, 'short': 0.0}
+        for item in data if isinstance(data, list) else []:
+            qty = float(item.get('netQuantity') or 0)
+            if item.get('symbol') == native and qty:
+                positions['long' if qty > 0 else 'short'] += abs(qty)
+        return positions
+
+    def balance_request(self, market_type):
+        # 스팟·선물 모두 같은 계좌 잔고
+        return 'GET', f"{self.base_url}/capital", {'sign': lambda: self.headers("balanceQuery")}
+
+    def market_request(self, market_type, symbol, data_type):
+        native = symbol_registry.native('backpack', market_type, symbol) if symbol else None
+        if data_type == 'ticker':
+            url = f"{self.base_url}/tickers"
+            if native:
+                url += f"?symbol={native}"
+            return 'GET', url, {}
+        if data_type == 'depth':
+            return 'GET', f"{self.base_url}/depth", {'params': {'symbol': native, 'limit': 10}}
+        if data_type == 'kline':
+            return 'GET', f"{self.base_url}/klines", {'params': {'symbol': native, 'interval': '1m', 'limit': 10}}
+        return None
+
+    def kline_request(self, market_type, symbol, interval, limit):
+        # Backpack은 개수 대신 시작 시각(초)으로 구간을 지정
+        start = int(time.time()) - INTERVAL_SECONDS[interval] * limit
+        params = {'symbol': symbol_registry.native('backpack', market_type, symbol), 'interval': interval, 'startTime': start}
+        return 'GET', f"{self.base_url}/klines", {'params': params}
+
+    def parse_klines(self, data):
+        return [
+            _candle_row(item['start'], item.get('open'), item.get('high'), item.get('low'), item['close'], item.get('volume'))
+            for item in data or []
+        ]
+
+
+class CcxtResponse:
+    """호출 정책에 넘기는 ccxt 호출 결과 (status_code만 정책이 사용)"""
+
+    def __init__(self, status_code, data=None, error=None):
+        self.status_code = status_code
+        self.data = data
+        self.error = error
+
+
+class CcxtAdapter(ExchangeAdapter):
+    """ccxt 범용 어댑터 (동기 ccxt 호출을 스레드에서 실행)
+
+    ccxt 자체 속도 제한 대신 rate_limiter 예산을, 재시도·서킷 브레이커는 REST 어댑터와 같은 request_policy를 사용합니다.
+    심볼은 'BTC' → 'BTC/USDT'(스팟), 'BTC/USDT:USDT'(선물)처럼 ccxt 통합 심볼로 바꿔 호출합니다.
+    """
+
+    MARKET_TYPES = {'futures': 'swap', 'spot': 'spot'}
+
+    def __init__(self, exchange, api_key=None, api_secret=None):
+        super().__init__(api_key, api_secret)
+        try:
+            import ccxt
+        except ImportError:
+            raise ImportError('ccxt 패키지가 필요합니다. pip install ccxt로 설치해주세요.')
+        exchange_class = getattr(ccxt, exchange, None)
+        if exchange not in ccxt.exchanges or exchange_class is None:
+            raise ValueError(f'지원하지 않는 거래소입니다: {exchange}')
+        self._ccxt = ccxt
+        self.name = exchange
+        self.client = exchange_class({
+            'apiKey': api_key,
+            'secret': api_secret,
+            'enableRateLimit': False,
+            'timeout': int(request_policy.timeout.read * 1000),
+        })
+        self.label = self.client.name or exchange
+        # 호출 정책의 서킷 브레이커 키 (실제 요청 URL은 ccxt가 구성)
+        self.url = f"ccxt://{exchange}"
+
+    def unified_symbol(self, market_type, symbol):
+        """ccxt 통합 심볼 ('BTC', 'btc_usdt', 'BTC/USDT' 모두 허용)"""
+        if '/' in symbol:
+            return symbol
+        base, _, quote = symbol.upper().replace('-', '_').partition('_')
+        quote = quote.split('_')[0] or CCXT_QUOTE
+        return f"{base}/{quote}:{quote}" if market_type == 'futures' else f"{base}/{quote}"
+
+    def normalize_order(self, spec):
+        # 수량·가격 정밀도는 ccxt가 마켓 정보로 맞춤
+        return self.unified_symbol(spec['market_type'], spec['symbol']), spec['size'], spec['price']
+
+    async def _call(self, kind, method, *args):
+        """ccxt 메서드를 호출 정책(타임아웃·재시도·서킷 브레이커)에 따라 호출
+
+        조회는 GET, 주문은 POST로 취급합니다 (주문은 요청 한도 초과 때만 재시도). 서킷 브레이커는 거래소마다 따로 둡니다.
+        """
+        http_method = 'POST' if kind == 'order' else 'GET'
+        response = await request_policy.call(http_method, self.url, self._send, lambda: {'kind': kind, 'call': (method, args)})
+        if response.status_code == 429:
+            raise ExchangeError('http', f"{self.label} 요청 한도 초과: {response.error}", host=self.url, status=429, retryable=True)
+        return response.data
+
+    async def _send(self, method, url, kind, call, timeout=None):
+        """속도 제한 예산 안에서 ccxt 메서드를 스레드로 호출
+
+        ccxt 타임아웃·연결 오류는 httpx 예외로, 요청 한도 초과는 429 응답으로 바꿔 호출 정책이 판단하게 합니다.
+        """
+        name, args = call
+        signed = kind != 'market'
+        await rate_limiter.acquire(self.name, kind, self.api_key if signed else None)
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            data = await asyncio.to_thread(getattr(self.client, name), *args)
+            status = 200
+            return CcxtResponse(status, data)
+        except self._ccxt.RequestTimeout as e:
+            raise httpx.ReadTimeout(f"{self.label}: {e}")
+        except self._ccxt.RateLimitExceeded as e:
+            status = 429
+            rate_limiter.penalize(self.name, 1.0)
+            return CcxtResponse(status, error=e)
+        except self._ccxt.NetworkError as e:
+            # 요청이 거래소에 닿았는지 알 수 없으므로 주문은 재시도하지 않음
+            raise httpx.ReadError(f"{self.label}: {e}")
+        except self._ccxt.BaseError as e:
+            raise ExchangeError('exchange', f"{self.label} 오류: {e}", host=self.url)
+        finally:
+            metrics.EXCHANGE_LATENCY.observe(time.perf_counter() - started, self.name, name, status)
+
+    async def test_connection(self):
+        await self._call('account', 'fetch_balance')
+        return {'status': 'success', 'message': f'{self.label} API 연결 성공'}
+
+    async def place_order(self, spec, action):
+        symbol, amount, price = self.normalize_order(spec)
+        if spec['market_type'] == 'futures' and spec['leverage'] > 1 and self.client.has.get('setLeverage'):
+            await self._call('account', 'set_leverage', spec['leverage'], symbol)
+        price = price if spec['order_type'] == 'limit' else None
+        params = {'reduceOnly': True} if spec.get('reduce_only') else {}
+        order = await self._call('order', 'create_order', symbol, spec['order_type'], _order_side(spec), amount, price, params)
+        # ccxt가 마켓 정밀도로 맞춘 수량(amount)이 실제로 보낸 수량
+        sent = (symbol, order.get('amount') or amount, price)
+        return _order_result(order.get('id'), sent, f'{self.label} {action} 성공', order.get('filled'), order.get('average'))
+
+    async def fetch_balance(self, market_type):
+        data = await self._call('account', 'fetch_balance', {'type': self.MARKET_TYPES[market_type]})
+        balance = {key: data.get(key, {}) for key in ('free', 'used', 'total')}
+        return {'status': 'success', 'balance': balance, 'message': f'{self.label} {MARKET_LABELS[market_type]} 잔고 조회 성공'}
+
+    async def fetch_market_data(self, market_type, symbol, data_type):
+        if data_type not in DATA_TYPES:
+            return {'status': 'error', 'message': f'지원하지 않는 데이터 타입: {data_type}'}
+        symbol = self.unified_symbol(market_type, symbol)
+        if data_type == 'ticker':
+            data = await self._call('market', 'fetch_ticker', symbol)
+        elif data_type == 'depth':
+            data = await self._call('market', 'fetch_order_book', symbol, 10)
+        else:
+            data = await self._call('market', 'fetch_ohlcv', symbol, '1m', None, 10)
+        prefix = _market_prefix(market_type)
+        return {'status': 'success', 'data': data, 'message': f'{self.label} {prefix}{data_type} 데이터 조회 성공'}
+
+    async def fetch_position(self, market_type, symbol):
+        symbol = self.unified_symbol(market_type, symbol)
+        positions = {'long': 0.0, 'short': 0.0}
+        for item in await self._call('account', 'fetch_positions', [symbol]):
+            if item.get('symbol') == symbol and item.get('side') in positions:
+                positions[item['side']] += abs(float(item.get('contracts') or 0))
+        return {'status': 'success', 'positions': positions, 'message': f'{self.label} 포지션 조회 성공'}
+
+    async def fetch_klines(self, market_type, symbol, interval, limit):
+        rows = await self._call('market', 'fetch_ohlcv', self.unified_symbol(market_type, symbol), interval, None, limit)
+        prefix = _market_prefix(market_type)
+        return {'status': 'success', 'data': [_candle_row(*row[:6]) for row in rows], 'message': f'{self.label} {prefix}캔들 조회 성공'}
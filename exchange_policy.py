@@ -0,0 +1,193 @@
+"""
+거래소 호출 정책: 타임아웃, 재시도, 서킷 브레이커
+
+ - 모든 요청에 연결/읽기 타임아웃 적용
+ - 재시도는 중복 실행돼도 안전한 경우만 (지터를 넣은 지수 백오프)
+   조회(GET)는 타임아웃·연결 오류·429/5xx 모두 재시도, 주문 같은 POST는 거래소에 닿지 않은 게
+   확실한 경우(연결 실패, 429)만 재시도 (읽기 타임아웃 뒤에는 이미 체결됐을 수 있음)
+ - 요청은 시도마다 다시 만들어 서명 타임스탬프가 거래소 허용 시간 안에 있도록 함
+ - 호스트별 서킷 브레이커: 연속 실패가 쌓이면 일정 시간 동안 바로 실패시키고,
+   이후 요청 하나로 복구 여부를 확인
+ - 실패는 ExchangeError로 올리고, error_result()로 구조화된 오류 dict를 만듦
+
+환경 변수:
+    EXCHANGE_CONNECT_TIMEOUT   연결 타임아웃(초, 기본 3)
+    EXCHANGE_READ_TIMEOUT      읽기 타임아웃(초, 기본 10)
+    EXCHANGE_MAX_RETRIES       최대 재시도 횟수 (기본 2)
+    CIRCUIT_FAILURE_THRESHOLD  서킷을 여는 연속 실패 수 (기본 5)
+    CIRCUIT_RESET_TIMEOUT      서킷을 연 뒤 다시 시도하기까지의 시간(초, 기본 30)
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import random
+import time
+
+import httpx
+
+from http_client import pool_key
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# 거래소가 요청을 처리하지 않은 게 확실한 오류·응답 (POST도 재시도 가능)
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+NOT_PROCESSED_STATUS = (429,)
+
+_client_id_counter = itertools.count(random.randrange(1 << 20))
+
+
+def new_client_order_id():
+    """재시도해도 같은 주문으로 인식되도록 주문마다 붙이는 ID (Backpack clientId 범위인 uint32)"""
+    return (int(time.time()) << 12 | next(_client_id_counter) & 0xFFF) & 0xFFFFFFFF
+
+
+class ExchangeError(Exception):
+    """거래소 호출 실패"""
+
+    def __init__(self, kind, message, host=None, status=None, retryable=False):
+        super().__init__(message)
+        self.kind = kind
+        self.host = host
+        self.status = status
+        self.retryable = retryable
+
+
+def error_result(message, error=None, response=None):
+    """{'status': 'error', ...} 형식의 구조화된 오류"""
+    result = {'status': 'error', 'message': message, 'error_type': 'exchange', 'retryable': False}
+    if isinstance(error, ExchangeError):
+        result.update(error_type=error.kind, retryable=error.retryable, http_status=error.status)
+    elif isinstance(error, ValueError):
+        result['error_type'] = 'invalid_order'
+    elif error is not None:
+        result['error_type'] = 'internal'
+    if response is not None:
+        result.update(error_type='http', http_status=response.status_code,
+                      retryable=response.status_code in RETRY_STATUS)
+    return result
+
+
+class CircuitBreaker:
+    """연속 실패 기반 서킷 브레이커 (closed → open → half_open)"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self):
+        if self.state == 'closed':
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        # reset_timeout마다 확인 요청 하나만 통과 (결과가 오지 않아도 다음 확인 가능)
+        self.state = 'half_open'
+        self.opened_at = now
+        return True
+
+    def record_success(self):
+        self.state = 'closed'
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logger.warning(f"서킷 열림 (연속 실패 {self.failures}회)")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+
+class RequestPolicy:
+    """타임아웃·재시도·서킷 브레이커를 적용해 요청 전송"""
+
+    def __init__(self, connect_timeout=3.0, read_timeout=10.0, max_retries=2,
+                 backoff_base=0.2, backoff_max=2.0, failure_threshold=5, reset_timeout=30.0):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.retries = 0
+
+    def breaker(self, url):
+        host = pool_key(url)
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    @staticmethod
+    def is_idempotent(method):
+        """중복 실행돼도 안전한 요청인지 (주문 POST는 클라이언트 주문 ID가 있어도 중복 체결될 수 있음)"""
+        return method.upper() in IDEMPOTENT_METHODS
+
+    def backoff(self, attempt):
+        """지터를 넣은 지수 백오프 (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, method, url, send, build):
+        """send(method, url, **build())를 정책에 따라 호출. 응답 또는 ExchangeError
+
+        build는 시도마다 새로 호출해 요청 인자(서명 헤더 포함)를 만듭니다.
+        """
+        host = pool_key(url)
+        breaker = self.breaker(url)
+        idempotent = self.is_idempotent(method)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise ExchangeError('circuit_open', f"{host} 응답 지연으로 잠시 요청을 중단했습니다.", host=host, retryable=True)
+            kwargs = build()
+            kwargs.setdefault('timeout', self.timeout)
+            try:
+                response = await send(method, url, **kwargs)
+            except httpx.TimeoutException as e:
+                breaker.record_failure()
+                retryable = idempotent or isinstance(e, NOT_SENT_ERRORS)
+                error = ExchangeError('timeout', f"{host} 응답 시간 초과 ({type(e).__name__})", host=host, retryable=retryable)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                retryable = idempotent or isinstance(e, NOT_SENT_ERRORS)
+                error = ExchangeError('network', f"{host} 연결 오류: {e}", host=host, retryable=retryable)
+            else:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                retryable = idempotent or response.status_code in NOT_PROCESSED_STATUS
+                if response.status_code not in RETRY_STATUS or not retryable or attempt >= self.max_retries:
+                    return response
+                error = None
+
+            if not retryable or attempt >= self.max_retries:
+                raise error
+            delay = self.backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            logger.info(f"{method} {host} 재시도 {attempt}/{self.max_retries} ({delay:.2f}초 후)")
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            'retries': self.retries,
+            'circuits': {host: b.state for host, b in self.breakers.items()},
+        }
+
+
+request_policy = RequestPolicy(
+    connect_timeout=float(os.getenv('EXCHANGE_CONNECT_TIMEOUT', '3')),
+    read_timeout=float(os.getenv('EXCHANGE_READ_TIMEOUT', '10')),
+    max_retries=int(os.getenv('EXCHANGE_MAX_RETRIES', '2')),
+    failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+    reset_timeout=float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30')),
+)
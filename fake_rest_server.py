@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+부하 테스트용 로컬 가짜 REST 서버 (XT, Backpack, 텔레그램 Bot API)
+
+앱이 사용하는 엔드포인트만 흉내 내며, 응답 지연(latency + jitter)과
+오류 주입(error_rate 비율로 500 응답)을 설정할 수 있습니다.
+텔레그램 요청은 지연·오류 없이 응답하고, 채팅별로 보낸 메시지를 기록합니다.
+
+단독 실행: python fake_rest_server.py [port] [latency]
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlsplit
+
+INTERVAL_SECONDS = {'1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600, '4h': 14400, '1d': 86400}
+REASONS = {200: 'OK', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class FakeRestServer:
+    """가짜 거래소/텔레그램 HTTP 서버 (HTTP/1.1 keep-alive)"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.server = None
+        self.requests = defaultdict(int)
+        self.errors = 0
+        self.sent = defaultdict(list)
+        self.price = 50000.0
+        self._ids = iter(range(1, 1 << 62))
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self._respond(method, target, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, headers, body):
+        parts = urlsplit(target)
+        path = parts.path
+        if path.startswith('/bot'):
+            return 200, self._telegram(path.rsplit('/', 1)[-1], headers, body)
+
+        self.requests[f"{method} {path}"] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return 500, {'code': 'INTERNAL', 'message': 'injected error'}
+        self.price += random.uniform(-5, 5)
+        query = dict(parse_qsl(parts.query))
+        if path.startswith('/api/v1/'):
+            result = self._backpack(method, path[len('/api/v1/'):], body, query)
+        else:
+            result = self._xt(method, path, query)
+        if result is None:
+            return 404, {'message': f'unknown path {path}'}
+        return 200, result
+
+    def _levels(self, sign, count=10):
+        return [[f"{self.price + sign * (i + 1):.1f}", f"{random.uniform(0.1, 2):.4f}"] for i in range(count)]
+
+    def _candles(self, interval, count):
+        """현재 가격에서 끝나는 무작위 캔들 (start 초, 시가, 고가, 저가, 종가, 거래량)"""
+        seconds = INTERVAL_SECONDS.get(interval, 60)
+        start = int(time.time()) // seconds * seconds - seconds * (count - 1)
+        close = self.price
+        candles = []
+        for i in reversed(range(count)):
+            open_ = close - random.uniform(-5, 5)
+            high = max(open_, close) + random.uniform(0, 3)
+            low = min(open_, close) - random.uniform(0, 3)
+            candles.append((start + seconds * i, open_, high, low, close, random.uniform(0.1, 5)))
+            close = open_
+        return candles[::-1]
+
+    def _xt(self, method, path, query):
+        now = int(time.time() * 1000)
+        if path == '/v4/order' and method == 'POST':
+            order_id = str(next(self._ids))
+            return {'rc': 0, 'result': {'orderId': order_id}, 'orderId': order_id}
+        results = {
+            '/v4/public/time': {'serverTime': now},
+            '/v4/public/ticker/24hr': [{'s': 'btc_usdt', 'c': f"{self.price:.1f}", 't': now}],
+            '/v4/public/depth': {'b': self._levels(-1), 'a': self._levels(1), 't': now},
+            '/v4/public/kline': [
+                {'t': start * 1000, 'o': f"{o:.1f}", 'h': f"{h:.1f}", 'l': f"{l:.1f}", 'c': f"{c:.1f}",
+                 'q': f"{v:.4f}", 'v': f"{v * c:.2f}"}
+                for start, o, h, l, c, v in self._candles(query.get('interval'), int(query.get('limit', 1)))
+            ],
+            '/v4/account/futures/balance': {'walletBalance': '1000', 'availableBalance': '1000'},
+            '/v4/account/spot/balance': {'totalUsdtAmount': '1000', 'assets': []},
+            '/v4/public/symbol': {'symbols': []},
+            '/future/user/v1/position': [{'symbol': query.get('symbol'), 'positionSide': 'LONG', 'positionSize': '1'}],
+        }
+        if path not in results:
+            return None
+        return {'rc': 0, 'mc': 'SUCCESS', 'result': results[path]}
+
+    def _backpack(self, method, path, body, query):
+        if path == 'order' and method == 'POST':
+            return dict(self._backpack_order(json.loads(body or b'{}')), orderId=str(next(self._ids)))
+        if path == 'orders' and method == 'POST':
+            return [self._backpack_order(order) for order in json.loads(body or b'[]')]
+        if path == 'account':
+            return {'autoLend': False, 'leverageLimit': '10'}
+        if path == 'position':
+            return [{'symbol': 'BTC_USDC_PERP', 'netQuantity': '1', 'entryPrice': f"{self.price:.1f}"}]
+        if path == 'capital':
+            return {'USDC': {'available': '1000', 'locked': '0', 'staked': '0'}}
+        if path == 'depth':
+            return {'bids': self._levels(-1), 'asks': self._levels(1), 'lastUpdateId': str(next(self._ids))}
+        if path == 'tickers':
+            return [{'symbol': 'BTC_USDC_PERP', 'lastPrice': f"{self.price:.1f}"}]
+        if path == 'klines':
+            interval = query.get('interval')
+            count = int(query.get('limit', 0)) or (int(time.time()) - int(query.get('startTime', time.time()))) // INTERVAL_SECONDS.get(interval, 60)
+            return [
+                {'start': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start)), 'open': f"{o:.1f}", 'high': f"{h:.1f}",
+                 'low': f"{l:.1f}", 'close': f"{c:.1f}", 'volume': f"{v:.4f}"}
+                for start, o, h, l, c, v in self._candles(interval, max(count, 1))
+            ]
+        if path == 'markets':
+            return []
+        return None
+
+    def _backpack_order(self, order):
+        """시장가 주문은 현재 가격으로 바로 전량 체결"""
+        result = {'id': str(next(self._ids)), 'status': 'New'}
+        if order.get('orderType') == 'Market':
+            quantity = float(order.get('quantity') or 0)
+            result.update(status='Filled', executedQuantity=f"{quantity}", executedQuoteQuantity=f"{quantity * self.price:.4f}")
+        return result
+
+    def _telegram(self, api_method, headers, body):
+        if headers.get('content-type', '').startswith('application/json'):
+            params = json.loads(body or b'{}')
+        else:
+            params = dict(parse_qsl(body.decode()))
+        if api_method == 'getMe':
+            return {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}}
+        if api_method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            text = params.get('text', '')
+            self.sent[chat_id].append(text)
+            return {'ok': True, 'result': {
+                'message_id': int(params.get('message_id') or next(self._ids)),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': text,
+            }}
+        return {'ok': True, 'result': True}
+
+
+async def main(port, latency):
+    server = await FakeRestServer(port=port, latency=latency).start()
+    print(f"🧪 가짜 REST 서버 실행 중: {server.url} (지연 {latency * 1000:.0f}ms)")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8080,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    ))
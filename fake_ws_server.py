@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+테스트용 로컬 가짜 시세 WebSocket 서버
+
+XT(topic@symbol)와 Backpack(type.SYMBOL) 구독 메시지를 받아
+구독한 토픽마다 가짜 티커/호가/캔들 메시지를 주기적으로 보냅니다.
+Backpack 호가는 시퀀스 번호가 붙은 증분으로 보내고, depth_snapshot()이 REST 스냅샷을 대신합니다.
+drop_connections()로 연결을 강제로 끊어 재연결을 시험할 수 있습니다.
+FakeUserStreamServer는 개인 스트림(user_stream.py) 테스트용으로, 보낼 메시지를 직접 push()합니다.
+
+단독 실행: python fake_ws_server.py [port]
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+
+import websockets
+
+
+class FakeMarketServer:
+    """가짜 시세 서버"""
+
+    def __init__(self, host='127.0.0.1', port=0, push_interval=0.05):
+        self.host = host
+        self.port = port
+        self.push_interval = push_interval
+        self.server = None
+        self.connections = set()
+        self.subscriptions = []
+        self.unsubscriptions = []
+        self.connection_count = 0
+        self.price = 50000.0
+        self.depth_sequences = {}
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def drop_connections(self):
+        """모든 클라이언트 연결 강제 종료"""
+        for ws in list(self.connections):
+            await ws.close(code=1012, reason='fake restart')
+
+    async def _handler(self, ws):
+        self.connections.add(ws)
+        self.connection_count += 1
+        topics = set()
+        pusher = asyncio.ensure_future(self._push(ws, topics))
+        try:
+            async for raw in ws:
+                if raw == 'ping':
+                    await ws.send('pong')
+                    continue
+                message = json.loads(raw)
+                method = message.get('method', '').upper()
+                if method == 'SUBSCRIBE':
+                    topics.update(message.get('params', []))
+                    self.subscriptions.append(list(message.get('params', [])))
+                elif method == 'UNSUBSCRIBE':
+                    topics.difference_update(message.get('params', []))
+                    self.unsubscriptions.append(list(message.get('params', [])))
+                    if 'id' in message:
+                        await ws.send(json.dumps({'id': message['id'], 'code': 0, 'msg': 'SUCCESS'}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pusher.cancel()
+            self.connections.discard(ws)
+
+    async def _push(self, ws, topics):
+        while True:
+            await asyncio.sleep(self.push_interval)
+            self.price += random.uniform(-5, 5)
+            for topic in list(topics):
+                message = self._message(topic)
+                if message is not None:
+                    await ws.send(json.dumps(message))
+
+    async def depth_snapshot(self, exchange, symbol):
+        """REST 호가 스냅샷 대용 (MarketStreamManager.snapshot_fetcher로 사용)"""
+        return {
+            'bids': self._levels(-1),
+            'asks': self._levels(1),
+            'lastUpdateId': self.depth_sequences.get(symbol, 0)
+        }
+
+    def _levels(self, sign):
+        return [[f"{self.price + sign * (i + 1):.1f}", f"{random.uniform(0.1, 2):.4f}"] for i in range(5)]
+
+    def _message(self, topic):
+        now = int(time.time() * 1000)
+        minute = now - now % 60000
+        price = f"{self.price:.1f}"
+        if '@' in topic:
+            kind, rest = topic.split('@', 1)
+            symbol = rest.split(',')[0]
+            if kind == 'ticker':
+                data = {'s': symbol, 'c': price, 't': now}
+            elif kind == 'depth':
+                data = {'s': symbol, 'b': self._levels(-1), 'a': self._levels(1), 't': now}
+            elif kind == 'kline':
+                data = {'s': symbol, 't': minute, 'i': '1m', 'o': price, 'h': price, 'l': price, 'c': price, 'q': '1', 'v': price}
+            else:
+                return None
+            return {'topic': kind, 'event': topic, 'data': data}
+        parts = topic.split('.')
+        kind, symbol = parts[0], parts[-1]
+        if kind == 'ticker':
+            data = {'e': 'ticker', 's': symbol, 'c': price, 'E': now}
+        elif kind == 'depth':
+            sequence = self.depth_sequences.get(symbol, 0) + 1
+            self.depth_sequences[symbol] = sequence
+            data = {'e': 'depth', 's': symbol, 'b': self._levels(-1), 'a': self._levels(1), 'U': sequence, 'u': sequence, 'E': now}
+        elif kind == 'kline':
+            data = {'e': 'kline', 's': symbol, 't': minute, 'o': price, 'h': price, 'l': price, 'c': price, 'v': '1', 'X': False}
+        else:
+            return None
+        return {'stream': topic, 'data': data}
+
+
+class FakeUserStreamServer:
+    """가짜 개인 스트림 서버 (구독 메시지를 기록하고 push()로 보낸 메시지를 모든 연결에 전달)"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.connections = set()
+        self.subscriptions = []
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def push(self, message):
+        for ws in list(self.connections):
+            await ws.send(json.dumps(message))
+
+    async def drop_connections(self):
+        for ws in list(self.connections):
+            await ws.close(code=1012, reason='fake restart')
+
+    async def _handler(self, ws):
+        self.connections.add(ws)
+        try:
+            async for raw in ws:
+                if raw == 'ping':
+                    await ws.send('pong')
+                    continue
+                message = json.loads(raw)
+                if message.get('method', '').upper() == 'SUBSCRIBE':
+                    self.subscriptions.append(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(ws)
+
+
+async def main(port):
+    server = await FakeMarketServer(port=port).start()
+    print(f"🧪 가짜 시세 서버 실행 중: {server.url}")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8765))
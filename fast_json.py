@@ -0,0 +1,54 @@
+"""
+거래소 응답 JSON 처리
+
+거래소 REST 응답과 스트림 메시지 디코딩에 쓰는 공용 함수입니다.
+ - orjson이 설치되어 있으면 사용하고, 없으면 표준 json으로 동작
+ - 응답 본문은 response.content(bytes)를 바로 디코딩 (문자열 변환 단계 없음)
+ - 오류 메시지에는 본문 앞부분(ERROR_TEXT_LIMIT자)만 넣음
+   (response.text는 본문 전체를 문자열로 만들고 인코딩 추정까지 하므로 오류 경로에서 쓰지 않음)
+
+환경 변수:
+    ERROR_TEXT_LIMIT   오류 메시지에 넣는 응답 본문 최대 글자 수 (기본 300)
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+ERROR_TEXT_LIMIT = int(os.getenv('ERROR_TEXT_LIMIT', '300'))
+
+
+def loads(data):
+    """JSON 디코딩 (bytes/str 모두 가능)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """JSON 문자열 (공백 없는 형식)"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def response_json(response):
+    """httpx 응답 본문 디코딩"""
+    return loads(response.content)
+
+
+def error_text(response, limit=ERROR_TEXT_LIMIT):
+    """오류 메시지용 응답 본문 앞부분 (UTF-8로 앞부분만 디코딩)"""
+    content = response.content
+    # UTF-8 한 글자는 최대 4바이트
+    text = content[:limit * 4].decode('utf-8', errors='replace')
+    if len(text) > limit:
+        return text[:limit] + '…'
+    if len(content) > limit * 4:
+        return text + '…'
+    return text
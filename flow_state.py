@@ -0,0 +1,184 @@
+"""
+거래 흐름 상태 / 레버리지 설정 저장소 (write-behind)
+
+python-telegram-bot의 BasePersistence로 연결되어 context.user_data(trade_info, quantity, leverage)를
+재시작 후에도 유지하고, (거래소, 심볼, 방향)별 마지막 레버리지를 기억합니다.
+ - 읽기는 항상 메모리에서 (user_data는 시작 시 한 번, 레버리지는 사용자별 첫 조회 때 DB에서 불러옴)
+ - 쓰기는 메모리에 반영하고 변경분만 모아 두었다가 백그라운드 작업이 FLOW_STATE_FLUSH_INTERVAL초마다
+   한 트랜잭션으로 SQLite에 기록 (종료 시 남은 변경분도 기록)
+ - FLOW_STATE_TTL초 넘게 갱신되지 않은 흐름 상태는 불러오지 않음 (오래된 입력 대기 상태 방지)
+
+환경 변수:
+    FLOW_STATE_UPDATE_INTERVAL   PTB가 변경된 user_data를 넘겨주는 주기(초, 기본 5)
+    FLOW_STATE_FLUSH_INTERVAL    DB 기록 주기(초, 기본 5)
+    FLOW_STATE_TTL               흐름 상태 유지 시간(초, 기본 86400)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from user_api_store import user_store
+
+logger = logging.getLogger(__name__)
+
+UPDATE_INTERVAL = float(os.getenv('FLOW_STATE_UPDATE_INTERVAL', '5'))
+FLUSH_INTERVAL = float(os.getenv('FLOW_STATE_FLUSH_INTERVAL', '5'))
+FLOW_STATE_TTL = float(os.getenv('FLOW_STATE_TTL', '86400'))
+
+
+class FlowStatePersistence(BasePersistence):
+    """user_data와 레버리지 설정을 메모리에 두고 SQLite에 모아서 기록"""
+
+    def __init__(self, store=user_store, update_interval=UPDATE_INTERVAL, flush_interval=FLUSH_INTERVAL, ttl=FLOW_STATE_TTL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self._flow_states = {}
+        self._leverage = {}
+        self._dirty_users = set()
+        self._dirty_leverage = set()
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+
+    # --------- user_data (PTB) ---------
+    async def get_user_data(self):
+        rows = await self.store.get_flow_states(time.time() - self.ttl)
+        user_data = {}
+        for user_id, data in rows:
+            try:
+                user_data[user_id] = json.loads(data)
+            except ValueError as e:
+                logger.warning(f"사용자 {user_id} 흐름 상태 손상: {e}")
+        logger.info(f"흐름 상태 {len(user_data)}건 복원")
+        self._flow_states = {user_id: json.dumps(data) for user_id, data in user_data.items()}
+        return user_data
+
+    async def update_user_data(self, user_id, data):
+        encoded = json.dumps(data) if data else None
+        if self._flow_states.get(user_id) == encoded:
+            return
+        self._flow_states[user_id] = encoded
+        self._dirty_users.add(user_id)
+
+    async def drop_user_data(self, user_id):
+        self._flow_states[user_id] = None
+        self._dirty_users.add(user_id)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    # --------- 사용하지 않는 PTB 데이터 ---------
+    async def get_chat_data(self):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    # --------- 레버리지 설정 ---------
+    async def _leverage_settings(self, user_id):
+        settings = self._leverage.get(user_id)
+        if settings is None:
+            loaded = await self.store.get_leverage_settings(user_id)
+            # 불러오는 동안 set_leverage로 바뀐 값이 있으면 그 값을 유지
+            settings = self._leverage.setdefault(user_id, {})
+            for key, value in loaded.items():
+                settings.setdefault(key, value)
+        return settings
+
+    async def get_leverage(self, user_id, exchange, symbol, direction):
+        """마지막으로 사용한 레버리지 (없으면 None)"""
+        settings = await self._leverage_settings(user_id)
+        return settings.get((exchange, symbol.upper(), direction))
+
+    def set_leverage(self, user_id, exchange, symbol, direction, leverage):
+        """레버리지 설정 (메모리에 바로 반영, DB는 다음 기록 때)"""
+        key = (exchange, symbol.upper(), direction)
+        leverage = int(leverage)
+        settings = self._leverage.setdefault(user_id, {})
+        if settings.get(key) == leverage:
+            return
+        settings[key] = leverage
+        self._dirty_leverage.add((user_id,) + key)
+
+    # --------- 기록 ---------
+    async def flush(self):
+        """변경분을 한 번에 DB에 기록"""
+        async with self._flush_lock:
+            if not self._dirty_users and not self._dirty_leverage:
+                return
+            users, self._dirty_users = self._dirty_users, set()
+            leverage_keys, self._dirty_leverage = self._dirty_leverage, set()
+            flow_rows = [(user_id, self._flow_states.get(user_id)) for user_id in users]
+            leverage_rows = [key + (self._leverage[key[0]][key[1:]],) for key in leverage_keys]
+            try:
+                await self.store.write_flow_state(flow_rows, leverage_rows)
+                self.flushes += 1
+            except Exception as e:
+                # 다음 기록 때 다시 시도
+                logger.error(f"Flow state flush error: {e}")
+                self._dirty_users |= users
+                self._dirty_leverage |= leverage_keys
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """백그라운드 기록 시작"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            'users': sum(1 for data in self._flow_states.values() if data),
+            'dirty': len(self._dirty_users) + len(self._dirty_leverage),
+            'flushes': self.flushes,
+        }
+
+
+flow_state = FlowStatePersistence()
@@ -0,0 +1,104 @@
+"""
+거래소 REST 호출용 공용 HTTP 커넥션 풀
+
+python-telegram-bot이 이미 사용하는 httpx를 그대로 사용하므로
+핸들러 안에서 await로 호출해도 이벤트 루프가 막히지 않습니다.
+거래소 호스트(base URL)마다 keep-alive 커넥션 풀을 하나씩 두고
+모든 트레이더 인스턴스가 이를 공유합니다.
+동기 코드(xt.py 등)용 requests.Session 풀도 같은 방식으로 제공합니다.
+
+환경 변수로 풀 크기를 조정할 수 있습니다:
+    HTTP_POOL_MAX_CONNECTIONS      호스트당 최대 동시 커넥션 수
+    HTTP_POOL_MAX_KEEPALIVE        호스트당 유지할 keep-alive 커넥션 수
+    HTTP_POOL_KEEPALIVE_EXPIRY     유휴 커넥션 유지 시간(초)
+"""
+
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+POOL_SETTINGS = {
+    'max_connections': int(os.getenv('HTTP_POOL_MAX_CONNECTIONS', '20')),
+    'max_keepalive': int(os.getenv('HTTP_POOL_MAX_KEEPALIVE', '10')),
+    'keepalive_expiry': float(os.getenv('HTTP_POOL_KEEPALIVE_EXPIRY', '60')),
+}
+
+_clients = {}
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def configure_pool(max_connections=None, max_keepalive=None, keepalive_expiry=None):
+    """풀 설정 변경 (이미 생성된 풀에는 적용되지 않으므로 시작 시 호출)"""
+    if max_connections is not None:
+        POOL_SETTINGS['max_connections'] = max_connections
+    if max_keepalive is not None:
+        POOL_SETTINGS['max_keepalive'] = max_keepalive
+    if keepalive_expiry is not None:
+        POOL_SETTINGS['keepalive_expiry'] = keepalive_expiry
+
+
+def pool_key(url):
+    """URL에서 풀 키(scheme://host[:port]) 추출"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_client(url):
+    """호스트별 공용 AsyncClient 반환 (최초 호출 시 생성)"""
+    key = pool_key(url)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=POOL_SETTINGS['max_connections'],
+            max_keepalive_connections=POOL_SETTINGS['max_keepalive'],
+            keepalive_expiry=POOL_SETTINGS['keepalive_expiry']
+        )
+        client = httpx.AsyncClient(limits=limits)
+        _clients[key] = client
+        logger.info(f"HTTP 커넥션 풀 생성: {key}")
+    return client
+
+
+async def request(method, url, **kwargs):
+    """호스트별 공용 클라이언트로 요청 전송"""
+    response = await get_client(url).request(method, url, **kwargs)
+    if logger.isEnabledFor(logging.DEBUG):
+        elapsed_ms = response.elapsed.total_seconds() * 1000
+        logger.debug(f"{method} {url} -> {response.status_code} ({elapsed_ms:.0f}ms) {response.text[:500]}")
+    return response
+
+
+def get_session(url):
+    """호스트별 공용 requests.Session 반환 (동기 코드용)"""
+    key = pool_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=POOL_SETTINGS['max_connections']
+            )
+            session.mount(key, adapter)
+            _sessions[key] = session
+        return session
+
+
+async def close_client():
+    """모든 공용 클라이언트 종료 (봇 종료 시 호출)"""
+    for client in list(_clients.values()):
+        if not client.is_closed:
+            await client.aclose()
+    _clients.clear()
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
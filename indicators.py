@@ -0,0 +1,238 @@
+"""
+기술 지표 (NumPy 벡터 연산 + 증분 갱신)
+
+ - ema / rsi / atr / vwap / bollinger: 배열 전체를 한 번에 계산 (백필·재계산용)
+   지수 평활(EMA, RSI, ATR)은 pandas ewm(adjust=False)으로 계산 (pandas가 없으면 파이썬 루프)
+   구간 합(VWAP, 볼린저 밴드)은 누적합 차이로 계산
+ - IndicatorState: 마감된 캔들 하나마다 평활 값과 구간 합만 O(1)로 갱신하고,
+   진행 중인 캔들은 상태를 바꾸지 않고 더해서 계산 → 조회 때 전체 구간을 다시 계산하지 않음
+   구간에서 빠질 값은 상태가 직접 보관 (캔들 배열이 밀리거나 옮겨져도 영향 없음)
+RSI·ATR은 Wilder 평활(alpha = 1/기간), 볼린저 밴드는 모표준편차,
+VWAP는 최근 VWAP_PERIOD개 캔들의 대표가((고+저+종)/3) 거래량 가중 평균입니다.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+EMA_PERIODS = (9, 21)
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BB_PERIOD = 20
+BB_WIDTH = 2.0
+VWAP_PERIOD = 60
+# 지표 계산에 필요한 최소 보관 캔들 수
+MAX_PERIOD = max(BB_PERIOD, VWAP_PERIOD)
+
+
+def _smooth(values, alpha):
+    """지수 평활 (첫 값에서 시작, adjust=False)"""
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values.copy()
+    if pd is not None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    out = np.empty_like(values)
+    acc = values[0]
+    for i, value in enumerate(values):
+        acc += alpha * (value - acc)
+        out[i] = acc
+    return out
+
+
+def _rolling_sum(values, period):
+    """길이 period 구간 합 (앞쪽은 있는 만큼만 더함)"""
+    total = np.cumsum(values)
+    out = total.copy()
+    out[period:] = total[period:] - total[:-period]
+    return out
+
+
+def _rsi_value(avg_gain, avg_loss):
+    """평균 상승·하락폭 → RSI (하락이 없으면 100, 변동이 없으면 50)"""
+    avg_gain = np.asarray(avg_gain, dtype=float)
+    avg_loss = np.asarray(avg_loss, dtype=float)
+    safe_loss = np.where(avg_loss == 0, 1.0, avg_loss)
+    value = 100.0 - 100.0 / (1.0 + avg_gain / safe_loss)
+    return np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), value)
+
+
+def ema(close, period):
+    return _smooth(close, 2.0 / (period + 1))
+
+
+def rsi(close, period=RSI_PERIOD):
+    """RSI 배열 (첫 값은 NaN)"""
+    close = np.asarray(close, dtype=float)
+    out = np.full(len(close), np.nan)
+    if len(close) < 2:
+        return out
+    delta = np.diff(close)
+    avg_gain = _smooth(np.maximum(delta, 0.0), 1.0 / period)
+    avg_loss = _smooth(np.maximum(-delta, 0.0), 1.0 / period)
+    out[1:] = _rsi_value(avg_gain, avg_loss)
+    return out
+
+
+def true_range(high, low, close):
+    """True Range (첫 캔들은 고가 - 저가)"""
+    high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+    prev = np.concatenate((close[:1], close[:-1]))
+    return np.maximum(high - low, np.maximum(np.abs(high - prev), np.abs(low - prev)))
+
+
+def atr(high, low, close, period=ATR_PERIOD):
+    return _smooth(true_range(high, low, close), 1.0 / period)
+
+
+def bollinger(close, period=BB_PERIOD, width=BB_WIDTH):
+    """(하단, 중심, 상단) 배열"""
+    close = np.asarray(close, dtype=float)
+    if len(close) == 0:
+        return close.copy(), close.copy(), close.copy()
+    # 큰 가격의 제곱합 오차를 줄이기 위해 첫 종가 기준으로 이동해서 계산
+    shifted = close - close[0]
+    count = np.minimum(np.arange(1, len(close) + 1), period)
+    mean = _rolling_sum(shifted, period) / count
+    std = np.sqrt(np.maximum(_rolling_sum(shifted * shifted, period) / count - mean * mean, 0.0))
+    mid = mean + close[0]
+    return mid - width * std, mid, mid + width * std
+
+
+def vwap(high, low, close, volume, period=VWAP_PERIOD):
+    """구간 VWAP 배열 (거래량이 없으면 대표가)"""
+    high, low, close, volume = (np.asarray(a, dtype=float) for a in (high, low, close, volume))
+    typical = (high + low + close) / 3.0
+    pv = _rolling_sum(typical * volume, period)
+    vol = _rolling_sum(volume, period)
+    return np.divide(pv, vol, out=typical.copy(), where=vol > 0)
+
+
+class IndicatorState:
+    """마감된 캔들까지 반영한 지표 상태"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.last_time = None
+        self.ema = {period: None for period in EMA_PERIODS}
+        self.prev_close = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.atr = None
+        # 구간 합: 마감된 최근 (기간 - 1)개 캔들 (진행 중인 캔들을 더하면 기간 하나)
+        self.ref = None
+        self.bb_window = deque()
+        self.bb_sum = 0.0
+        self.bb_sumsq = 0.0
+        self.vwap_window = deque()
+        self.pv_sum = 0.0
+        self.vol_sum = 0.0
+
+    def rebuild(self, t, h, l, c, v):
+        """마감된 캔들 배열 전체로 상태 계산 (벡터 연산)"""
+        self.reset()
+        n = len(c)
+        if n == 0:
+            return
+        self.count = n
+        self.last_time = float(t[-1])
+        self.ema = {period: float(ema(c, period)[-1]) for period in EMA_PERIODS}
+        if n >= 2:
+            delta = np.diff(c)
+            self.avg_gain = float(_smooth(np.maximum(delta, 0.0), 1.0 / RSI_PERIOD)[-1])
+            self.avg_loss = float(_smooth(np.maximum(-delta, 0.0), 1.0 / RSI_PERIOD)[-1])
+        self.atr = float(atr(h, l, c, ATR_PERIOD)[-1])
+        self.prev_close = float(c[-1])
+        self.ref = float(c[-1])
+        tail = c[n - min(n, BB_PERIOD - 1):] - self.ref
+        self.bb_window = deque(tail.tolist())
+        self.bb_sum = float(tail.sum())
+        self.bb_sumsq = float((tail * tail).sum())
+        start = n - min(n, VWAP_PERIOD - 1)
+        volume = v[start:]
+        pv = (h[start:] + l[start:] + c[start:]) / 3.0 * volume
+        self.vwap_window = deque(zip(pv.tolist(), volume.tolist()))
+        self.pv_sum = float(pv.sum())
+        self.vol_sum = float(volume.sum())
+
+    def _with(self, high, low, close, volume):
+        """상태에 캔들 하나를 더한 지표 값과 평활 값 (상태는 바꾸지 않음)"""
+        emas = {
+            period: close if value is None else value + 2.0 / (period + 1) * (close - value)
+            for period, value in self.ema.items()
+        }
+        avg_gain = avg_loss = rsi_value = None
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            delta = close - self.prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.avg_gain is None:
+                avg_gain, avg_loss = gain, loss
+            else:
+                avg_gain = self.avg_gain + (gain - self.avg_gain) / RSI_PERIOD
+                avg_loss = self.avg_loss + (loss - self.avg_loss) / RSI_PERIOD
+            rsi_value = float(_rsi_value(avg_gain, avg_loss))
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        atr_value = tr if self.atr is None else self.atr + (tr - self.atr) / ATR_PERIOD
+
+        ref = close if self.ref is None else self.ref
+        x = close - ref
+        n = len(self.bb_window) + 1
+        mean = (self.bb_sum + x) / n
+        std = math.sqrt(max((self.bb_sumsq + x * x) / n - mean * mean, 0.0))
+        mid = mean + ref
+        typical = (high + low + close) / 3.0
+        vol = self.vol_sum + volume
+        vwap_value = (self.pv_sum + typical * volume) / vol if vol > 0 else typical
+        values = {
+            'ema': emas,
+            'rsi': rsi_value,
+            'atr': atr_value,
+            'vwap': vwap_value,
+            'bollinger': (mid - BB_WIDTH * std, mid, mid + BB_WIDTH * std),
+        }
+        return values, avg_gain, avg_loss
+
+    def advance(self, start_time, high, low, close, volume):
+        """마감된 캔들 하나 반영 (O(1))"""
+        high, low, close, volume = float(high), float(low), float(close), float(volume)
+        values, avg_gain, avg_loss = self._with(high, low, close, volume)
+        self.ema = values['ema']
+        if avg_gain is not None:
+            self.avg_gain, self.avg_loss = avg_gain, avg_loss
+        self.atr = values['atr']
+        self.prev_close = close
+        if self.ref is None:
+            self.ref = close
+        x = close - self.ref
+        self.bb_window.append(x)
+        self.bb_sum += x
+        self.bb_sumsq += x * x
+        if len(self.bb_window) == BB_PERIOD:
+            old = self.bb_window.popleft()
+            self.bb_sum -= old
+            self.bb_sumsq -= old * old
+        pv = (high + low + close) / 3.0 * volume
+        self.vwap_window.append((pv, volume))
+        self.pv_sum += pv
+        self.vol_sum += volume
+        if len(self.vwap_window) == VWAP_PERIOD:
+            old_pv, old_volume = self.vwap_window.popleft()
+            self.pv_sum -= old_pv
+            self.vol_sum -= old_volume
+        self.count += 1
+        self.last_time = float(start_time)
+
+    def values(self, high, low, close, volume):
+        """진행 중인 캔들까지 더한 지표 값"""
+        return self._with(float(high), float(low), float(close), float(volume))[0]
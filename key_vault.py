@@ -0,0 +1,197 @@
+"""
+API 시크릿 암호화 저장소
+
+user_apis.db의 XT 시크릿과 Backpack 개인키를 Fernet으로 암호화해 저장합니다.
+API 키(공개 식별자)는 평문으로 두어 메뉴의 '설정됨' 표시에는 복호화가 필요 없습니다.
+ - 저장 시 암호화 ('fernet:' 접두사), 접두사가 없는 기존 평문 값도 그대로 읽음
+ - 복호화는 트레이더를 만들 때만 하고 결과를 크기·TTL 제한 캐시(bytearray)에 보관
+   → 캐시된 트레이더가 있으면 버튼을 눌러도 복호화하지 않음
+ - FERNET_KEY에 쉼표로 여러 키를 넣으면 첫 번째 키로 암호화하고 나머지 키로도 복호화 (MultiFernet)
+   시작 시 백그라운드에서 평문 행과 이전 키로 암호화된 행을 첫 번째 키로 다시 암호화
+ - 캐시에서 빠지는 값은 bytearray를 0으로 덮어씀
+   (Fernet이 돌려주는 bytes와 트레이더가 쓰는 str은 불변 객체라 지울 수 없음)
+
+환경 변수:
+    FERNET_KEY          Fernet 키 (쉼표로 구분, 첫 번째가 현재 키)
+    KEY_CACHE_SIZE      복호화 캐시 최대 항목 수 (기본 1000)
+    KEY_CACHE_TTL       복호화 캐시 유지 시간(초, 기본 300)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+except ImportError:
+    Fernet = InvalidToken = MultiFernet = None
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'fernet:'
+KEY_CACHE_SIZE = int(os.getenv('KEY_CACHE_SIZE', '1000'))
+KEY_CACHE_TTL = float(os.getenv('KEY_CACHE_TTL', '300'))
+REENCRYPT_BATCH = 200
+
+
+def _zero(buffer):
+    buffer[:] = bytes(len(buffer))
+
+
+class KeyVault:
+    """Fernet 암호화 + 복호화 결과 캐시"""
+
+    def __init__(self, keys=None, cache_size=KEY_CACHE_SIZE, cache_ttl=KEY_CACHE_TTL):
+        if keys is None:
+            keys = os.getenv('FERNET_KEY', '')
+        keys = [k.strip() for k in keys.split(',') if k.strip()] if isinstance(keys, str) else list(keys)
+        self._fernet = None
+        self._primary = None
+        if keys:
+            if MultiFernet is None:
+                raise ImportError('cryptography 패키지가 필요합니다. pip install cryptography로 설치해주세요.')
+            fernets = [Fernet(k) for k in keys]
+            self._primary = fernets[0]
+            self._fernet = MultiFernet(fernets)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.reencrypted = 0
+
+    @property
+    def enabled(self):
+        return self._fernet is not None
+
+    @staticmethod
+    def is_encrypted(value):
+        return isinstance(value, str) and value.startswith(PREFIX)
+
+    def encrypt(self, plaintext):
+        """저장할 값 (키가 없으면 평문 그대로)"""
+        if not plaintext or not self.enabled:
+            return plaintext
+        return PREFIX + self._fernet.encrypt(plaintext.encode('utf-8')).decode('ascii')
+
+    def decrypt(self, value):
+        """저장된 값 → 평문 (캐시 우선). 복호화할 수 없으면 ValueError"""
+        if not self.is_encrypted(value):
+            return value
+        entry = self._cache.get(value)
+        now = time.monotonic()
+        if entry is not None:
+            buffer, expires_at = entry
+            if expires_at > now:
+                self._cache.move_to_end(value)
+                self.hits += 1
+                return buffer.decode('utf-8')
+            self._evict(value)
+        self.misses += 1
+        if not self.enabled:
+            raise ValueError('FERNET_KEY가 설정되지 않아 암호화된 API 키를 읽을 수 없습니다.')
+        try:
+            buffer = bytearray(self._fernet.decrypt(value[len(PREFIX):].encode('ascii')))
+        except InvalidToken:
+            raise ValueError('API 키를 복호화할 수 없습니다. FERNET_KEY를 확인하세요.')
+        self._cache[value] = (buffer, now + self.cache_ttl)
+        while len(self._cache) > self.cache_size:
+            self._evict(next(iter(self._cache)))
+        return buffer.decode('utf-8')
+
+    def _evict(self, value):
+        entry = self._cache.pop(value, None)
+        if entry is not None:
+            _zero(entry[0])
+
+    def clear(self):
+        """캐시된 평문 모두 지우기"""
+        for value in list(self._cache):
+            self._evict(value)
+
+    def needs_reencrypt(self, value):
+        """평문이거나 현재 키가 아닌 키로 암호화된 값인지"""
+        if not value or not self.enabled:
+            return False
+        if not self.is_encrypted(value):
+            return True
+        try:
+            self._primary.decrypt(value[len(PREFIX):].encode('ascii'))
+            return False
+        except InvalidToken:
+            return True
+
+    def reencrypt(self, value):
+        """현재 키로 다시 암호화한 저장 값"""
+        if not self.is_encrypted(value):
+            return self.encrypt(value)
+        token = self._fernet.rotate(value[len(PREFIX):].encode('ascii'))
+        return PREFIX + token.decode('ascii')
+
+    def _reencrypt_rows(self, rows):
+        updates = []
+        for user_id, *secrets in rows:
+            if not any(self.needs_reencrypt(secret) for secret in secrets):
+                continue
+            try:
+                new_secrets = [self.reencrypt(s) if self.needs_reencrypt(s) else s for s in secrets]
+            except InvalidToken:
+                logger.error(f"사용자 {user_id} API 키를 복호화할 수 없어 재암호화하지 않았습니다.")
+                continue
+            updates.append((user_id, new_secrets, secrets))
+        return updates
+
+    async def reencrypt_all(self, store, batch_size=REENCRYPT_BATCH):
+        """평문·이전 키 행을 현재 키로 다시 암호화 (배치 단위, 암호화는 별도 스레드)"""
+        if not self.enabled:
+            return 0
+        total = 0
+        after = None
+        while True:
+            rows = await store.get_secret_rows(after, batch_size)
+            if not rows:
+                break
+            after = rows[-1][0]
+            updates = await asyncio.to_thread(self._reencrypt_rows, rows)
+            if updates:
+                total += await store.update_secret_rows(updates)
+        self.reencrypted += total
+        if total:
+            logger.info(f"API 시크릿 {total}건을 현재 키로 다시 암호화했습니다.")
+        return total
+
+    async def _reencrypt_task(self, store):
+        try:
+            await self.reencrypt_all(store)
+        except Exception as e:
+            logger.error(f"API 시크릿 재암호화 실패: {e}")
+
+    def start(self, store):
+        """백그라운드 재암호화 시작"""
+        if not self.enabled:
+            logger.warning("FERNET_KEY가 설정되지 않아 API 시크릿을 암호화하지 않습니다.")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._reencrypt_task(store))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'cached': len(self._cache),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'reencrypted': self.reencrypted,
+        }
+
+
+key_vault = KeyVault()
@@ -0,0 +1,259 @@
+"""
+캔들 저장소
+
+(거래소, 마켓 타입, 심볼, 주기)마다 최근 캔들을 NumPy 열 배열(시작 시각, 시가, 고가, 저가, 종가, 거래량)로
+보관하고 지표(indicators.py)를 증분으로 계산합니다.
+ - 스트림 캔들은 한 개씩 추가 (같은 시작 시각이면 마지막 캔들 갱신) → 평균 O(1)
+   배열은 보관 개수의 2배 크기로 잡고, 끝에 닿으면 최근 캔들만 앞으로 한 번에 옮김
+ - REST 백필은 시작 시각 기준으로 병합 (같은 시각은 새 값으로 교체) 후 지표 상태를 한 번 벡터 연산으로 재계산
+ - 지표 상태는 마지막 캔들을 제외한 마감 캔들까지만 반영하고, 마지막 캔들은 조회 때 더해서 계산
+   같은 데이터로 다시 조회하면 계산 없이 이전 결과 반환
+ - 처음 조회하거나 스트림 갱신이 없는 시리즈만 REST로 다시 백필 (min(주기, 60초)마다 최대 한 번,
+   같은 시리즈 동시 백필은 한 번으로 합침)
+
+환경 변수:
+    KLINE_CAPACITY      시리즈당 보관 캔들 수 (기본 500)
+    KLINE_BACKFILL      백필 때 가져오는 캔들 수 (기본 200)
+    KLINE_MAX_SERIES    최대 시리즈 수, 넘으면 가장 오래 안 쓴 시리즈 제거 (기본 500)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from exchange_adapters import INTERVAL_SECONDS, candle_time, create_adapter
+from exchange_policy import error_result
+from indicators import MAX_PERIOD, IndicatorState
+from market_stream import KLINE_INTERVAL, market_stream
+
+logger = logging.getLogger(__name__)
+
+KLINE_CAPACITY = max(int(os.getenv('KLINE_CAPACITY', '500')), MAX_PERIOD)
+KLINE_BACKFILL = int(os.getenv('KLINE_BACKFILL', '200'))
+KLINE_MAX_SERIES = int(os.getenv('KLINE_MAX_SERIES', '500'))
+# 스트림 갱신이 없는 시리즈를 다시 백필하기까지의 최대 시간(초)
+STALE_AFTER = 60
+
+FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+
+class CandleSeries:
+    """심볼·주기 하나의 캔들 열 배열"""
+
+    def __init__(self, interval, capacity=KLINE_CAPACITY):
+        self.interval = interval
+        self.interval_ms = INTERVAL_SECONDS[interval] * 1000
+        self.capacity = capacity
+        self._data = np.zeros((len(FIELDS), capacity * 2))
+        self._end = 0
+        # generation: 마지막 캔들이 아닌 캔들이 바뀐 횟수 (바뀌면 지표 상태 재계산)
+        self.generation = 0
+        self.version = 0
+        self.updated_at = None
+        self.state = IndicatorState()
+        self._state_generation = None
+        self._cached = None
+        self._cached_version = None
+
+    def __len__(self):
+        return min(self._end, self.capacity)
+
+    def columns(self):
+        """(시작 시각, 시가, 고가, 저가, 종가, 거래량) 배열 뷰"""
+        return self._data[:, self._end - len(self):self._end]
+
+    @property
+    def last_time(self):
+        return self._data[0, self._end - 1] if self._end else None
+
+    def _push(self, row):
+        if self._end == self._data.shape[1]:
+            keep = self.capacity - 1
+            self._data[:, :keep] = self._data[:, self._end - keep:self._end]
+            self._end = keep
+        self._data[:, self._end] = row
+        self._end += 1
+
+    def append(self, row):
+        """캔들 하나 추가 (같은 시작 시각이면 마지막 캔들 갱신, 더 오래된 캔들은 병합)"""
+        last_time = self.last_time
+        if last_time is None or row[0] > last_time:
+            self._push(row)
+        elif row[0] == last_time:
+            self._data[:, self._end - 1] = row
+        else:
+            self.merge([row])
+            return
+        self._touch()
+
+    def merge(self, rows):
+        """캔들 여러 개 병합 (REST 백필). 시작 시각이 같은 기존 캔들은 새 값으로 교체"""
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(FIELDS)).T
+        if rows.shape[1] == 0:
+            return
+        combined = np.concatenate((self.columns(), rows), axis=1)
+        combined = combined[:, np.argsort(combined[0], kind='stable')]
+        # 같은 시작 시각이면 뒤쪽(새로 들어온) 값만 남김
+        keep = np.append(combined[0, 1:] != combined[0, :-1], True)
+        combined = combined[:, keep][:, -self.capacity:]
+        count = combined.shape[1]
+        self._data[:, :count] = combined
+        self._end = count
+        self.generation += 1
+        self._touch()
+
+    def _touch(self):
+        self.version += 1
+        self.updated_at = time.time()
+
+    def is_stale(self):
+        """REST로 다시 받아야 하는지 (스트림 갱신 없이 min(주기, 60초)가 지남)"""
+        if self.updated_at is None:
+            return True
+        return time.time() - self.updated_at > min(self.interval_ms / 1000, STALE_AFTER)
+
+    def indicators(self):
+        """최신 지표 (마지막 캔들은 진행 중인 캔들로 계산)"""
+        if self._cached_version == self.version:
+            return self._cached
+        n = len(self)
+        if n == 0:
+            return None
+        t, _, h, l, c, v = self.columns()
+        closed = n - 1
+        state = self.state
+        start = None
+        if self._state_generation == self.generation:
+            if state.last_time is None:
+                start = 0
+            else:
+                index = int(np.searchsorted(t, state.last_time))
+                if index < closed and t[index] == state.last_time:
+                    start = index + 1
+        if start is None:
+            # 처음 계산이거나 과거 캔들이 바뀜/밀려남 → 벡터 연산으로 재계산
+            state.rebuild(t[:closed], h[:closed], l[:closed], c[:closed], v[:closed])
+            self._state_generation = self.generation
+        else:
+            for i in range(start, closed):
+                state.advance(t[i], h[i], l[i], c[i], v[i])
+        values = state.values(h[-1], l[-1], c[-1], v[-1])
+        values.update(time=int(t[-1]), close=float(c[-1]), candles=n, interval=self.interval)
+        self._cached = values
+        self._cached_version = self.version
+        return values
+
+
+def stream_candle_row(candle):
+    """스트림 캔들 dict({'t', 'o', 'h', 'l', 'c', 'v'}) → 행"""
+    close = float(candle['c'])
+    return (
+        float(candle_time(candle['t'])),
+        float(candle.get('o') or close),
+        float(candle.get('h') or close),
+        float(candle.get('l') or close),
+        close,
+        float(candle.get('v') or 0),
+    )
+
+
+class KlineStore:
+    """캔들 시리즈 모음 + 지표 조회"""
+
+    def __init__(self, capacity=KLINE_CAPACITY, backfill=KLINE_BACKFILL, max_series=KLINE_MAX_SERIES):
+        self.capacity = capacity
+        self.backfill_size = backfill
+        self.max_series = max_series
+        self._series = OrderedDict()
+        self._inflight = {}
+        self._adapters = {}
+        self.backfills = 0
+        self.stream_candles = 0
+
+    def get(self, exchange, market_type, symbol, interval):
+        return self._series.get((exchange, market_type, symbol, interval))
+
+    def _series_for(self, key):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = CandleSeries(key[3], self.capacity)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        return series
+
+    def add_candles(self, exchange, market_type, symbol, interval, rows):
+        """REST 캔들 병합"""
+        self._series_for((exchange, market_type, symbol, interval)).merge(rows)
+
+    def add_stream_candle(self, exchange, market_type, symbol, candle):
+        """시세 스트림 캔들 반영 (지표를 조회한 적 있는 시리즈만)"""
+        series = self._series.get((exchange, market_type, symbol, KLINE_INTERVAL))
+        if series is None:
+            return
+        try:
+            series.append(stream_candle_row(candle))
+            self.stream_candles += 1
+        except (KeyError, TypeError, ValueError) as e:
+            logger.debug(f"{exchange} {symbol} 스트림 캔들 처리 실패: {e}")
+
+    def _adapter(self, exchange):
+        """공개 시세 조회용 어댑터 (API 키 없음)"""
+        adapter = self._adapters.get(exchange)
+        if adapter is None:
+            adapter = self._adapters[exchange] = create_adapter(exchange)
+        return adapter
+
+    async def _backfill(self, key):
+        exchange, market_type, symbol, interval = key
+        result = await self._adapter(exchange).fetch_klines(market_type, symbol, interval, self.backfill_size)
+        if result.get('status') == 'success':
+            self.add_candles(exchange, market_type, symbol, interval, result['data'])
+            self.backfills += 1
+        return result
+
+    async def backfill(self, exchange, market_type, symbol, interval):
+        """REST 백필 (같은 시리즈 동시 요청은 한 번으로 합침)"""
+        key = (exchange, market_type, symbol, interval)
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._backfill(key))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def indicators(self, exchange, market_type, symbol, interval=KLINE_INTERVAL):
+        """최신 지표 조회 ({'status': 'success', 'indicators': {...}})"""
+        if interval not in INTERVAL_SECONDS:
+            return {'status': 'error', 'message': f"지원하지 않는 주기: {interval} ({', '.join(INTERVAL_SECONDS)})"}
+        try:
+            series = self.get(exchange, market_type, symbol, interval)
+            if series is None or series.is_stale():
+                result = await self.backfill(exchange, market_type, symbol, interval)
+                if result.get('status') != 'success':
+                    return result
+                series = self.get(exchange, market_type, symbol, interval)
+            if interval == KLINE_INTERVAL:
+                market_stream.ensure_subscribed(exchange, market_type, symbol)
+            values = series.indicators() if series is not None else None
+            if values is None:
+                return {'status': 'error', 'message': f'{exchange.upper()} {symbol} 캔들 데이터가 없습니다.'}
+            return {'status': 'success', 'indicators': values}
+        except Exception as e:
+            logger.error(f"Indicator error: {str(e)}")
+            return error_result(f'지표 계산 오류: {str(e)}', e)
+
+    def stats(self):
+        return {
+            'series': len(self._series),
+            'candles': sum(len(series) for series in self._series.values()),
+            'backfills': self.backfills,
+            'stream_candles': self.stream_candles,
+        }
+
+
+kline_store = KlineStore()
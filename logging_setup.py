@@ -0,0 +1,194 @@
+"""
+비동기 로깅 설정
+
+ - 핸들러 스레드는 큐에 레코드만 넣고, 파일·콘솔 쓰기는 백그라운드 스레드가 처리
+ - 로그 파일은 크기(LOG_MAX_BYTES) 또는 시간(LOG_ROTATE_WHEN) 기준으로 교체
+ - 서브시스템별 레벨 조정 (LOG_LEVEL_SIGNING, LOG_LEVEL_HTTP, LOG_LEVEL_TELEGRAM, LOG_LEVEL_DB)
+ - API 키, 시크릿, 서명, 봇 토큰은 기록 전에 가림
+ - 같은 메시지가 짧은 시간에 반복되면 일정 횟수 이후는 버림
+ - LOG_FORMAT=json이면 한 줄에 JSON 하나씩 기록
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import time
+
+# 서브시스템 → 로거 이름
+SUBSYSTEMS = {
+    'signing': ('signing',),
+    'http': ('http_client', 'httpx', 'httpcore', 'market_stream', 'market_cache', 'symbol_registry', 'user_stream'),
+    'telegram': ('telegram', 'apscheduler'),
+    'db': ('user_api_store', 'position_book'),
+}
+
+DEFAULT_LEVELS = {
+    'signing': 'WARNING',
+    'http': 'WARNING',
+    'telegram': 'INFO',
+    'db': 'INFO',
+}
+
+SECRET_NAMES = (
+    r'access_key|signature|api_key|api_secret|secret_key|secret|private_key|'
+    r'X-API-Key|X-Signature|listenKey|token|password'
+)
+
+REDACT_PATTERNS = (
+    # key=value, key: value, 'key': 'value', "key": "value"
+    (re.compile(rf"""(['"]?(?:{SECRET_NAMES})['"]?\s*[:=]\s*['"]?)([^'"&,\s}}]+)""", re.IGNORECASE), r'\1***'),
+    # 텔레그램 봇 토큰 (URL 포함)
+    (re.compile(r'\d{6,}:[A-Za-z0-9_-]{30,}'), '***'),
+    # HMAC-SHA256 hex 서명
+    (re.compile(r'\b[0-9a-fA-F]{64}\b'), '***'),
+)
+
+
+def redact(text):
+    """비밀 값 가리기"""
+    for pattern, replacement in REDACT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """레코드 메시지에서 비밀 값 제거 (백그라운드 스레드에서 실행)"""
+
+    def filter(self, record):
+        message = record.getMessage()
+        redacted = redact(message)
+        if redacted != message:
+            record.msg = redacted
+            record.args = None
+        if record.exc_text:
+            record.exc_text = redact(record.exc_text)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """같은 위치의 같은 메시지 틀이 interval초 안에 burst번을 넘으면 버림"""
+
+    def __init__(self, burst=20, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR and record.exc_info:
+            return True
+        key = (record.name, record.lineno, record.levelno)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] > self.interval:
+            if len(self._windows) > 10000:
+                self._windows.clear()
+            self._windows[key] = [now, 1]
+            return True
+        window[1] += 1
+        if window[1] > self.burst:
+            self.suppressed += 1
+            return False
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """큐가 가득 차면 기다리지 않고 레코드를 버림"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """한 줄 JSON 포맷"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+_listener = None
+
+
+def _level(name, default):
+    return getattr(logging, os.getenv(name, default).upper(), logging.INFO)
+
+
+def _file_handler(path):
+    when = os.getenv('LOG_ROTATE_WHEN')
+    backups = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding='utf-8')
+    max_bytes = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+
+
+def setup_logging(log_file=None):
+    """루트 로거를 큐 기반 비동기 로깅으로 설정 (여러 번 호출해도 한 번만 적용)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if os.getenv('LOG_FORMAT', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    redacting = RedactingFilter()
+    handlers = [logging.StreamHandler()]
+    log_file = log_file or os.getenv('LOG_FILE', 'bot.log')
+    if log_file:
+        handlers.append(_file_handler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(redacting)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(
+        burst=int(os.getenv('LOG_RATE_BURST', '20')),
+        interval=float(os.getenv('LOG_RATE_INTERVAL', '10'))
+    ))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(_level('LOG_LEVEL', 'INFO'))
+
+    for subsystem, logger_names in SUBSYSTEMS.items():
+        level = _level(f'LOG_LEVEL_{subsystem.upper()}', DEFAULT_LEVELS[subsystem])
+        for name in logger_names:
+            logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """큐에 남은 로그를 모두 기록하고 백그라운드 스레드 종료"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
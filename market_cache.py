@@ -0,0 +1,110 @@
+"""
+공용 시장 데이터 캐시
+
+(exchange, market_type, symbol, data_type) 키로 공개 시세 응답을 짧게 보관하고,
+같은 키로 동시에 들어온 요청은 진행 중인 요청 하나를 함께 기다립니다(single-flight).
+인기 심볼을 여러 사용자가 같은 순간에 조회해도 거래소에는 한 번만 요청합니다.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 데이터 타입별 캐시 유지 시간(초)
+DEFAULT_TTLS = {
+    'ticker': float(os.getenv('MARKET_CACHE_TTL_TICKER', '1.0')),
+    'depth': float(os.getenv('MARKET_CACHE_TTL_DEPTH', '0.5')),
+    'kline': float(os.getenv('MARKET_CACHE_TTL_KLINE', '5.0')),
+}
+
+
+def _is_success(result):
+    return isinstance(result, dict) and result.get('status') == 'success'
+
+
+class MarketDataCache:
+    """TTL 캐시 + 동일 요청 합치기"""
+
+    def __init__(self, ttls=None, max_entries=5000):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_fetch(self, key, fetch, cache_if=_is_success):
+        """캐시된 값이 있으면 반환, 없으면 fetch()로 가져와 저장
+
+        key의 마지막 요소는 data_type이며 TTL 선택에 사용합니다.
+        cache_if(result)가 거짓인 결과(오류 등)는 저장하지 않습니다.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._on_done(key, t, cache_if))
+        return await asyncio.shield(task)
+
+    def peek(self, key):
+        """만료 전 캐시 값 (없으면 None, 요청·통계에 영향 없음)"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def _on_done(self, key, task, cache_if):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if not cache_if(result):
+            return
+        ttl = self.ttls.get(key[-1], 1.0)
+        if len(self._entries) >= self.max_entries:
+            self._prune()
+        self._entries[key] = (result, time.monotonic() + ttl)
+
+    def _prune(self):
+        """만료 항목 정리, 그래도 가득 차면 전체 비움"""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        """캐시 통계"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'size': len(self._entries),
+            'inflight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+
+market_cache = MarketDataCache()
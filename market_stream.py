@@ -0,0 +1,518 @@
+"""
+거래소 공개 WebSocket 시세 스트림
+
+XT·Backpack 공개 스트림을 구독해 티커, 호가, 캔들을 프로세스 안에 유지합니다.
+UnifiedFuturesTrader.get_market_data / get_spot_market_data는 여기 데이터가
+충분히 최신이면 네트워크 왕복 없이 바로 반환합니다.
+
+ - 처음 조회된 심볼은 그때 구독을 시작 (on-demand)
+   MARKET_STREAM_IDLE초 동안 조회가 없거나 MARKET_STREAM_MAX_SYMBOLS개를 넘으면 오래 안 쓴 심볼부터 구독 해제
+ - snapshot()은 같은 거래소 REST 시세 응답(adapter.fetch_market_data의 data)과 같은 형식으로 반환
+ - 연결이 끊기면 지수 백오프로 재연결하고 기존 구독을 다시 보냄
+ - 증분 호가는 order_book.OrderBook에 적용하고, 시퀀스가 끊기면 REST 스냅샷으로 재동기화
+ - 테스트용 로컬 가짜 서버: fake_ws_server.py
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from decimal import Decimal
+
+import http_client
+from fast_json import dumps, loads, response_json
+from order_book import OrderBook
+from symbol_registry import format_decimal, symbol_registry
+
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    websockets = None
+    WEBSOCKETS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+STREAM_URLS = {
+    ('xt', 'spot'): os.getenv('XT_SPOT_WS_URL', 'wss://stream.xt.com/public'),
+    ('xt', 'futures'): os.getenv('XT_FUTURES_WS_URL', 'wss://fstream.xt.com/ws/market'),
+    ('backpack', 'spot'): os.getenv('BACKPACK_WS_URL', 'wss://ws.backpack.exchange'),
+    ('backpack', 'futures'): os.getenv('BACKPACK_WS_URL', 'wss://ws.backpack.exchange'),
+}
+
+STREAM_MAX_AGE = float(os.getenv('MARKET_STREAM_MAX_AGE', '5'))
+STREAM_MAX_SYMBOLS = int(os.getenv('MARKET_STREAM_MAX_SYMBOLS', '200'))
+STREAM_IDLE = float(os.getenv('MARKET_STREAM_IDLE', '600'))
+KLINE_INTERVAL = '1m'
+DEPTH_LEVELS = 20
+DEPTH_SNAPSHOT_URLS = {
+    'backpack': os.getenv('BACKPACK_DEPTH_URL', 'https://api.backpack.exchange/api/v1/depth'),
+}
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+
+def native_symbol(exchange, market_type, symbol):
+    """거래소 스트림에서 쓰는 심볼 이름"""
+    return symbol_registry.native(exchange, market_type, symbol)
+
+
+def _levels(levels):
+    return [[format_decimal(Decimal(str(price))), format_decimal(Decimal(str(size)))] for price, size in levels]
+
+
+def rest_shape(exchange, native, data_type, data):
+    """스트림 데이터 → 같은 거래소 REST 시세 응답 형식"""
+    if data_type == 'ticker':
+        if exchange == 'xt':
+            # XT 스트림 티커와 REST 24hr 티커는 필드가 같음
+            return [data]
+        return [{
+            'symbol': data.get('s'), 'firstPrice': data.get('o'), 'lastPrice': data.get('c'),
+            'high': data.get('h'), 'low': data.get('l'), 'volume': data.get('v'), 'quoteVolume': data.get('V'),
+        }]
+    if data_type == 'depth':
+        bids, asks, sequence = _levels(data['bids']), _levels(data['asks']), data.get('sequence')
+        if exchange == 'xt':
+            return {'s': native, 'u': sequence, 'b': bids, 'a': asks}
+        return {'bids': bids, 'asks': asks, 'lastUpdateId': str(sequence) if sequence is not None else None}
+    if data_type == 'kline':
+        if exchange == 'xt':
+            # q: 거래량, v: 거래대금
+            return [{'t': c['t'], 'o': c['o'], 'c': c['c'], 'h': c['h'], 'l': c['l'], 'q': c['v'], 'v': c.get('a')}
+                    for c in data]
+        return [{'start': c['t'], 'open': c['o'], 'high': c['h'], 'low': c['l'], 'close': c['c'], 'volume': c['v']}
+                for c in data]
+    return data
+
+
+class MarketView:
+    """심볼 하나의 최신 시세 (티커, 호가, 캔들)"""
+
+    def __init__(self, max_candles=500):
+        self.ticker = None
+        self.book = OrderBook()
+        self.candles = deque(maxlen=max_candles)
+        self.updated = {}
+        self.last_used = time.monotonic()
+
+    def set_ticker(self, data):
+        self.ticker = data
+        self.updated['ticker'] = time.monotonic()
+
+    def set_depth(self, bids, asks, sequence=None):
+        """호가 스냅샷 적용"""
+        self.book.apply_snapshot(bids, asks, sequence)
+        self.updated['depth'] = time.monotonic()
+
+    def apply_depth_diff(self, bids, asks, first_seq, last_seq):
+        """호가 증분 적용 (False면 재동기화 필요)"""
+        if not self.book.apply_diff(bids, asks, first_seq, last_seq):
+            return False
+        self.updated['depth'] = time.monotonic()
+        return True
+
+    def add_candle(self, candle):
+        """캔들 추가 (같은 시작 시각이면 마지막 캔들 갱신)
+
+        candle: {'t': 시작 시각, 'o', 'h', 'l', 'c', 'v': 거래량, 'a': 거래대금(없으면 None)}
+        """
+        if self.candles and self.candles[-1]['t'] == candle['t']:
+            self.candles[-1] = candle
+        else:
+            self.candles.append(candle)
+        self.updated['kline'] = time.monotonic()
+
+    def fresh(self, data_type, max_age):
+        """max_age초 이내에 갱신되었는지"""
+        updated = self.updated.get(data_type)
+        return updated is not None and time.monotonic() - updated <= max_age
+
+    def snapshot(self, data_type, max_age, limit=10):
+        """max_age초 이내에 갱신된 데이터 반환 (없으면 None)"""
+        if not self.fresh(data_type, max_age):
+            return None
+        if data_type == 'ticker':
+            return self.ticker
+        if data_type == 'depth':
+            if not self.book.synced:
+                return None
+            return {**self.book.snapshot(limit), 'sequence': self.book.sequence}
+        if data_type == 'kline':
+            return list(self.candles)[-limit:]
+        return None
+
+
+class StreamConnection:
+    """거래소 WebSocket 연결 1개 (재연결·재구독 포함)"""
+
+    exchange = None
+    app_ping_interval = None
+    label = '시세 스트림'
+
+    def __init__(self, manager, url):
+        self.manager = manager
+        self.url = url
+        self.topics = set()
+        # 거래소 심볼 → 그 심볼을 쓰는 (market_type, 조회 심볼) 별칭 집합 ('BTC_USDT', 'btc_usdt'가 같은 구독을 공유)
+        self.routes = {}
+        self.ws = None
+        self.task = None
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+
+    def add(self, market_type, symbol):
+        """심볼 구독 추가 (연결되어 있으면 즉시 구독 메시지 전송)"""
+        native = native_symbol(self.exchange, market_type, symbol)
+        self.routes.setdefault(native, set()).add((market_type, symbol))
+        topics = [t for t in self.topics_for(native) if t not in self.topics]
+        if not topics:
+            return
+        self.topics.update(topics)
+        if self.ws is not None:
+            asyncio.ensure_future(self._send_subscribe(topics))
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def remove(self, market_type, symbol):
+        """별칭 하나 제거. 같은 거래소 심볼을 쓰는 별칭이 더 없을 때만 구독 해제"""
+        native = native_symbol(self.exchange, market_type, symbol)
+        aliases = self.routes.get(native)
+        if not aliases or (market_type, symbol) not in aliases:
+            return
+        aliases.discard((market_type, symbol))
+        if aliases:
+            return
+        del self.routes[native]
+        topics = [t for t in self.topics_for(native) if t in self.topics]
+        self.topics.difference_update(topics)
+        if topics and self.ws is not None:
+            asyncio.ensure_future(self._send(self.unsubscribe_message(sorted(topics))))
+
+    def topics_for(self, native):
+        raise NotImplementedError
+
+    def subscribe_message(self, topics):
+        raise NotImplementedError
+
+    def unsubscribe_message(self, topics):
+        raise NotImplementedError
+
+    def handle(self, message):
+        raise NotImplementedError
+
+    async def prepare(self):
+        """연결 직전 준비 작업 (인증 토큰 발급 등). 접속할 URL 반환"""
+        return self.url
+
+    def views_for(self, native):
+        """거래소 심볼을 쓰는 별칭마다 (market_type, symbol, MarketView)"""
+        targets = []
+        for market_type, symbol in self.routes.get(native, ()):
+            view = self.manager.views.get((self.exchange, market_type, symbol))
+            if view is not None:
+                targets.append((market_type, symbol, view))
+        return targets
+
+    def add_candle(self, market_type, symbol, view, candle):
+        """캔들 반영 후 캔들 구독자(kline_store 등)에게 전달"""
+        view.add_candle(candle)
+        sink = self.manager.candle_sink
+        if sink is not None:
+            sink(self.exchange, market_type, symbol, candle)
+
+    async def _send_subscribe(self, topics):
+        await self._send(self.subscribe_message(sorted(topics)))
+
+    async def _send(self, message):
+        try:
+            await self.ws.send(dumps(message))
+        except Exception as e:
+            logger.warning(f"{self.exchange} 구독 전송 실패: {e}")
+
+    async def _app_ping(self, ws):
+        while True:
+            await asyncio.sleep(self.app_ping_interval)
+            await ws.send('ping')
+
+    async def run(self):
+        """연결 유지 루프 (끊기면 지수 백오프 후 재연결)"""
+        delay = RECONNECT_MIN_DELAY
+        while self.manager.running:
+            pinger = None
+            try:
+                url = await self.prepare()
+                async with websockets.connect(url, ping_interval=20, max_size=2 ** 22) as ws:
+                    self.ws = ws
+                    self.connected.set()
+                    delay = RECONNECT_MIN_DELAY
+                    logger.info(f"{self.exchange} {self.label} 연결: {self.url}")
+                    if self.topics:
+                        await self._send_subscribe(self.topics)
+                    if self.app_ping_interval:
+                        pinger = asyncio.ensure_future(self._app_ping(ws))
+                    async for raw in ws:
+                        if raw in ('pong', 'ping'):
+                            continue
+                        try:
+                            self.handle(loads(raw))
+                        except Exception as e:
+                            logger.debug(f"{self.exchange} 스트림 메시지 처리 실패: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.exchange} {self.label} 연결 끊김: {e}")
+            finally:
+                self.ws = None
+                self.connected.clear()
+                if pinger is not None:
+                    pinger.cancel()
+            if not self.manager.running:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.task = None
+
+
+class XtStreamConnection(StreamConnection):
+    """XT 공개 스트림 (topic@symbol 형식)"""
+
+    exchange = 'xt'
+    app_ping_interval = 15
+
+    def __init__(self, manager, url, market_type):
+        super().__init__(manager, url)
+        self.method = 'SUBSCRIBE' if market_type == 'futures' else 'subscribe'
+        self._next_id = 0
+
+    def topics_for(self, native):
+        return [
+            f"ticker@{native}",
+            f"depth@{native},{DEPTH_LEVELS}",
+            f"kline@{native},{KLINE_INTERVAL}",
+        ]
+
+    def subscribe_message(self, topics):
+        self._next_id += 1
+        return {'method': self.method, 'params': topics, 'id': str(self._next_id)}
+
+    def unsubscribe_message(self, topics):
+        self._next_id += 1
+        method = 'UNSUBSCRIBE' if self.method == 'SUBSCRIBE' else 'unsubscribe'
+        return {'method': method, 'params': topics, 'id': str(self._next_id)}
+
+    def handle(self, message):
+        topic = message.get('topic')
+        data = message.get('data')
+        if not topic or not isinstance(data, dict):
+            return
+        for market_type, symbol, view in self.views_for(data.get('s', '')):
+            if topic == 'ticker':
+                view.set_ticker(data)
+            elif topic == 'depth':
+                view.set_depth(data.get('b', []), data.get('a', []), data.get('i'))
+            elif topic == 'kline':
+                # XT 캔들: q 거래량, v 거래대금
+                self.add_candle(market_type, symbol, view, {
+                    't': data.get('t'), 'o': data.get('o'), 'h': data.get('h'),
+                    'l': data.get('l'), 'c': data.get('c'), 'v': data.get('q'), 'a': data.get('v')
+                })
+
+
+class BackpackStreamConnection(StreamConnection):
+    """Backpack 공개 스트림 (type.SYMBOL 형식, 현물·선물 공용 연결)"""
+
+    exchange = 'backpack'
+
+    def topics_for(self, native):
+        return [
+            f"ticker.{native}",
+            f"depth.{native}",
+            f"kline.{KLINE_INTERVAL}.{native}",
+        ]
+
+    def subscribe_message(self, topics):
+        return {'method': 'SUBSCRIBE', 'params': topics}
+
+    def unsubscribe_message(self, topics):
+        return {'method': 'UNSUBSCRIBE', 'params': topics}
+
+    def handle(self, message):
+        data = message.get('data')
+        if not isinstance(data, dict):
+            return
+        event = data.get('e')
+        for market_type, symbol, view in self.views_for(data.get('s', '')):
+            if event == 'ticker':
+                view.set_ticker(data)
+            elif event == 'depth':
+                if not view.apply_depth_diff(data.get('b', []), data.get('a', []), data.get('U'), data.get('u')):
+                    self.manager.request_resync(self.exchange, market_type, symbol)
+            elif event == 'kline':
+                self.add_candle(market_type, symbol, view, {
+                    't': data.get('t'), 'o': data.get('o'), 'h': data.get('h'),
+                    'l': data.get('l'), 'c': data.get('c'), 'v': data.get('v'), 'a': None
+                })
+
+
+class MarketStreamManager:
+    """시세 스트림 관리자"""
+
+    def __init__(self, urls=None, max_age=STREAM_MAX_AGE, max_symbols=STREAM_MAX_SYMBOLS, idle_timeout=STREAM_IDLE):
+        self.urls = dict(STREAM_URLS)
+        if urls:
+            self.urls.update(urls)
+        self.max_age = max_age
+        self.max_symbols = max_symbols
+        self.idle_timeout = idle_timeout
+        self.running = False
+        # 구독 중인 심볼 (오래 안 쓴 순서)
+        self.views = OrderedDict()
+        self.connections = {}
+        self.snapshot_fetcher = fetch_depth_snapshot
+        # 캔들 수신 콜백 (exchange, market_type, symbol, candle)
+        self.candle_sink = None
+        self._resyncing = set()
+        self._reaper = None
+
+    def start(self):
+        """스트림 사용 시작 (실제 연결은 첫 구독 시)"""
+        if not WEBSOCKETS_AVAILABLE:
+            logger.warning("websockets 라이브러리가 없어 시세 스트림을 사용하지 않습니다.")
+            return
+        self.running = True
+        if self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._reap_idle())
+
+    async def stop(self):
+        self.running = False
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        for connection in list(self.connections.values()):
+            await connection.close()
+        self.connections.clear()
+
+    def view(self, exchange, market_type, symbol):
+        key = (exchange, market_type, symbol)
+        view = self.views.get(key)
+        if view is None:
+            view = self.views[key] = MarketView()
+        return view
+
+    def _connection(self, exchange, market_type):
+        url = self.urls[(exchange, market_type)]
+        connection = self.connections.get((exchange, url))
+        if connection is None:
+            if exchange == 'xt':
+                connection = XtStreamConnection(self, url, market_type)
+            else:
+                connection = BackpackStreamConnection(self, url)
+            self.connections[(exchange, url)] = connection
+        return connection
+
+    def ensure_subscribed(self, exchange, market_type, symbol):
+        """심볼 구독 보장 (이벤트 루프 안에서 호출). 최대 심볼 수를 넘으면 가장 오래 안 쓴 심볼 구독 해제"""
+        if not self.running or not symbol or (exchange, market_type) not in self.urls:
+            return
+        self._touch(self.view(exchange, market_type, symbol), (exchange, market_type, symbol))
+        self._connection(exchange, market_type).add(market_type, symbol)
+        while len(self.views) > self.max_symbols:
+            self.unsubscribe(*next(iter(self.views)))
+
+    def unsubscribe(self, exchange, market_type, symbol):
+        """심볼 구독 해제 (스트림 데이터도 버림)"""
+        self.views.pop((exchange, market_type, symbol), None)
+        connection = self.connections.get((exchange, self.urls.get((exchange, market_type))))
+        if connection is not None:
+            connection.remove(market_type, symbol)
+
+    def _touch(self, view, key):
+        view.last_used = time.monotonic()
+        self.views.move_to_end(key)
+
+    def _used_view(self, exchange, market_type, symbol):
+        """조회용 MarketView (사용 시각 갱신, 없으면 None)"""
+        if not self.running:
+            return None
+        key = (exchange, market_type, symbol)
+        view = self.views.get(key)
+        if view is not None:
+            self._touch(view, key)
+        return view
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 4, 60))
+            cutoff = time.monotonic() - self.idle_timeout
+            for key, view in list(self.views.items()):
+                if view.last_used < cutoff:
+                    logger.info(f"{key[0]} {key[2]} 시세 스트림 구독 해제 (미사용)")
+                    self.unsubscribe(*key)
+
+    def request_resync(self, exchange, market_type, symbol):
+        """호가 스냅샷 재동기화 예약 (같은 심볼은 한 번에 하나만)"""
+        key = (exchange, market_type, symbol)
+        if key in self._resyncing or not self.running:
+            return
+        self._resyncing.add(key)
+        asyncio.ensure_future(self._resync(key))
+
+    async def _resync(self, key):
+        exchange, market_type, symbol = key
+        try:
+            data = await self.snapshot_fetcher(exchange, native_symbol(exchange, market_type, symbol))
+            sequence = data.get('lastUpdateId')
+            view = self.views.get(key)
+            if view is None:
+                return
+            view.set_depth(data.get('bids', []), data.get('asks', []), int(sequence) if sequence is not None else None)
+        except Exception as e:
+            logger.warning(f"{exchange} {symbol} 호가 재동기화 실패: {e}")
+        finally:
+            self._resyncing.discard(key)
+
+    def order_book(self, exchange, market_type, symbol, max_age=None):
+        """동기화된 최신 호가창 (없으면 None)"""
+        view = self._used_view(exchange, market_type, symbol)
+        if view is None or not view.book.synced or not view.fresh('depth', self.max_age if max_age is None else max_age):
+            return None
+        return view.book
+
+    def snapshot(self, exchange, market_type, symbol, data_type, max_age=None):
+        """스트림 데이터 조회 (REST 응답과 같은 형식, 오래됐거나 없으면 None)"""
+        view = self._used_view(exchange, market_type, symbol)
+        if view is None:
+            return None
+        data = view.snapshot(data_type, self.max_age if max_age is None else max_age)
+        if data is None:
+            return None
+        return rest_shape(exchange, native_symbol(exchange, market_type, symbol), data_type, data)
+
+    def stats(self):
+        return {
+            'symbols': len(self.views),
+            'connections': len(self.connections),
+        }
+
+
+async def fetch_depth_snapshot(exchange, native):
+    """REST 호가 스냅샷 조회 (증분 스트림 재동기화용)"""
+    response = await http_client.request('GET', DEPTH_SNAPSHOT_URLS[exchange], params={'symbol': native})
+    response.raise_for_status()
+    return response_json(response)
+
+
+market_stream = MarketStreamManager()
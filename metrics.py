@@ -0,0 +1,113 @@
+"""
+Prometheus 텍스트 형식 지표
+
+핫 패스에서는 숫자 몇 개만 더하도록 가볍게 만들었습니다.
+ - Histogram: 라벨 값 튜플마다 버킷 배열을 dict에 보관 (락 없음, 이벤트 루프·스레드 모두에서 사용)
+ - gauge(): 값을 계산하는 함수를 등록해 두고 /metrics 요청 때만 호출 (큐 깊이, 캐시 적중률 등)
+ - render(): /metrics 응답 본문
+
+사용 예:
+    started = time.perf_counter()
+    ...
+    EXCHANGE_LATENCY.observe(time.perf_counter() - started, 'xt', '/v4/order', '200')
+"""
+
+import bisect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+
+_metrics = []
+_gauges = []
+START_TIME = time.time()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class Histogram:
+    """누적 버킷 히스토그램 (단위: 초)"""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        _metrics.append(self)
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            # [버킷별 개수..., +Inf 개수, 합계]
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        label_names = self.labels + ('le',)
+        for values, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(label_names, values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, values)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, values)} {cumulative}")
+        return lines
+
+
+def gauge(name, help_text, fn, labels=()):
+    """스크랩할 때 fn()을 호출하는 게이지. 라벨이 있으면 fn은 {라벨 값 튜플: 값} 반환"""
+    _gauges.append((name, help_text, tuple(labels), fn))
+
+
+def _render_gauge(name, help_text, labels, fn):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    value = fn()
+    if labels:
+        for values, v in value.items():
+            values = values if isinstance(values, tuple) else (values,)
+            lines.append(f"{name}{_label_text(labels, values)} {v}")
+    elif value is not None:
+        lines.append(f"{name} {value}")
+    return lines
+
+
+def render():
+    """/metrics 응답 본문"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, help_text, labels, fn in _gauges:
+        try:
+            lines.extend(_render_gauge(name, help_text, labels, fn))
+        except Exception as e:
+            logger.debug(f"Gauge {name} error: {e}")
+    lines.append("# HELP process_uptime_seconds 프로세스 실행 시간")
+    lines.append("# TYPE process_uptime_seconds gauge")
+    lines.append(f"process_uptime_seconds {time.time() - START_TIME:.0f}")
+    return '\n'.join(lines) + '\n'
+
+
+EXCHANGE_LATENCY = Histogram(
+    'exchange_request_seconds', '거래소 REST 요청 시간', ('exchange', 'endpoint', 'status'))
+SIGNING_LATENCY = Histogram(
+    'signing_seconds', '요청 서명 시간', ('exchange',), buckets=FAST_BUCKETS)
+DB_LATENCY = Histogram(
+    'db_operation_seconds', 'DB 작업 시간 (대기 포함)', ('operation',), buckets=FAST_BUCKETS + (0.1, 0.5, 1.0))
+TELEGRAM_LATENCY = Histogram(
+    'telegram_request_seconds', '텔레그램 Bot API 요청 시간', ('method', 'status'))
+UPDATE_LATENCY = Histogram(
+    'update_handling_seconds', '텔레그램 업데이트 처리 시간')
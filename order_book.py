@@ -0,0 +1,295 @@
+"""
+심볼별 로컬 호가창
+
+가격 레벨을 틱 단위 가격 슬롯 위의 펜윅 트리(Fenwick tree)로 보관하고 증분(diff) 업데이트를 적용합니다.
+ - 시퀀스 번호로 누락을 감지하면 동기화 해제 후 스냅샷으로 재동기화
+ - 스냅샷을 기다리는 동안 들어온 증분은 버퍼에 보관했다가 이어서 적용
+ - 레벨 변경, 최우선 호가, 누적 잔량, 지정 수량 체결 VWAP 조회 모두 O(log 슬롯 수)
+
+슬롯은 가격 × 10^소수 자릿수(틱)를 정수로 바꾼 값이고, 슬롯 구간은 호가 가격 범위의 약 3배(2의 거듭제곱)입니다.
+구간 밖 가격이나 더 작은 틱의 가격이 들어오면 그때 구간을 넓혀 다시 만듭니다 (레벨 수 × log).
+트리는 값이 있는 노드만 dict에 보관하므로 메모리는 레벨 수에 비례합니다.
+"""
+
+from collections import deque
+from decimal import Decimal
+from math import floor
+
+MAX_DECIMALS = 12
+# 슬롯 구간 양쪽 여유 (틱 수)
+MIN_MARGIN = 64
+
+
+def _decimals(price):
+    """가격의 소수 자릿수 (43000.1 → 1)"""
+    exponent = Decimal(repr(price)).as_tuple().exponent
+    return min(max(-exponent, 0), MAX_DECIMALS)
+
+
+class FenwickTree:
+    """슬롯 1..limit 구간 합 트리 (limit은 2의 거듭제곱, 값이 있는 노드만 보관)"""
+
+    __slots__ = ('limit', 'nodes')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.nodes = {}
+
+    def add(self, index, delta):
+        nodes = self.nodes
+        limit = self.limit
+        while index <= limit:
+            nodes[index] = nodes.get(index, 0) + delta
+            index += index & -index
+
+    def prefix(self, index):
+        """슬롯 1..index 합"""
+        nodes = self.nodes
+        total = 0
+        while index > 0:
+            total += nodes.get(index, 0)
+            index -= index & -index
+        return total
+
+    def total(self):
+        return self.nodes.get(self.limit, 0)
+
+    def search(self, value):
+        """prefix(index) < value인 가장 큰 index (값이 모두 0 이상일 때)"""
+        nodes = self.nodes
+        index = 0
+        step = self.limit
+        while step:
+            if index + step <= self.limit:
+                node = nodes.get(index + step, 0)
+                if node < value:
+                    index += step
+                    value -= node
+            step >>= 1
+        return index
+
+
+class BookSide:
+    """호가 한쪽 (슬롯 순서 = 최우선 호가부터)
+
+    매수 호가는 가격에 -1을 곱한 키로 슬롯을 정하므로 두 쪽 모두 슬롯이 작을수록 최우선 호가입니다.
+    """
+
+    __slots__ = ('is_bid', 'scale', 'base', '_levels', '_count', '_size', '_notional')
+
+    def __init__(self, is_bid):
+        self.is_bid = is_bid
+        self.scale = 1
+        self.base = 0
+        self._reset(1)
+
+    def __len__(self):
+        return len(self._levels)
+
+    def _reset(self, limit):
+        # 슬롯 → (가격, 잔량)
+        self._levels = {}
+        self._count = FenwickTree(limit)
+        self._size = FenwickTree(limit)
+        self._notional = FenwickTree(limit)
+
+    def clear(self):
+        self._reset(1)
+
+    def _tick(self, price):
+        """틱 단위 정수 키"""
+        return round((-price if self.is_bid else price) * self.scale)
+
+    def _rebuild(self, price):
+        """price까지 담도록 틱·슬롯 구간을 다시 정하고 트리를 다시 만듦"""
+        levels = list(self._levels.values())
+        self.scale = max(self.scale, 10 ** _decimals(price))
+        ticks = [self._tick(level_price) for level_price, _ in levels] + [self._tick(price)]
+        low, high = min(ticks), max(ticks)
+        margin = max(high - low, MIN_MARGIN)
+        self.base = low - margin - 1
+        self._reset(1 << (high - self.base + margin).bit_length())
+        for level_price, size in levels:
+            self._insert(self._tick(level_price) - self.base, level_price, size)
+
+    def _insert(self, slot, price, size):
+        self._levels[slot] = (price, size)
+        self._count.add(slot, 1)
+        self._size.add(slot, size)
+        self._notional.add(slot, size * price)
+
+    def set_level(self, price, size):
+        """가격 레벨 설정 (size가 0이면 삭제)"""
+        fine = not (price * self.scale).is_integer() and 10 ** _decimals(price) > self.scale
+        slot = self._tick(price) - self.base
+        if fine or not 0 < slot <= self._count.limit:
+            if size <= 0:
+                # 구간 밖이거나 더 작은 틱이면 있는 레벨이 아님
+                return
+            self._rebuild(price)
+            slot = self._tick(price) - self.base
+        old = self._levels.get(slot)
+        if size <= 0:
+            if old is not None:
+                del self._levels[slot]
+                self._count.add(slot, -1)
+                self._size.add(slot, -old[1])
+                self._notional.add(slot, -old[1] * old[0])
+        elif old is None:
+            self._insert(slot, price, size)
+        else:
+            self._levels[slot] = (price, size)
+            self._size.add(slot, size - old[1])
+            self._notional.add(slot, (size - old[1]) * price)
+
+    def _nth(self, n):
+        """n번째(1부터) 레벨의 슬롯"""
+        return self._count.search(n) + 1
+
+    def best(self):
+        """최우선 호가 (price, size), 비어 있으면 None"""
+        if not self._levels:
+            return None
+        return self._levels[self._nth(1)]
+
+    def levels(self, limit=None):
+        """[[price, size], ...] (최우선 호가부터)"""
+        n = len(self._levels) if limit is None else min(limit, len(self._levels))
+        return [list(self._levels[self._nth(i)]) for i in range(1, n + 1)]
+
+    def depth_to_price(self, price):
+        """최우선 호가부터 price까지(포함)의 누적 잔량"""
+        key = -price if self.is_bid else price
+        slot = floor(key * self.scale + 1e-6) - self.base
+        return max(self._size.prefix(min(max(slot, 0), self._size.limit)), 0.0)
+
+    def fill(self, size):
+        """size만큼 시장가로 체결할 때 (vwap, 체결 가능 수량, 최악 체결가)"""
+        if not self._levels or size <= 0:
+            return None, 0.0, None
+        slot = self._size.search(size) + 1
+        if slot not in self._levels:
+            # 전체 잔량이 모자라거나, 누적 합 반올림 오차로 빈 슬롯에 걸렸으면 다음 레벨로
+            rank = self._count.prefix(min(slot, self._count.limit)) + 1
+            slot = self._nth(rank) if rank <= len(self._levels) else None
+        if slot is None:
+            filled = self._size.total()
+            return self._notional.total() / filled, filled, self._levels[self._nth(len(self._levels))][0]
+        prev_size = self._size.prefix(slot - 1)
+        prev_notional = self._notional.prefix(slot - 1)
+        price = self._levels[slot][0]
+        notional = prev_notional + (size - prev_size) * price
+        return notional / size, size, price
+
+
+class OrderBook:
+    """심볼 하나의 호가창"""
+
+    def __init__(self, symbol=None, max_buffer=1000):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.sequence = None
+        self.synced = False
+        self.resyncs = 0
+        self._buffer = deque(maxlen=max_buffer)
+
+    def apply_snapshot(self, bids, asks, sequence=None):
+        """전체 스냅샷 적용 후, 버퍼에 쌓인 이후 증분을 이어서 적용"""
+        self.bids.clear()
+        self.asks.clear()
+        for price, size in bids:
+            self.bids.set_level(float(price), float(size))
+        for price, size in asks:
+            self.asks.set_level(float(price), float(size))
+        self.sequence = sequence
+        self.synced = True
+        buffered = list(self._buffer)
+        self._buffer.clear()
+        for diff in buffered:
+            if not self.apply_diff(*diff):
+                break
+
+    def apply_diff(self, bids, asks, first_seq=None, last_seq=None):
+        """증분 업데이트 적용
+
+        반환값이 False면 시퀀스가 끊긴 것이므로 스냅샷으로 재동기화해야 합니다.
+        """
+        if not self.synced:
+            self._buffer.append((bids, asks, first_seq, last_seq))
+            return False
+        if last_seq is not None and self.sequence is not None:
+            if last_seq <= self.sequence:
+                return True
+            if first_seq is not None and first_seq > self.sequence + 1:
+                self.invalidate()
+                self._buffer.append((bids, asks, first_seq, last_seq))
+                return False
+        for price, size in bids:
+            self.bids.set_level(float(price), float(size))
+        for price, size in asks:
+            self.asks.set_level(float(price), float(size))
+        if last_seq is not None:
+            self.sequence = last_seq
+        return True
+
+    def invalidate(self):
+        """동기화 해제 (다음 스냅샷까지 증분은 버퍼에 보관)"""
+        if self.synced:
+            self.resyncs += 1
+        self.synced = False
+
+    # --------- 조회 ---------
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def spread(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def mid_price(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (ask[0] + bid[0]) / 2
+
+    def cumulative_depth(self, side, price):
+        """side('bid'/'ask') 최우선 호가부터 price까지의 누적 잔량"""
+        book_side = self.bids if side == 'bid' else self.asks
+        return book_side.depth_to_price(price)
+
+    def vwap_for_size(self, side, size):
+        """시장가 주문 예상 체결 정보
+
+        side가 'buy'면 매도 호가를, 'sell'이면 매수 호가를 소진합니다.
+        반환: {'vwap', 'filled', 'worst_price', 'complete'} 또는 호가가 없으면 None
+        """
+        book_side = self.asks if side == 'buy' else self.bids
+        vwap, filled, worst_price = book_side.fill(size)
+        if vwap is None:
+            return None
+        return {
+            'vwap': vwap,
+            'filled': filled,
+            'worst_price': worst_price,
+            'complete': filled >= size
+        }
+
+    def snapshot(self, limit=10):
+        return {'bids': self.bids.levels(limit), 'asks': self.asks.levels(limit)}
+
+
+def book_from_depth(data, symbol=None):
+    """REST 호가 응답(XT 'b'/'a' 또는 'bids'/'asks' 형식)으로 OrderBook 생성"""
+    data = data or {}
+    bids = data.get('bids', data.get('b')) or []
+    asks = data.get('asks', data.get('a')) or []
+    sequence = data.get('lastUpdateId', data.get('u'))
+    book = OrderBook(symbol)
+    book.apply_snapshot(bids, asks, int(sequence) if sequence is not None else None)
+    return book
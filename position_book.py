@@ -0,0 +1,257 @@
+"""
+사용자별 포지션 / 손익 장부
+
+주문 결과와 체결 스트림으로 들어온 체결을 (사용자, 거래소, 마켓 타입, 심볼) 단위 포지션에
+바로 반영하고 user_apis.db에 저장합니다. 포지션 메뉴는 거래소를 다시 조회하지 않고 여기서 그립니다.
+ - 포지션은 부호 있는 수량(롱 +, 숏 -)과 평균 진입가만 보관하므로 체결 하나는 O(1)
+ - 실현 손익: 포지션을 줄이는 체결마다 (체결가 - 평균가) × 줄어든 수량
+ - 미실현 손익: 수량 × (마크 가격 - 평균가), 마크 가격은 스트림·캐시 시세 또는 마지막 체결가
+ - 같은 체결(주문 ID/체결 ID)이 주문 결과와 스트림(user_stream.py)으로 두 번 들어와도 한 번만 반영
+ - 심볼은 symbol_registry.book_symbol로 맞춰서 저장 (메뉴의 'BTC'와 스트림의 'btc_usdt'가 같은 포지션)
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+from symbol_registry import symbol_registry
+from user_api_store import user_store
+
+logger = logging.getLogger(__name__)
+
+# 수량이 이보다 작으면 포지션이 닫힌 것으로 봄
+QTY_EPSILON = 1e-12
+
+
+def ticker_price(data):
+    """티커 응답(스트림/REST, dict 또는 list)에서 최근 체결가 추출 (없으면 None)"""
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if not isinstance(data, dict):
+        return None
+    for key in ('c', 'lastPrice', 'price', 'markPrice'):
+        value = data.get(key)
+        if value not in (None, ''):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+class Position:
+    """심볼 하나의 포지션 (qty > 0 롱, qty < 0 숏)"""
+
+    __slots__ = ('exchange', 'market_type', 'symbol', 'qty', 'avg_price', 'realized_pnl', 'last_price', 'updated_at')
+
+    def __init__(self, exchange, market_type, symbol, qty=0.0, avg_price=0.0, realized_pnl=0.0, last_price=None, updated_at=None):
+        self.exchange = exchange
+        self.market_type = market_type
+        self.symbol = symbol
+        self.qty = qty
+        self.avg_price = avg_price
+        self.realized_pnl = realized_pnl
+        self.last_price = last_price
+        self.updated_at = updated_at
+
+    @property
+    def is_open(self):
+        return abs(self.qty) > QTY_EPSILON
+
+    @property
+    def direction(self):
+        if not self.is_open:
+            return 'flat'
+        if self.market_type == 'spot':
+            return 'spot'
+        return 'long' if self.qty > 0 else 'short'
+
+    def apply_fill(self, side, qty, price, fee=0.0):
+        """체결 반영. 이번 체결로 실현된 손익 반환"""
+        signed = qty if side in ('buy', 'long') else -qty
+        realized = 0.0
+        if self.qty == 0 or (self.qty > 0) == (signed > 0):
+            total = self.qty + signed
+            self.avg_price = (self.avg_price * abs(self.qty) + price * qty) / abs(total)
+            self.qty = total
+        else:
+            closed = min(qty, abs(self.qty))
+            realized = closed * (price - self.avg_price) * (1 if self.qty > 0 else -1)
+            self.qty += signed
+            if not self.is_open:
+                self.qty = 0.0
+                self.avg_price = 0.0
+            elif (self.qty > 0) == (signed > 0):
+                # 반대 방향으로 넘어간 나머지는 새 포지션
+                self.avg_price = price
+        realized -= fee
+        self.realized_pnl += realized
+        self.last_price = price
+        self.updated_at = time.time()
+        return realized
+
+    def unrealized_pnl(self, mark=None):
+        mark = mark if mark is not None else self.last_price
+        if not self.is_open or mark is None:
+            return 0.0
+        return self.qty * (mark - self.avg_price)
+
+
+class PositionBook:
+    """사용자·거래소별 포지션 장부 (메모리 + DB)"""
+
+    def __init__(self, store=user_store, max_users=10000, max_seen=2000):
+        self.store = store
+        self.max_users = max_users
+        self.max_seen = max_seen
+        # 마크 가격 조회 함수 (exchange, market_type, symbol) -> float 또는 None
+        self.mark_source = None
+        self._books = OrderedDict()
+        self._seen = {}
+        self.fills = 0
+
+    async def positions(self, user_id, exchange=None):
+        """사용자 포지션 목록 (처음 조회 시 DB에서 불러옴)"""
+        book = await self._book(user_id)
+        return [p for (ex, _, _), p in book.items() if exchange is None or ex == exchange]
+
+    async def open_positions(self, user_id, exchange=None):
+        return [p for p in await self.positions(user_id, exchange) if p.is_open]
+
+    async def get(self, user_id, exchange, market_type, symbol):
+        book = await self._book(user_id)
+        return book.get((exchange, market_type, symbol_registry.book_symbol(exchange, market_type, symbol)))
+
+    async def record_fill(self, user_id, exchange, market_type, symbol, side, qty, price, fee=0.0, fill_id=None):
+        """체결 하나 반영 후 저장. 이미 반영한 fill_id면 None 반환"""
+        qty = float(qty)
+        price = float(price)
+        if qty <= 0 or price <= 0:
+            return None
+        if fill_id is not None and not self._mark_seen(user_id, exchange, fill_id):
+            return None
+        book = await self._book(user_id)
+        symbol = symbol_registry.book_symbol(exchange, market_type, symbol)
+        key = (exchange, market_type, symbol)
+        position = book.get(key)
+        if position is None:
+            position = book[key] = Position(exchange, market_type, symbol)
+        if market_type == 'spot' and side == 'sell':
+            # 스팟은 장부에 있는 보유 수량까지만 매도로 반영 (장부 밖 보유분은 추적하지 않음)
+            qty = min(qty, max(position.qty, 0.0))
+            if qty <= 0:
+                return None
+        position.apply_fill(side, qty, price, fee)
+        self.fills += 1
+        try:
+            await self.store.save_position(
+                user_id, exchange, market_type, position.symbol, position.qty,
+                position.avg_price, position.realized_pnl, position.last_price)
+        except Exception as e:
+            logger.error(f"Position save error: {e}")
+        return position
+
+    async def record_order(self, user_id, exchange, market_type, symbol, side, qty, result, price=None):
+        """성공한 주문 결과를 체결로 반영 (체결가를 모르면 예상 체결가/마크 가격 사용)
+
+        수량은 거래소가 알려준 체결 수량 → 어댑터가 실제로 보낸(규칙에 맞춰 내림한) 수량 → qty 순으로 사용합니다.
+        """
+        if not isinstance(result, dict) or result.get('status') != 'success':
+            return None
+        qty = result.get('filled_qty') or result.get('quantity') or qty
+        fill_price = result.get('fill_price') or price or self.mark_price(exchange, market_type, symbol)
+        if not fill_price:
+            logger.warning(f"{exchange} {symbol} 체결가를 알 수 없어 포지션에 반영하지 않았습니다.")
+            return None
+        order_id = result.get('order_id')
+        fill_id = f"order:{order_id}" if order_id not in (None, '', 'unknown') else None
+        return await self.record_fill(user_id, exchange, market_type, symbol, side, qty, fill_price, fill_id=fill_id)
+
+    async def record_stream_fill(self, user_id, exchange, market_type, symbol, side, qty, price, fee=0.0, order_id=None, trade_id=None):
+        """체결 스트림의 체결 반영
+
+        주문 결과로 이미 반영한 주문(예상 체결가 기준)은 건너뛰고, 스트림이 먼저 받은 주문은
+        나중에 도착하는 주문 결과가 다시 반영하지 않도록 표시합니다.
+        """
+        if side not in ('buy', 'sell', 'long', 'short'):
+            return None
+        if order_id not in (None, ''):
+            if self.seen(user_id, exchange, f"order:{order_id}") and not self.seen(user_id, exchange, f"stream:{order_id}"):
+                return None
+            self._mark_seen(user_id, exchange, f"stream:{order_id}")
+            self._mark_seen(user_id, exchange, f"order:{order_id}")
+        fill_id = f"trade:{trade_id}" if trade_id not in (None, '') else None
+        return await self.record_fill(user_id, exchange, market_type, symbol, side, qty, price, float(fee or 0), fill_id=fill_id)
+
+    def seen(self, user_id, exchange, fill_id):
+        return fill_id in self._seen.get((user_id, exchange), ())
+
+    def _mark_seen(self, user_id, exchange, fill_id):
+        seen = self._seen.get((user_id, exchange))
+        if seen is None:
+            seen = self._seen[(user_id, exchange)] = OrderedDict()
+        if fill_id in seen:
+            return False
+        seen[fill_id] = None
+        if len(seen) > self.max_seen:
+            seen.popitem(last=False)
+        return True
+
+    def mark_price(self, exchange, market_type, symbol, position=None):
+        """마크 가격 (시세 소스 → 마지막 체결가 순)"""
+        if self.mark_source is not None:
+            try:
+                mark = self.mark_source(exchange, market_type, symbol)
+                if mark:
+                    return mark
+            except Exception as e:
+                logger.debug(f"Mark price error: {e}")
+        return position.last_price if position is not None else None
+
+    def unrealized_pnl(self, position):
+        return position.unrealized_pnl(self.mark_price(position.exchange, position.market_type, position.symbol, position))
+
+    async def summary(self, user_id, exchange=None):
+        """{'realized', 'unrealized', 'open'} 합계"""
+        positions = await self.positions(user_id, exchange)
+        return {
+            'realized': sum(p.realized_pnl for p in positions),
+            'unrealized': sum(self.unrealized_pnl(p) for p in positions),
+            'open': sum(1 for p in positions if p.is_open),
+        }
+
+    async def _book(self, user_id):
+        book = self._books.get(user_id)
+        if book is not None:
+            self._books.move_to_end(user_id)
+            return book
+        book = {}
+        try:
+            for row in await self.store.get_positions(user_id):
+                position = Position(*row)
+                book[(position.exchange, position.market_type, position.symbol)] = position
+        except Exception as e:
+            logger.error(f"Position load error: {e}")
+        # 불러오는 동안 다른 작업이 먼저 채웠으면 그것을 사용
+        book = self._books.setdefault(user_id, book)
+        if len(self._books) > self.max_users:
+            evicted, _ = self._books.popitem(last=False)
+            for key in [k for k in self._seen if k[0] == evicted]:
+                del self._seen[key]
+        return book
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._books.clear()
+        else:
+            self._books.pop(user_id, None)
+
+    def stats(self):
+        return {
+            'users': len(self._books),
+            'positions': sum(len(book) for book in self._books.values()),
+            'fills': self.fills,
+        }
+
+
+position_book = PositionBook()
@@ -0,0 +1,214 @@
+"""
+거래소 요청 속도 제한 (클라이언트 측 토큰 버킷)
+
+ - (거래소, 엔드포인트 종류, API 키)마다 버킷 하나
+ - 거래소마다 서버 IP 전체가 공유하는 버킷 하나
+ - 예산을 넘은 요청은 거절하지 않고 토큰이 찰 때까지 대기
+ - IP 버킷을 기다리는 요청은 주문 > 계정 조회 > 시세 순서로 먼저 처리
+ - 429 응답의 Retry-After만큼 IP 버킷을 비워 그동안 요청을 멈춤
+
+한도는 환경 변수로 조정할 수 있습니다 (값은 "초당 토큰,최대 토큰"):
+    RATE_LIMIT_XT_ORDER=10,10
+    RATE_LIMIT_BACKPACK_IP=20,40
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_PRIORITY = {
+    'order': 0,
+    'account': 1,
+    'market': 2,
+}
+
+# (초당 토큰, 최대 토큰)
+DEFAULT_LIMITS = {
+    ('xt', 'order'): (10, 10),
+    ('xt', 'account'): (5, 10),
+    ('xt', 'market'): (20, 40),
+    ('xt', 'ip'): (50, 100),
+    ('backpack', 'order'): (10, 10),
+    ('backpack', 'account'): (5, 10),
+    ('backpack', 'market'): (10, 20),
+    ('backpack', 'ip'): (20, 40),
+}
+
+DEFAULT_LIMIT = (5, 10)
+
+
+def _load_limits():
+    limits = {}
+    for (exchange, kind), default in DEFAULT_LIMITS.items():
+        value = os.getenv(f'RATE_LIMIT_{exchange.upper()}_{kind.upper()}')
+        if value:
+            rate, capacity = value.split(',')
+            limits[(exchange, kind)] = (float(rate), float(capacity))
+        else:
+            limits[(exchange, kind)] = default
+    return limits
+
+
+def endpoint_class(method, url, signed):
+    """요청 종류 분류: 주문(order), 인증이 필요한 조회(account), 공개 시세(market)"""
+    if method.upper() != 'GET' and '/order' in url:
+        return 'order'
+    if signed:
+        return 'account'
+    return 'market'
+
+
+class TokenBucket:
+    """초당 rate개씩 최대 capacity개까지 차는 토큰 버킷"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def remaining(self):
+        self._refill()
+        return max(0.0, self.tokens)
+
+    def wait_time(self, weight=1):
+        """weight만큼 쓰려면 기다려야 하는 시간(초)"""
+        self._refill()
+        if self.tokens >= weight:
+            return 0.0
+        return (weight - self.tokens) / self.rate
+
+    def take(self, weight=1):
+        self._refill()
+        self.tokens -= weight
+
+    def reserve(self, weight=1):
+        """토큰을 미리 차감하고 차례가 올 때까지의 대기 시간 반환 (도착 순서대로 대기)"""
+        self._refill()
+        self.tokens -= weight
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def drain(self, seconds):
+        """seconds 동안 토큰이 없도록 비움"""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """API 키별 버킷 + 거래소별 IP 버킷"""
+
+    def __init__(self, limits=None, max_keys=10000):
+        self.limits = limits or _load_limits()
+        self.max_keys = max_keys
+        self._key_buckets = OrderedDict()
+        self._ip_buckets = {}
+        self._waiters = {}
+        self._dispatchers = {}
+        self._sequence = itertools.count()
+        self.throttled = {kind: 0 for kind in ENDPOINT_PRIORITY}
+        self.total_wait = {kind: 0.0 for kind in ENDPOINT_PRIORITY}
+
+    def _limit(self, exchange, kind):
+        return self.limits.get((exchange, kind), DEFAULT_LIMIT)
+
+    def _key_bucket(self, exchange, kind, api_key):
+        key = (exchange, kind, api_key)
+        bucket = self._key_buckets.pop(key, None)
+        if bucket is None:
+            bucket = TokenBucket(*self._limit(exchange, kind))
+        self._key_buckets[key] = bucket
+        if len(self._key_buckets) > self.max_keys:
+            self._key_buckets.popitem(last=False)
+        return bucket
+
+    def _ip_bucket(self, exchange):
+        bucket = self._ip_buckets.get(exchange)
+        if bucket is None:
+            bucket = self._ip_buckets[exchange] = TokenBucket(*self._limit(exchange, 'ip'))
+        return bucket
+
+    async def acquire(self, exchange, kind, api_key=None, weight=1):
+        """예산이 생길 때까지 대기 후 토큰 사용. 기다린 시간(초) 반환"""
+        started = time.monotonic()
+        delay = self._key_bucket(exchange, kind, api_key).reserve(weight)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        ip_bucket = self._ip_bucket(exchange)
+        if not self._waiters.get(exchange) and ip_bucket.wait_time(weight) == 0:
+            ip_bucket.take(weight)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                self._waiters.setdefault(exchange, []),
+                (ENDPOINT_PRIORITY.get(kind, len(ENDPOINT_PRIORITY)), next(self._sequence), weight, future)
+            )
+            self._ensure_dispatcher(exchange)
+            await future
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled[kind] = self.throttled.get(kind, 0) + 1
+            self.total_wait[kind] = self.total_wait.get(kind, 0.0) + waited
+        return waited
+
+    def _ensure_dispatcher(self, exchange):
+        task = self._dispatchers.get(exchange)
+        if task is None or task.done():
+            self._dispatchers[exchange] = asyncio.ensure_future(self._dispatch(exchange))
+
+    async def _dispatch(self, exchange):
+        """IP 버킷 대기열을 우선순위 순서로 처리"""
+        waiters = self._waiters[exchange]
+        bucket = self._ip_bucket(exchange)
+        while waiters:
+            priority, _, weight, future = waiters[0]
+            if future.done():
+                heapq.heappop(waiters)
+                continue
+            delay = bucket.wait_time(weight)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(waiters)
+            bucket.take(weight)
+            future.set_result(None)
+
+    def penalize(self, exchange, retry_after):
+        """429 응답 시 retry_after초 동안 해당 거래소 요청 중단"""
+        logger.warning(f"{exchange} 요청 한도 초과 응답, {retry_after:.1f}초 대기")
+        self._ip_bucket(exchange).drain(retry_after)
+
+    def stats(self):
+        """남은 예산과 대기 현황"""
+        return {
+            'ip_remaining': {ex: b.remaining() for ex, b in self._ip_buckets.items()},
+            'ip_capacity': {ex: b.capacity for ex, b in self._ip_buckets.items()},
+            'queued': {ex: sum(1 for w in ws if not w[3].done()) for ex, ws in self._waiters.items()},
+            'throttled': dict(self.throttled),
+            'total_wait': dict(self.total_wait),
+            'tracked_keys': len(self._key_buckets),
+        }
+
+    def remaining(self, exchange, kind, api_key=None):
+        """특정 키·엔드포인트 종류의 남은 토큰 수"""
+        bucket = self._key_buckets.get((exchange, kind, api_key))
+        if bucket is None:
+            return self._limit(exchange, kind)[1]
+        return bucket.remaining()
+
+
+rate_limiter = RateLimiter()
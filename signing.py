@@ -0,0 +1,147 @@
+"""
+거래소 요청 서명
+
+API 키마다 서명 객체를 한 번 만들어 두고 재사용합니다.
+ - XT: 시크릿으로 미리 키를 넣어 둔 HMAC-SHA256 객체를 복사해서 사용
+ - Backpack: base64 개인키를 한 번만 디코딩한 Ed25519 SigningKey 사용
+ - 두 거래소 모두 같은 파라미터 직렬화(canonical_query) 사용
+요청 경로에서 sleep이나 재시도를 하지 않습니다.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import time
+
+try:
+    from nacl.signing import SigningKey
+except ImportError:
+    SigningKey = None
+
+logger = logging.getLogger(__name__)
+
+BACKPACK_WINDOW = 5000
+
+
+def format_value(value):
+    """서명 문자열용 값 표현: 요청 JSON body에 실리는 텍스트와 같게 (bool 'true', 정수 '5', 실수는 소수 8자리 이내)
+
+    거래소는 받은 body 값으로 서명 문자열을 다시 만들어 검증하므로, 정수 clientId 5는 body처럼 '5'로 서명합니다.
+    (기존 Backpack 서명은 숫자를 모두 float로 바꿔 '5.0'으로 서명해 body의 5와 맞지 않았음)
+    """
+    if type(value) is str:
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        text = f"{value:.8f}".rstrip('0').rstrip('.')
+        return text or '0'
+    return str(value)
+
+
+def canonical_query(params):
+    """key 정렬된 'k1=v1&k2=v2' 문자열"""
+    if not params:
+        return ''
+    parts = []
+    for k in sorted(params):
+        v = params[k]
+        parts.append(f"{k}={v if type(v) is str else format_value(v)}")
+    return '&'.join(parts)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class XtSigner:
+    """XT HMAC-SHA256 서명"""
+
+    def __init__(self, api_key, api_secret):
+        self.api_key = api_key
+        self._mac = hmac.new(api_secret.encode('utf-8'), digestmod=hashlib.sha256)
+        self._prefix = f"access_key={api_key}"
+
+    def sign(self, params=None, timestamp=None):
+        """(signature, timestamp) 반환"""
+        timestamp = str(timestamp or now_ms())
+        query = canonical_query(params)
+        if query:
+            sign_string = f"{self._prefix}&{query}&timestamp={timestamp}"
+        else:
+            sign_string = f"{self._prefix}&timestamp={timestamp}"
+        mac = self._mac.copy()
+        mac.update(sign_string.encode('utf-8'))
+        return mac.hexdigest(), timestamp
+
+    def headers(self, params=None):
+        """서명된 요청 헤더"""
+        signature, timestamp = self.sign(params)
+        return {
+            "access_key": self.api_key,
+            "signature": signature,
+            "timestamp": timestamp,
+            "Content-Type": "application/json"
+        }
+
+
+class BackpackSigner:
+    """Backpack Ed25519 서명"""
+
+    def __init__(self, api_key, private_key, window=BACKPACK_WINDOW):
+        if SigningKey is None:
+            raise ImportError('pynacl 패키지가 필요합니다. pip install pynacl로 설치해주세요.')
+        try:
+            self._signing_key = SigningKey(base64.b64decode(private_key))
+        except Exception as e:
+            raise ValueError(f"Invalid private key: {e}")
+        self.api_key = api_key
+        self.window = window
+        self._suffix = f"&window={window}"
+
+    def sign_string(self, sign_string):
+        """서명 문자열을 서명해 base64 문자열로 반환"""
+        signature = self._signing_key.sign(sign_string.encode('utf-8')).signature
+        return base64.b64encode(signature).decode('ascii')
+
+    def sign(self, instruction, params=None, timestamp=None):
+        """(signature, timestamp) 반환"""
+        timestamp = timestamp or now_ms()
+        query = canonical_query(params)
+        sign_string = f"instruction={instruction}"
+        if query:
+            sign_string += f"&{query}"
+        sign_string += f"&timestamp={timestamp}{self._suffix}"
+        return self.sign_string(sign_string), timestamp
+
+    def sign_batch(self, instruction, params_list, timestamp=None):
+        """일괄 요청 서명: 항목마다 'instruction=...&파라미터'를 이어 붙여 한 번에 서명"""
+        timestamp = timestamp or now_ms()
+        parts = []
+        for params in params_list:
+            query = canonical_query(params)
+            parts.append(f"instruction={instruction}&{query}" if query else f"instruction={instruction}")
+        sign_string = '&'.join(parts) + f"&timestamp={timestamp}{self._suffix}"
+        return self.sign_string(sign_string), timestamp
+
+    def headers(self, instruction, params=None):
+        """서명된 요청 헤더"""
+        signature, timestamp = self.sign(instruction, params)
+        return self._headers(signature, timestamp)
+
+    def batch_headers(self, instruction, params_list):
+        """일괄 요청용 서명 헤더"""
+        signature, timestamp = self.sign_batch(instruction, params_list)
+        return self._headers(signature, timestamp)
+
+    def _headers(self, signature, timestamp):
+        return {
+            "X-API-Key": self.api_key,
+            "X-Signature": signature,
+            "X-Timestamp": str(timestamp),
+            "X-Window": str(self.window),
+            "Content-Type": "application/json; charset=utf-8"
+        }
@@ -0,0 +1,257 @@
+"""
+거래소 심볼 메타데이터 레지스트리
+
+시작 시 XT(스팟·선물)와 Backpack 마켓 정보를 한 번 불러오고, 이후 백그라운드에서 주기적으로 갱신합니다.
+ - (거래소, 마켓 타입, 심볼 별칭) → SymbolInfo 색인 하나로 조회
+   ('BTC'는 XT 'btc_usdt', Backpack 'BTC_USDC'/'BTC_USDC_PERP' 항목을 가리킴)
+ - 주문 전에 수량은 stepSize 단위로 내림, 가격은 tickSize 단위로 반올림하고 최소 수량을 확인
+ - 메타데이터가 없는 심볼은 기존 규칙(XT 소문자, Backpack '_USDC'/'_USDC_PERP' 접미사)으로 처리
+
+환경 변수:
+    SYMBOL_REFRESH_INTERVAL   갱신 주기(초, 기본 3600)
+    XT_SPOT_SYMBOLS_URL, XT_FUTURES_SYMBOLS_URL, BACKPACK_MARKETS_URL
+"""
+
+import asyncio
+import logging
+import os
+from decimal import ROUND_DOWN, ROUND_HALF_UP, Decimal, InvalidOperation
+
+import http_client
+from fast_json import response_json
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_URLS = {
+    ('xt', 'spot'): os.getenv('XT_SPOT_SYMBOLS_URL', 'https://sapi.xt.com/v4/public/symbol'),
+    ('xt', 'futures'): os.getenv('XT_FUTURES_SYMBOLS_URL', 'https://fapi.xt.com/future/market/v1/public/symbol/list'),
+    ('backpack', None): os.getenv('BACKPACK_MARKETS_URL', 'https://api.backpack.exchange/api/v1/markets'),
+}
+REFRESH_INTERVAL = float(os.getenv('SYMBOL_REFRESH_INTERVAL', '3600'))
+FALLBACK_DECIMALS = 8
+BACKPACK_QUOTE = 'USDC'
+XT_QUOTE = 'USDT'
+
+
+def native_symbol(exchange, market_type, symbol):
+    """메타데이터 없이 쓰는 거래소 심볼 이름 규칙"""
+    if exchange == 'xt':
+        return symbol.lower()
+    return f"{symbol}_{BACKPACK_QUOTE}_PERP" if market_type == 'futures' else f"{symbol}_{BACKPACK_QUOTE}"
+
+
+def to_decimal(value):
+    if value is None or value == '':
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def format_decimal(value):
+    """지수 표기 없는 문자열 ('0.00100000' → '0.001')"""
+    text = format(value, 'f')
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text or '0'
+
+
+def _precision_step(precision):
+    return Decimal(1).scaleb(-int(precision)) if precision is not None else None
+
+
+class SymbolInfo:
+    """심볼 하나의 주문 규칙"""
+
+    __slots__ = ('exchange', 'market_type', 'native', 'base', 'tick_size', 'step_size', 'min_qty', 'max_qty')
+
+    def __init__(self, exchange, market_type, native, base, tick_size=None, step_size=None, min_qty=None, max_qty=None):
+        self.exchange = exchange
+        self.market_type = market_type
+        self.native = native
+        self.base = base
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+
+    def round_quantity(self, size):
+        """stepSize 단위로 내림 후 최소/최대 수량 확인"""
+        qty = Decimal(str(size))
+        if self.step_size:
+            qty = (qty / self.step_size).to_integral_value(ROUND_DOWN) * self.step_size
+        if qty <= 0 or (self.min_qty and qty < self.min_qty):
+            raise ValueError(f"{self.native} 최소 주문 수량은 {format_decimal(self.min_qty or self.step_size)}입니다.")
+        if self.max_qty and qty > self.max_qty:
+            raise ValueError(f"{self.native} 최대 주문 수량은 {format_decimal(self.max_qty)}입니다.")
+        return qty
+
+    def round_price(self, price):
+        """tickSize 단위로 반올림"""
+        value = Decimal(str(price))
+        if self.tick_size:
+            value = (value / self.tick_size).to_integral_value(ROUND_HALF_UP) * self.tick_size
+        if value <= 0:
+            raise ValueError(f"{self.native} 가격이 올바르지 않습니다: {price}")
+        return value
+
+
+class SymbolRegistry:
+    """심볼 메타데이터 색인 + 백그라운드 갱신"""
+
+    def __init__(self, urls=None, refresh_interval=REFRESH_INTERVAL):
+        self.urls = dict(SYMBOL_URLS)
+        if urls:
+            self.urls.update(urls)
+        self.refresh_interval = refresh_interval
+        self._index = {}
+        self.loaded_at = None
+        self._task = None
+
+    def get(self, exchange, market_type, symbol):
+        """SymbolInfo (메타데이터가 없으면 None)"""
+        if symbol is None:
+            return None
+        return self._index.get((exchange, market_type, symbol.upper()))
+
+    def native(self, exchange, market_type, symbol):
+        """거래소 심볼 이름"""
+        info = self.get(exchange, market_type, symbol)
+        return info.native if info else native_symbol(exchange, market_type, symbol)
+
+    def book_symbol(self, exchange, market_type, symbol):
+        """포지션 장부 공통 심볼: 기본 견적 자산(XT USDT, Backpack USDC) 마켓은 기초 자산 ('BTC'),
+        그 외 마켓은 거래소 심볼 대문자. 'BTC', 'btc_usdt', 'BTC_USDC_PERP'가 같은 키가 됨"""
+        info = self.get(exchange, market_type, symbol)
+        if info is not None:
+            if self._index.get((exchange, market_type, info.base.upper())) is info:
+                return info.base.upper()
+            return info.native.upper()
+        # 메타데이터가 없으면 기본 견적 자산 접미사만 제거
+        upper = symbol.upper()
+        quote = XT_QUOTE if exchange == 'xt' else BACKPACK_QUOTE
+        for suffix in (f'_{quote}_PERP', f'_{quote}'):
+            if upper.endswith(suffix):
+                return upper[:-len(suffix)]
+        return upper
+
+    def normalize_order(self, exchange, market_type, symbol, size, price=None):
+        """(거래소 심볼, 수량 문자열, 가격 문자열 또는 None). 규칙에 맞지 않으면 ValueError"""
+        info = self.get(exchange, market_type, symbol)
+        if info is None:
+            qty = Decimal(str(round(float(size), FALLBACK_DECIMALS)))
+            if qty <= 0:
+                raise ValueError("수량은 0보다 커야 합니다.")
+            rounded_price = Decimal(str(round(float(price), FALLBACK_DECIMALS))) if price else None
+            native = native_symbol(exchange, market_type, symbol)
+        else:
+            qty = info.round_quantity(size)
+            rounded_price = info.round_price(price) if price else None
+            native = info.native
+        return native, format_decimal(qty), format_decimal(rounded_price) if rounded_price is not None else None
+
+    def _add(self, index, info, *aliases):
+        for alias in (info.native, *aliases):
+            index[(info.exchange, info.market_type, alias.upper())] = info
+
+    def _parse_xt(self, index, market_type, data):
+        result = data.get('result') or {}
+        items = result.get('symbols', []) if isinstance(result, dict) else result
+        for item in items:
+            native = item.get('symbol')
+            if not native:
+                continue
+            filters = {f.get('filter'): f for f in item.get('filters') or []}
+            quantity = filters.get('QUANTITY', {})
+            price = filters.get('PRICE', {})
+            base = item.get('baseCurrency') or native.split('_')[0]
+            info = SymbolInfo(
+                'xt', market_type, native, base,
+                tick_size=to_decimal(price.get('tickSize')) or _precision_step(item.get('pricePrecision')),
+                step_size=to_decimal(quantity.get('tickSize')) or _precision_step(item.get('quantityPrecision')),
+                min_qty=to_decimal(quantity.get('min') or item.get('minQty')),
+                max_qty=to_decimal(quantity.get('max')),
+            )
+            quote = item.get('quoteCurrency') or native.split('_')[-1]
+            aliases = (base,) if quote.upper() == XT_QUOTE else ()
+            self._add(index, info, *aliases)
+
+    def _parse_backpack(self, index, data):
+        for item in data:
+            native = item.get('symbol')
+            if not native:
+                continue
+            market_type = 'futures' if item.get('marketType') == 'PERP' or native.endswith('_PERP') else 'spot'
+            filters = item.get('filters') or {}
+            price = filters.get('price') or {}
+            quantity = filters.get('quantity') or {}
+            base = item.get('baseSymbol') or native.split('_')[0]
+            info = SymbolInfo(
+                'backpack', market_type, native, base,
+                tick_size=to_decimal(price.get('tickSize')),
+                step_size=to_decimal(quantity.get('stepSize')),
+                min_qty=to_decimal(quantity.get('minQuantity')),
+                max_qty=to_decimal(quantity.get('maxQuantity')),
+            )
+            aliases = (base,) if item.get('quoteSymbol', BACKPACK_QUOTE) == BACKPACK_QUOTE else ()
+            self._add(index, info, *aliases)
+
+    async def _fetch(self, url):
+        response = await http_client.request('GET', url, timeout=10.0)
+        response.raise_for_status()
+        return response_json(response)
+
+    async def load(self):
+        """모든 거래소 메타데이터를 불러와 색인을 교체 (실패한 거래소는 기존 항목 유지)"""
+        keys = list(self.urls)
+        results = await asyncio.gather(*[self._fetch(self.urls[key]) for key in keys], return_exceptions=True)
+        index = {}
+        loaded = set()
+        for (exchange, market_type), data in zip(keys, results):
+            if isinstance(data, Exception):
+                logger.warning(f"{exchange} 심볼 정보 조회 실패: {data}")
+                continue
+            try:
+                if exchange == 'xt':
+                    self._parse_xt(index, market_type, data)
+                else:
+                    self._parse_backpack(index, data)
+                loaded.add((exchange, market_type))
+            except Exception as e:
+                logger.warning(f"{exchange} 심볼 정보 파싱 실패: {e}")
+        for key, info in self._index.items():
+            if (info.exchange, info.market_type) not in loaded and (info.exchange, None) not in loaded:
+                index.setdefault(key, info)
+        self._index = index
+        self.loaded_at = asyncio.get_running_loop().time()
+        logger.info(f"심볼 정보 {len({id(i) for i in index.values()})}개 로드")
+        return len(index)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"심볼 정보 갱신 실패: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """첫 로드와 주기적 갱신을 백그라운드에서 시작"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            'symbols': len({id(i) for i in self._index.values()}),
+            'loaded': self.loaded_at is not None,
+        }
+
+
+symbol_registry = SymbolRegistry()
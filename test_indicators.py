@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+indicators.py / kline_store.py 지표·캔들 저장소 테스트 (백필은 로컬 가짜 서버 사용)
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+import http_client
+import indicators
+from fake_rest_server import FakeRestServer
+
+
+def random_candles(count, seed=7, start=1700000000000, step=60000):
+    """무작위 캔들 행 (시작 시각 ms, 시가, 고가, 저가, 종가, 거래량)"""
+    rng = np.random.default_rng(seed)
+    close = 40000 + np.cumsum(rng.normal(0, 20, count))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + rng.uniform(0, 10, count)
+    low = np.minimum(open_, close) - rng.uniform(0, 10, count)
+    volume = rng.uniform(0.1, 5, count)
+    times = start + step * np.arange(count)
+    return np.column_stack((times, open_, high, low, close, volume))
+
+
+def expected(rows):
+    """마지막 캔들 기준 지표 (배열 전체 계산)"""
+    _, _, h, l, c, v = rows.T
+    lower, mid, upper = indicators.bollinger(c)
+    return {
+        'ema': {period: indicators.ema(c, period)[-1] for period in indicators.EMA_PERIODS},
+        'rsi': indicators.rsi(c)[-1],
+        'atr': indicators.atr(h, l, c)[-1],
+        'vwap': indicators.vwap(h, l, c, v)[-1],
+        'bollinger': (lower[-1], mid[-1], upper[-1]),
+    }
+
+
+def same(values, rows):
+    """증분 계산 결과가 배열 전체 계산과 같은지"""
+    want = expected(rows)
+    pairs = [(values['ema'][p], want['ema'][p]) for p in indicators.EMA_PERIODS]
+    pairs += [(values[key], want[key]) for key in ('rsi', 'atr', 'vwap')]
+    pairs += list(zip(values['bollinger'], want['bollinger']))
+    return all(np.isclose(got, exp, rtol=1e-9, atol=1e-6) for got, exp in pairs)
+
+
+async def run_tests():
+    results = []
+    server = await FakeRestServer().start()
+    os.environ['XT_FUTURES_BASE_URL'] = server.url
+    os.environ['XT_SPOT_BASE_URL'] = server.url
+    os.environ['BACKPACK_BASE_URL'] = f"{server.url}/api/v1"
+    from kline_store import CandleSeries, KlineStore
+
+    try:
+        rows = random_candles(400)
+
+        # 1. 백필(벡터 연산) 결과가 배열 전체 계산과 같음
+        series = CandleSeries('1m', capacity=300)
+        series.merge(rows[:250])
+        results.append(("백필 지표 = 전체 계산", same(series.indicators(), rows[:250])))
+
+        # 2. 캔들을 하나씩 추가해도 (증분 계산) 같은 결과, 보관 개수를 넘으면 앞으로 옮김
+        ok = True
+        for i in range(250, 400):
+            series.append(rows[i])
+            window = rows[max(0, i + 1 - series.capacity):i + 1]
+            if i % 10 == 0:
+                ok = ok and len(series) == len(window) and same(series.indicators(), window)
+        results.append(("증분 추가 지표 = 전체 계산", ok and len(series) == 300))
+        results.append(("보관 개수 초과 시 최근 캔들 유지", series.last_time == rows[-1][0]
+                        and series.columns()[0][0] == rows[100][0]))
+
+        # 3. 진행 중인 캔들 갱신 (같은 시작 시각) → 상태는 그대로, 조회 값만 바뀜
+        live = rows[-1].copy()
+        live[4] += 50
+        live[2] = max(live[2], live[4])
+        series.append(live)
+        window = np.vstack((rows[101:-1], live))
+        results.append(("진행 중 캔들 갱신", len(series) == 300 and same(series.indicators(), window)))
+
+        # 4. 같은 데이터로 다시 조회하면 이전 결과 재사용
+        results.append(("조회 결과 캐시", series.indicators() is series.indicators()))
+
+        # 5. 과거 캔들 병합 (같은 시각은 새 값으로 교체) 후 재계산
+        patched = rows[200:260].copy()
+        patched[:, 4] += 3
+        merged = CandleSeries('1m', capacity=300)
+        merged.merge(rows[:300])
+        merged.indicators()
+        merged.merge(patched)
+        window = rows[:300].copy()
+        window[200:260] = patched
+        results.append(("과거 캔들 병합 후 재계산", len(merged) == 300 and same(merged.indicators(), window)))
+
+        # 6. 조회 사이에 캔들이 많이 쌓여 이전 상태 위치가 배열 앞쪽에 있어도 같은 결과
+        lagged = CandleSeries('1m', capacity=500)
+        long_rows = random_candles(800, seed=11)
+        lagged.merge(long_rows[:300])
+        lagged.indicators()
+        for row in long_rows[300:790]:
+            lagged.append(row)
+        results.append(("조회 간격이 긴 증분 계산", same(lagged.indicators(), long_rows[290:790])))
+
+        # 7. 가짜 서버 백필 (XT 선물, Backpack 스팟)
+        store = KlineStore(capacity=300, backfill=120)
+        for exchange, market_type in (('xt', 'futures'), ('backpack', 'spot')):
+            result = await store.indicators(exchange, market_type, 'BTC', '5m')
+            series = store.get(exchange, market_type, 'BTC', '5m')
+            ok = result.get('status') == 'success' and series is not None and len(series) >= 100
+            if ok:
+                ok = same(result['indicators'], series.columns().T.copy())
+            results.append((f"{exchange} {market_type} 백필 지표", ok))
+
+        # 8. 동시 조회는 백필 한 번으로 합침, 갱신된 시리즈는 다시 백필하지 않음
+        before = store.backfills
+        await asyncio.gather(*(store.indicators('xt', 'spot', 'ETH', '1h') for _ in range(5)))
+        await store.indicators('xt', 'spot', 'ETH', '1h')
+        results.append(("동시 백필 합치기", store.backfills == before + 1))
+
+        # 9. 스트림 캔들은 조회한 적 있는 1분봉 시리즈에만 반영
+        await store.indicators('xt', 'futures', 'BTC', '1m')
+        series = store.get('xt', 'futures', 'BTC', '1m')
+        next_start = int(series.last_time) + 60000
+        store.add_stream_candle('xt', 'futures', 'BTC', {'t': next_start, 'o': '1', 'h': '2', 'l': '1', 'c': '2', 'v': '3'})
+        store.add_stream_candle('xt', 'futures', 'DOGE', {'t': next_start, 'c': '1'})
+        results.append(("스트림 캔들 반영", series.last_time == next_start
+                        and store.get('xt', 'futures', 'DOGE', '1m') is None))
+
+        # 10. 지원하지 않는 주기/거래소는 오류 결과
+        bad_interval = await store.indicators('xt', 'futures', 'BTC', '7m')
+        bad_exchange = await store.indicators('nope', 'futures', 'BTC')
+        results.append(("잘못된 주기·거래소 오류", bad_interval['status'] == 'error' and bad_exchange['status'] == 'error'))
+    finally:
+        await http_client.close_client()
+        await server.stop()
+    return results
+
+
+def main():
+    print("🚀 indicators.py / kline_store.py 지표 테스트")
+    print("=" * 50)
+    results = asyncio.run(run_tests())
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+    failed = [name for name, ok in results if not ok]
+    print("=" * 50)
+    if failed:
+        print(f"⚠️ {len(failed)}개 테스트 실패")
+        sys.exit(1)
+    print("🎉 모든 테스트 성공!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+market_stream.py 시세 스트림 테스트 (로컬 가짜 서버 사용)
+"""
+
+import asyncio
+import sys
+
+import market_stream
+from fake_ws_server import FakeMarketServer
+
+
+async def wait_for(predicate, timeout=3.0):
+    """조건이 참이 될 때까지 대기"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+async def run_tests():
+    results = []
+    server = await FakeMarketServer().start()
+    market_stream.RECONNECT_MIN_DELAY = 0.05
+    urls = {key: server.url for key in market_stream.STREAM_URLS}
+    manager = market_stream.MarketStreamManager(urls=urls, max_age=1.0, idle_timeout=2.0)
+    manager.snapshot_fetcher = server.depth_snapshot
+    manager.start()
+    try:
+        # 1. on-demand 구독 후 티커/호가/캔들 수신
+        manager.ensure_subscribed('xt', 'futures', 'btc_usdt')
+        manager.ensure_subscribed('backpack', 'spot', 'SOL')
+        for key in [('xt', 'futures', 'btc_usdt'), ('backpack', 'spot', 'SOL')]:
+            for data_type in ('ticker', 'depth', 'kline'):
+                ok = await wait_for(lambda: manager.snapshot(*key, data_type) is not None)
+                results.append((f"{key[0]} {key[2]} {data_type} 수신", ok))
+
+        depth = manager.snapshot('xt', 'futures', 'btc_usdt', 'depth')
+        bids, asks = [float(p) for p, _ in depth['b']], [float(p) for p, _ in depth['a']]
+        sorted_ok = bids == sorted(bids, reverse=True) and asks == sorted(asks)
+        results.append(("호가 정렬", sorted_ok))
+
+        # REST 응답과 같은 형식 (XT: 티커 목록, 'b'/'a' 호가, 'q' 거래량 캔들 / Backpack: 'lastPrice', 'bids'/'asks', 'start' 캔들)
+        xt_ticker = manager.snapshot('xt', 'futures', 'btc_usdt', 'ticker')
+        xt_kline = manager.snapshot('xt', 'futures', 'btc_usdt', 'kline')
+        bp_ticker = manager.snapshot('backpack', 'spot', 'SOL', 'ticker')
+        bp_depth = manager.snapshot('backpack', 'spot', 'SOL', 'depth')
+        bp_kline = manager.snapshot('backpack', 'spot', 'SOL', 'kline')
+        shape_ok = (
+            isinstance(xt_ticker, list) and 'c' in xt_ticker[0]
+            and isinstance(depth['b'][0][0], str) and {'q', 'v'} <= set(xt_kline[-1])
+            and isinstance(bp_ticker, list) and bp_ticker[0]['lastPrice'] is not None
+            and {'bids', 'asks', 'lastUpdateId'} <= set(bp_depth) and {'start', 'close', 'volume'} <= set(bp_kline[-1])
+        )
+        results.append(("REST 응답과 같은 형식", shape_ok))
+
+        # 2. 시퀀스가 끊기면 스냅샷으로 재동기화
+        server.depth_sequences['SOL_USDC'] += 10
+        book = manager.views[('backpack', 'spot', 'SOL')].book
+        resynced = await wait_for(lambda: book.resyncs >= 1 and book.synced)
+        results.append(("호가 시퀀스 누락 후 재동기화", resynced))
+
+        # 3. 연결 끊김 후 재연결 및 재구독
+        before = server.connection_count
+        await server.drop_connections()
+        reconnected = await wait_for(lambda: server.connection_count >= before + 2)
+        results.append(("재연결", reconnected))
+        resubscribed = await wait_for(lambda: len(server.subscriptions) >= 4)
+        results.append(("재구독", resubscribed))
+
+        # 4. 최대 심볼 수를 넘으면 가장 오래 안 쓴 심볼 구독 해제
+        manager.max_symbols = 2
+        manager.snapshot('backpack', 'spot', 'SOL', 'ticker')
+        manager.ensure_subscribed('xt', 'spot', 'eth_usdt')
+        evicted = ('xt', 'futures', 'btc_usdt') not in manager.views and len(manager.views) == 2
+        unsubscribed = await wait_for(lambda: any('ticker@btc_usdt' in p for p in server.unsubscriptions))
+        results.append(("최대 심볼 수 초과 시 구독 해제", evicted and unsubscribed))
+
+        # 5. 조회가 없는 심볼은 MARKET_STREAM_IDLE 후 구독 해제
+        idle = await wait_for(lambda: not manager.views and any('ticker.SOL_USDC' in p for p in server.unsubscriptions), timeout=5.0)
+        results.append(("미사용 심볼 구독 해제", idle))
+
+        # 6. 같은 거래소 심볼을 쓰는 별칭은 구독을 공유, 하나를 해제해도 나머지는 계속 갱신
+        manager.max_symbols = 10
+        manager.ensure_subscribed('xt', 'futures', 'BTC_USDT')
+        manager.ensure_subscribed('xt', 'futures', 'btc_usdt')
+        both = await wait_for(lambda: manager.snapshot('xt', 'futures', 'BTC_USDT', 'ticker') is not None
+                              and manager.snapshot('xt', 'futures', 'btc_usdt', 'ticker') is not None)
+        unsubscribed_before = len(server.unsubscriptions)
+        manager.unsubscribe('xt', 'futures', 'BTC_USDT')
+        view = manager.views.get(('xt', 'futures', 'btc_usdt'))
+        ticker = view.ticker if view is not None else None
+        still_live = view is not None and await wait_for(lambda: view.ticker is not ticker)
+        results.append(("별칭 하나 해제 후 다른 별칭 계속 갱신",
+                        both and still_live and len(server.unsubscriptions) == unsubscribed_before))
+        manager.unsubscribe('xt', 'futures', 'btc_usdt')
+        released = await wait_for(lambda: len(server.unsubscriptions) > unsubscribed_before)
+        results.append(("마지막 별칭 해제 시 구독 해제", released))
+
+        # 7. 오래된 데이터는 반환하지 않음
+        manager.ensure_subscribed('xt', 'futures', 'btc_usdt')
+        await wait_for(lambda: manager.snapshot('xt', 'futures', 'btc_usdt', 'ticker') is not None)
+        await manager.stop()
+        view = manager.views[('xt', 'futures', 'btc_usdt')]
+        stale = view.snapshot('ticker', max_age=0.0) is None
+        results.append(("오래된 데이터 무시", stale))
+    finally:
+        await manager.stop()
+        await server.stop()
+    return results
+
+
+def main():
+    print("🚀 market_stream.py 시세 스트림 테스트")
+    print("=" * 50)
+    results = asyncio.run(run_tests())
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+    failed = [name for name, ok in results if not ok]
+    print("=" * 50)
+    if failed:
+        print(f"⚠️ {len(failed)}개 테스트 실패")
+        sys.exit(1)
+    print("🎉 모든 테스트 성공!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+user_stream.py 개인 스트림 테스트 (로컬 가짜 서버 사용)
+"""
+
+import asyncio
+import base64
+import os
+import shutil
+import sys
+import tempfile
+
+import market_stream
+import user_stream
+from exchange_adapters import create_adapter
+from fake_ws_server import FakeUserStreamServer
+from position_book import position_book
+from user_api_store import user_store
+
+USER_ID = 4242
+
+
+class FakeTrader:
+    """개인 스트림에 필요한 트레이더 속성만 가진 객체"""
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.api_key = f'test-{exchange}'
+        self.adapter = create_adapter(exchange, self.api_key, base64.b64encode(bytes(range(32))).decode())
+        self.listen_keys = 0
+
+    async def get_listen_key(self, market_type):
+        self.listen_keys += 1
+        return f'listen-{market_type}-{self.listen_keys}'
+
+
+async def wait_for(predicate, timeout=3.0):
+    """조건이 참이 될 때까지 대기"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+async def run_tests():
+    results = []
+    user_store.init_schema()
+    server = await FakeUserStreamServer().start()
+    market_stream.RECONNECT_MIN_DELAY = 0.05
+    urls = {key: server.url for key in user_stream.USER_STREAM_URLS}
+    manager = user_stream.UserStreamManager(urls=urls, max_accounts=10)
+    manager.start()
+    xt, backpack = FakeTrader('xt'), FakeTrader('backpack')
+    try:
+        # 1. 계정마다 인증된 구독 (XT listen key, Backpack 서명)
+        manager.ensure(USER_ID, xt)
+        manager.ensure(USER_ID, backpack)
+        subscribed = await wait_for(lambda: len(server.subscriptions) >= 3)
+        results.append(("계정별 개인 스트림 구독", subscribed))
+        spot = next((m for m in server.subscriptions if m.get('listenKey')), {})
+        futures = next((m for m in server.subscriptions if any('@listen-futures' in p for p in m.get('params', []))), {})
+        signed = next((m for m in server.subscriptions if m.get('signature')), {})
+        results.append(("XT 스팟 listen key 구독", spot.get('listenKey', '').startswith('listen-spot')))
+        results.append(("XT 선물 listen key 토픽", bool(futures)))
+        results.append(("Backpack 서명 구독", len(signed.get('signature', [])) == 4))
+
+        # 2. 잔고 스냅샷 + 스트림 변경 반영
+        await wait_for(lambda: all(a.live for a in manager.accounts.values()))
+        manager.store_balance('xt', xt.api_key, 'spot', {'assets': [{'currency': 'usdt', 'availableAmount': '100'}]})
+        results.append(("스트림 잔고 반환", manager.balance('xt', xt.api_key, 'spot') is not None))
+        await server.push({'topic': 'balance', 'event': 'balance', 'data': {'a': 'usdt', 't': '150', 'f': '20'}})
+        balance_ok = await wait_for(
+            lambda: manager.balance('xt', xt.api_key, 'spot')['assets'][0].get('availableAmount') == '130')
+        results.append(("XT 잔고 변경 반영", balance_ok))
+
+        # 3. 체결 → 포지션 장부 (같은 체결은 한 번만)
+        manager.store_balance('backpack', backpack.api_key, 'futures', {'USDC': {'available': '1000'}})
+        fill = {'stream': 'account.orderUpdate', 'data': {
+            'e': 'orderFill', 's': 'BTC_USDC_PERP', 'S': 'Bid', 'l': '0.5', 'L': '100', 'i': '77', 't': 1,
+        }}
+        await server.push(fill)
+        await server.push(fill)
+        filled = await wait_for(lambda: manager.stats()['fills'] >= 2)
+        await asyncio.sleep(0.1)
+        position = await position_book.get(USER_ID, 'backpack', 'futures', 'BTC')
+        results.append(("체결 반영", filled and position is not None and position.qty == 0.5))
+        results.append(("Backpack 체결 후 잔고 무효화", manager.balance('backpack', backpack.api_key, 'futures') is None))
+        manager.store_balance('backpack', backpack.api_key, 'futures', {'USDC': {'available': '1000'}})
+        await server.push({'stream': 'account.orderUpdate', 'data': {
+            'e': 'orderAccepted', 's': 'BTC_USDC_PERP', 'S': 'Bid', 'q': '1', 'p': '100', 'i': '78',
+        }})
+        invalidated = await wait_for(lambda: manager.balance('backpack', backpack.api_key, 'futures') is None)
+        results.append(("Backpack 주문 접수 후 잔고 무효화", invalidated))
+
+        # 4. 주문 결과로 이미 반영한 주문의 스트림 체결은 건너뜀
+        await position_book.record_order(USER_ID, 'backpack', 'futures', 'BTC', 'long', 1, {'status': 'success', 'order_id': '88'}, 100)
+        await server.push({'stream': 'account.orderUpdate', 'data': {
+            'e': 'orderFill', 's': 'BTC_USDC_PERP', 'S': 'Bid', 'l': '1', 'L': '101', 'i': '88', 't': 2,
+        }})
+        await wait_for(lambda: manager.stats()['fills'] >= 4)
+        await asyncio.sleep(0.1)
+        results.append(("주문 결과와 중복 체결 무시", position.qty == 1.5))
+
+        # 5. XT 주문 결과('BTC')와 스트림 체결('btc_usdt')은 같은 포지션
+        await position_book.record_order(USER_ID, 'xt', 'futures', 'BTC', 'long', 2, {'status': 'success', 'order_id': '99'}, 100)
+        await position_book.record_stream_fill(USER_ID, 'xt', 'futures', 'btc_usdt', 'buy', 1, 100, order_id='100', trade_id='100:1')
+        xt_positions = await position_book.open_positions(USER_ID, 'xt')
+        results.append(("XT 주문·스트림 체결 같은 포지션", len(xt_positions) == 1 and xt_positions[0].qty == 3))
+
+        # 6. 주문 결과는 입력 수량이 아니라 실제로 보낸 수량(내림)·체결 수량으로 반영
+        sent = await position_book.record_order(USER_ID, 'xt', 'spot', 'ETH', 'buy', 1.23456,
+                                                {'status': 'success', 'order_id': '101', 'quantity': 1.234}, 100)
+        filled = await position_book.record_order(USER_ID, 'backpack', 'spot', 'ETH', 'buy', 1.23456,
+                                                  {'status': 'success', 'order_id': '102', 'quantity': 1.234, 'filled_qty': 1.2}, 100)
+        results.append(("보낸 수량·체결 수량으로 반영", sent.qty == 1.234 and filled.qty == 1.2))
+
+        # 7. 재연결 시 listen key 재발급 후 재구독, 계정 종료
+        before = xt.listen_keys
+        await server.drop_connections()
+        renewed = await wait_for(lambda: xt.listen_keys >= before + 2)
+        results.append(("재연결 시 listen key 재발급", renewed))
+        await manager.remove_user(USER_ID, 'xt')
+        results.append(("계정 스트림 종료", manager.stats()['accounts'] == 1))
+
+        # 8. 최대 계정 수를 넘으면 가장 오래 안 쓴 계정부터 종료 (ensure는 바로 반환)
+        manager.max_accounts = 1
+        other = FakeTrader('xt')
+        other.api_key = 'test-xt-2'
+        manager.ensure(USER_ID + 1, other)
+        evicted = list(manager.accounts) == [('xt', other.api_key)]
+        closed = await wait_for(lambda: len(server.connections) <= 2)
+        results.append(("최대 계정 수 초과 시 오래된 계정 종료", evicted and closed))
+    finally:
+        await manager.stop()
+        await server.stop()
+        user_store.close()
+    return results
+
+
+def main():
+    print("🚀 user_stream.py 개인 스트림 테스트")
+    print("=" * 50)
+    db_dir = tempfile.mkdtemp(prefix='test_user_stream_')
+    user_store.path = os.path.join(db_dir, 'test.db')
+    try:
+        results = asyncio.run(run_tests())
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+    failed = [name for name, ok in results if not ok]
+    print("=" * 50)
+    if failed:
+        print(f"⚠️ {len(failed)}개 테스트 실패")
+        sys.exit(1)
+    print("🎉 모든 테스트 성공!")
+
+
+if __name__ == "__main__":
+    main()
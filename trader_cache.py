@@ -0,0 +1,77 @@
+"""
+사용자별 트레이더 인스턴스 캐시
+
+(user_id, exchange) 키로 준비된 UnifiedFuturesTrader 객체를 보관하여
+버튼을 누를 때마다 DB 조회, 객체 생성, 키 파싱을 반복하지 않도록 합니다.
+LRU 순서로 최대 개수를 제한하고, 항목마다 TTL이 지나면 다시 생성합니다.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TraderCache:
+    """LRU + TTL 트레이더 캐시"""
+
+    def __init__(self, max_size=1000, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, exchange):
+        """캐시된 트레이더 반환 (없거나 만료되면 None)"""
+        key = (user_id, exchange)
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        trader, expires_at = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return trader
+
+    def put(self, user_id, exchange, trader):
+        """트레이더 저장 (최대 개수를 넘으면 가장 오래 안 쓴 항목부터 제거)"""
+        key = (user_id, exchange)
+        self._items[key] = (trader, time.monotonic() + self.ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id, exchange=None):
+        """사용자의 캐시 항목 제거 (exchange가 없으면 전체 거래소)"""
+        if exchange is not None:
+            self._items.pop((user_id, exchange), None)
+            return
+        for key in [k for k in self._items if k[0] == user_id]:
+            del self._items[key]
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self):
+        """캐시 통계"""
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+trader_cache = TraderCache(
+    max_size=int(os.getenv('TRADER_CACHE_MAX_SIZE', '1000')),
+    ttl=float(os.getenv('TRADER_CACHE_TTL', '600'))
+)
@@ -0,0 +1,121 @@
+"""
+사용자별 순차 / 사용자 간 병렬 업데이트 처리
+
+python-telegram-bot의 BaseUpdateProcessor로 연결됩니다.
+ - 같은 사용자의 업데이트는 도착 순서대로 하나씩 처리 (user_data의 거래 흐름 상태 보호)
+ - 다른 사용자의 업데이트는 max_concurrent_updates까지 동시에 처리
+ - 사용자별 대기 중인 업데이트 수와 대기 시간 기록
+사용자 락을 먼저 잡고 전체 세마포어를 잡으므로, 앞 업데이트를 기다리는 동안
+다른 사용자의 처리 슬롯을 차지하지 않습니다.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import UPDATE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update):
+    """업데이트의 사용자 ID (없으면 채팅 ID, 둘 다 없으면 None)"""
+    user = getattr(update, 'effective_user', None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, 'effective_chat', None)
+    if chat is not None:
+        return chat.id
+    return None
+
+
+class UserUpdateProcessor(BaseUpdateProcessor):
+    """user_id 단위로 직렬화하는 업데이트 처리기"""
+
+    def __init__(self, max_concurrent_updates=32, max_tracked_users=10000):
+        super().__init__(max_concurrent_updates)
+        self.max_tracked_users = max_tracked_users
+        self._locks = {}
+        self._pending = {}
+        self._user_stats = OrderedDict()
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def process_update(self, update, coroutine):
+        user_id = update_user_id(update)
+        if user_id is None:
+            await super().process_update(update, coroutine)
+            return
+
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        queued_at = time.monotonic()
+        try:
+            async with lock:
+                self._record_wait(user_id, time.monotonic() - queued_at)
+                await super().process_update(update, coroutine)
+        finally:
+            remaining = self._pending[user_id] - 1
+            if remaining:
+                self._pending[user_id] = remaining
+            else:
+                del self._pending[user_id]
+                del self._locks[user_id]
+
+    async def do_process_update(self, update, coroutine):
+        started = time.perf_counter()
+        try:
+            await coroutine
+        finally:
+            UPDATE_LATENCY.observe(time.perf_counter() - started)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _record_wait(self, user_id, wait):
+        self.processed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        stats = self._user_stats.pop(user_id, None) or {'processed': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+        stats['processed'] += 1
+        stats['total_wait'] += wait
+        stats['max_wait'] = max(stats['max_wait'], wait)
+        self._user_stats[user_id] = stats
+        if len(self._user_stats) > self.max_tracked_users:
+            self._user_stats.popitem(last=False)
+
+    def queue_depth(self, user_id=None):
+        """대기+처리 중인 업데이트 수 (user_id를 주면 해당 사용자만)"""
+        if user_id is not None:
+            return self._pending.get(user_id, 0)
+        return sum(self._pending.values())
+
+    def user_stats(self, user_id):
+        """사용자별 처리 수, 평균/최대 대기 시간"""
+        stats = self._user_stats.get(user_id)
+        if stats is None:
+            return None
+        return {
+            'processed': stats['processed'],
+            'avg_wait': stats['total_wait'] / stats['processed'],
+            'max_wait': stats['max_wait'],
+            'queue_depth': self.queue_depth(user_id),
+        }
+
+    def stats(self):
+        return {
+            'active_users': len(self._pending),
+            'queue_depth': self.queue_depth(),
+            'processed': self.processed,
+            'avg_wait': self.total_wait / self.processed if self.processed else 0.0,
+            'max_wait': self.max_wait,
+        }
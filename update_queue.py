@@ -0,0 +1,103 @@
+"""
+웹훅 업데이트 큐
+
+웹훅 HTTP 핸들러는 받은 업데이트를 큐에 넣고 바로 응답하고,
+이벤트 루프의 디스패처가 큐에서 꺼낸 순서대로 업데이트마다 처리 태스크를 띄웁니다.
+ - 같은 사용자 업데이트의 순서와 전체 동시 처리 수(MAX_CONCURRENT_UPDATES)는
+   application.update_processor(UserUpdateProcessor)가 보장
+   (태스크는 꺼낸 순서대로 사용자 잠금을 기다리므로 순서 유지)
+ - 느린 사용자 업데이트가 다른 사용자 업데이트를 막지 않음
+ - 대기 + 처리 중인 업데이트가 max_size개면 새 업데이트는 거절 (웹훅은 503 응답)
+"""
+
+import asyncio
+import logging
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_key(data):
+    """원본 업데이트 dict에서 순서 보장용 키(사용자 ID) 추출"""
+    for value in data.values():
+        if isinstance(value, dict):
+            sender = value.get('from') or value.get('user')
+            if isinstance(sender, dict) and 'id' in sender:
+                return sender['id']
+            chat = value.get('chat')
+            if isinstance(chat, dict) and 'id' in chat:
+                return chat['id']
+    return data.get('update_id', 0)
+
+
+class UpdateQueue:
+    """웹훅 업데이트 큐 + 디스패처"""
+
+    def __init__(self, application, max_size=1000):
+        self.application = application
+        self.max_size = max_size
+        self.loop = None
+        self._queue = None
+        self._task = None
+        self._active = set()
+        self.received = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self):
+        """디스패처 시작 (이벤트 루프 안에서 호출)"""
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._dispatch())
+        logger.info(f"웹훅 업데이트 큐 시작 (최대 {self.max_size}개)")
+
+    async def stop(self):
+        """남은 업데이트를 처리한 뒤 디스패처 종료"""
+        if self._queue is not None:
+            await self._queue.join()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def depth(self):
+        """대기 + 처리 중인 업데이트 수"""
+        return (self._queue.qsize() if self._queue is not None else 0) + len(self._active)
+
+    async def put(self, data):
+        """업데이트를 큐에 넣음 (가득 차면 False)"""
+        if self.depth() >= self.max_size:
+            self.rejected += 1
+            return False
+        self._queue.put_nowait(data)
+        self.received += 1
+        return True
+
+    def submit_threadsafe(self, data, timeout=2.0):
+        """다른 스레드(Flask)에서 업데이트 제출"""
+        if self.loop is None:
+            return False
+        future = asyncio.run_coroutine_threadsafe(self.put(data), self.loop)
+        return future.result(timeout)
+
+    async def _dispatch(self):
+        while True:
+            data = await self._queue.get()
+            task = asyncio.ensure_future(self._process(data))
+            self._active.add(task)
+            task.add_done_callback(self._active.discard)
+
+    async def _process(self, data):
+        try:
+            update = Update.de_json(data, self.application.bot)
+            await self.application.update_processor.process_update(
+                update, self.application.process_update(update)
+            )
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Update processing error: {e}")
+        finally:
+            self._queue.task_done()
@@ -0,0 +1,331 @@
+"""
+user_apis.db 저장소
+
+프로세스 전체에서 SQLite 커넥션 하나를 유지하고(WAL 모드),
+모든 쿼리를 전용 DB 스레드에서 실행하여 비동기 핸들러가
+이벤트 루프를 막지 않도록 합니다.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import DB_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# 거래소별 (API 키 컬럼, 시크릿 컬럼)
+API_KEY_COLUMNS = {
+    'xt': ('xt_api_key', 'xt_api_secret'),
+    'backpack': ('backpack_api_key', 'backpack_private_key'),
+}
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS user_api_keys (
+        user_id INTEGER PRIMARY KEY,
+        xt_api_key TEXT,
+        xt_api_secret TEXT,
+        backpack_api_key TEXT,
+        backpack_private_key TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_leverage_settings (
+        user_id INTEGER,
+        exchange TEXT,
+        symbol TEXT,
+        direction TEXT,
+        leverage INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, exchange, symbol, direction)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_positions (
+        user_id INTEGER,
+        exchange TEXT,
+        market_type TEXT,
+        symbol TEXT,
+        qty REAL,
+        avg_price REAL,
+        realized_pnl REAL,
+        last_price REAL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, exchange, market_type, symbol)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_flow_state (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+)
+
+# 거래소별 API 키 저장 쿼리 (미리 만들어 두고 sqlite3 문장 캐시를 재사용)
+SAVE_API_KEYS_SQL = {
+    exchange: f'''
+        INSERT INTO user_api_keys (user_id, {key_col}, {secret_col}, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id) DO UPDATE SET
+            {key_col} = excluded.{key_col},
+            {secret_col} = excluded.{secret_col},
+            updated_at = CURRENT_TIMESTAMP
+    '''
+    for exchange, (key_col, secret_col) in API_KEY_COLUMNS.items()
+}
+
+GET_API_KEYS_SQL = '''
+    SELECT xt_api_key, xt_api_secret, backpack_api_key, backpack_private_key
+    FROM user_api_keys WHERE user_id = ?
+'''
+
+GET_SECRET_ROWS_SQL = '''
+    SELECT user_id, xt_api_secret, backpack_private_key FROM user_api_keys
+    WHERE user_id > ? ORDER BY user_id LIMIT ?
+'''
+
+# 읽은 뒤 다른 곳에서 키가 바뀐 행은 덮어쓰지 않음
+UPDATE_SECRET_SQL = '''
+    UPDATE user_api_keys SET xt_api_secret = ?, backpack_private_key = ?
+    WHERE user_id = ? AND xt_api_secret IS ? AND backpack_private_key IS ?
+'''
+
+SET_LEVERAGE_SQL = '''
+    INSERT INTO user_leverage_settings (user_id, exchange, symbol, direction, leverage, updated_at)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, exchange, symbol, direction) DO UPDATE SET
+        leverage = excluded.leverage,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+GET_LEVERAGE_SQL = '''
+    SELECT leverage FROM user_leverage_settings
+    WHERE user_id = ? AND exchange = ? AND symbol = ? AND direction = ?
+'''
+
+GET_LEVERAGE_SETTINGS_SQL = '''
+    SELECT exchange, symbol, direction, leverage FROM user_leverage_settings
+    WHERE user_id = ?
+'''
+
+SAVE_POSITION_SQL = '''
+    INSERT INTO user_positions (user_id, exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, exchange, market_type, symbol) DO UPDATE SET
+        qty = excluded.qty,
+        avg_price = excluded.avg_price,
+        realized_pnl = excluded.realized_pnl,
+        last_price = excluded.last_price,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+GET_POSITIONS_SQL = '''
+    SELECT exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price, strftime('%s', updated_at)
+    FROM user_positions WHERE user_id = ?
+'''
+
+SAVE_FLOW_STATE_SQL = '''
+    INSERT INTO user_flow_state (user_id, data, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id) DO UPDATE SET
+        data = excluded.data,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+DELETE_FLOW_STATE_SQL = 'DELETE FROM user_flow_state WHERE user_id = ?'
+
+GET_FLOW_STATES_SQL = '''
+    SELECT user_id, data FROM user_flow_state
+    WHERE updated_at >= datetime(?, 'unixepoch')
+'''
+
+
+class UserApiStore:
+    """user_apis.db 커넥션 관리자"""
+
+    def __init__(self, path='user_apis.db'):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-db')
+
+    def _connection(self):
+        """커넥션 반환 (최초 호출 시 연결 및 PRAGMA 설정)"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._conn = conn
+        return self._conn
+
+    def execute(self, fn, *args):
+        """현재 스레드에서 fn(conn, *args) 실행 (시작 시 초기화 등 동기 코드용)"""
+        with self._lock:
+            return fn(self._connection(), *args)
+
+    async def run(self, fn, *args):
+        """DB 스레드에서 fn(conn, *args) 실행"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, self.execute, fn, *args)
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - started, fn.__name__)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --------- 스키마 ---------
+    def init_schema(self):
+        """테이블 생성"""
+        self.execute(_init_schema)
+
+    # --------- user_api_keys ---------
+    async def save_api_keys(self, user_id, exchange, api_key, api_secret):
+        """거래소 API 키 저장 (다른 거래소 키는 유지)"""
+        if exchange not in API_KEY_COLUMNS:
+            raise ValueError(f'지원하지 않는 거래소입니다: {exchange}')
+        await self.run(_save_api_keys, user_id, exchange, api_key, api_secret)
+
+    async def get_api_keys(self, user_id):
+        """사용자 API 키 조회 (없으면 None)"""
+        return await self.run(_get_api_keys, user_id)
+
+    async def get_secret_rows(self, after_user_id, limit):
+        """재암호화용 (user_id, xt_api_secret, backpack_private_key) 행 (user_id 순 페이지)"""
+        return await self.run(_get_secret_rows, after_user_id, limit)
+
+    async def update_secret_rows(self, updates):
+        """[(user_id, [새 값...], [이전 값...])] 반영, 실제로 바뀐 행 수 반환"""
+        return await self.run(_update_secret_rows, updates)
+
+    # --------- user_leverage_settings ---------
+    async def set_leverage(self, user_id, exchange, symbol, direction, leverage):
+        """레버리지 설정 저장"""
+        await self.run(_set_leverage, user_id, exchange, symbol, direction, int(leverage))
+
+    async def get_leverage(self, user_id, exchange, symbol, direction):
+        """레버리지 설정 조회 (없으면 None)"""
+        return await self.run(_get_leverage, user_id, exchange, symbol, direction)
+
+    async def get_leverage_settings(self, user_id):
+        """사용자의 전체 레버리지 설정 {(exchange, symbol, direction): leverage}"""
+        return await self.run(_get_leverage_settings, user_id)
+
+    # --------- user_flow_state ---------
+    async def get_flow_states(self, since):
+        """since(unix 초) 이후 갱신된 흐름 상태 [(user_id, JSON 문자열)]"""
+        return await self.run(_get_flow_states, since)
+
+    async def write_flow_state(self, flow_rows, leverage_rows=()):
+        """흐름 상태(data가 None이면 삭제)와 레버리지 설정을 한 트랜잭션으로 기록"""
+        await self.run(_write_flow_state, flow_rows, leverage_rows)
+
+    # --------- user_positions ---------
+    async def save_position(self, user_id, exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price):
+        """포지션 저장 (수량 0이어도 실현 손익 보존을 위해 유지)"""
+        await self.run(_save_position, user_id, exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price)
+
+    async def get_positions(self, user_id):
+        """사용자 포지션 행 목록 [(exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price, updated_at)]"""
+        return await self.run(_get_positions, user_id)
+
+
+def _init_schema(conn):
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+
+def _save_api_keys(conn, user_id, exchange, api_key, api_secret):
+    with conn:
+        conn.execute(SAVE_API_KEYS_SQL[exchange], (user_id, api_key, api_secret))
+
+
+def _get_api_keys(conn, user_id):
+    row = conn.execute(GET_API_KEYS_SQL, (user_id,)).fetchone()
+    if row is None:
+        return None
+    return {
+        'xt_api_key': row[0],
+        'xt_api_secret': row[1],
+        'backpack_api_key': row[2],
+        'backpack_private_key': row[3]
+    }
+
+
+def _get_secret_rows(conn, after_user_id, limit):
+    after = after_user_id if after_user_id is not None else -(1 << 63)
+    return conn.execute(GET_SECRET_ROWS_SQL, (after, limit)).fetchall()
+
+
+def _update_secret_rows(conn, updates):
+    changed = 0
+    with conn:
+        for user_id, (xt_secret, backpack_key), (old_xt_secret, old_backpack_key) in updates:
+            cursor = conn.execute(UPDATE_SECRET_SQL, (xt_secret, backpack_key, user_id, old_xt_secret, old_backpack_key))
+            changed += cursor.rowcount
+    return changed
+
+
+def _set_leverage(conn, user_id, exchange, symbol, direction, leverage):
+    with conn:
+        conn.execute(SET_LEVERAGE_SQL, (user_id, exchange, symbol, direction, leverage))
+
+
+def _get_leverage(conn, user_id, exchange, symbol, direction):
+    row = conn.execute(GET_LEVERAGE_SQL, (user_id, exchange, symbol, direction)).fetchone()
+    return row[0] if row else None
+
+
+def _get_leverage_settings(conn, user_id):
+    rows = conn.execute(GET_LEVERAGE_SETTINGS_SQL, (user_id,)).fetchall()
+    return {(exchange, symbol, direction): leverage for exchange, symbol, direction, leverage in rows}
+
+
+
+def _get_flow_states(conn, since):
+    return conn.execute(GET_FLOW_STATES_SQL, (int(since),)).fetchall()
+
+
+def _write_flow_state(conn, flow_rows, leverage_rows):
+    with conn:
+        conn.executemany(SAVE_FLOW_STATE_SQL, [row for row in flow_rows if row[1] is not None])
+        conn.executemany(DELETE_FLOW_STATE_SQL, [(user_id,) for user_id, data in flow_rows if data is None])
+        if leverage_rows:
+            conn.executemany(SET_LEVERAGE_SQL, leverage_rows)
+
+
+def _save_position(conn, user_id, exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price):
+    with conn:
+        conn.execute(SAVE_POSITION_SQL, (user_id, exchange, market_type, symbol, qty, avg_price, realized_pnl, last_price))
+
+
+def _get_positions(conn, user_id):
+    rows = conn.execute(GET_POSITIONS_SQL, (user_id,)).fetchall()
+    return [row[:7] + (float(row[7]) if row[7] else None,) for row in rows]
+
+
+user_store = UserApiStore(os.getenv('USER_DB_PATH', 'user_apis.db'))
@@ -0,0 +1,364 @@
+"""
+거래소 개인(사용자) WebSocket 스트림
+
+API 키가 설정된 사용자 계정마다 인증된 개인 스트림을 유지하고, 주문 상태·체결·잔고 변경을
+계정별 메모리 상태(AccountState)에 반영합니다. UnifiedFuturesTrader.get_spot_balance /
+get_futures_balance는 스트림이 연결되어 있는 동안 여기 잔고를 바로 반환합니다.
+
+ - XT: listen key(스팟 ws-token, 선물 listen-key)를 발급받아 구독, 재연결할 때마다 다시 발급
+ - Backpack: 'subscribe' 명령을 Ed25519로 서명해 구독 (스팟·선물이 한 연결)
+ - 계정 하나의 주문·체결·잔고 토픽은 연결 하나로 모아서 구독 (XT는 스팟/선물 호스트가 달라 2개)
+   개인 스트림 메시지에는 계정 식별자가 없어서 여러 계정을 한 연결에 섞지는 않습니다.
+ - 최근에 사용한 계정만 유지: USER_STREAM_MAX개를 넘으면 가장 오래 안 쓴 계정부터,
+   USER_STREAM_IDLE초 동안 쓰지 않으면 연결 종료
+ - 체결은 position_book에 순서대로 반영 (주문 결과로 이미 반영한 주문은 건너뜀)
+ - Backpack은 잔고 스트림이 없어서 주문 이벤트(접수·취소·체결 등)가 오면 캐시된 잔고를 버리고
+   다음 조회 때 REST로 한 번 다시 채움 (미체결 주문에 묶인 금액이 바로 반영되도록)
+
+환경 변수:
+    USER_STREAM_ENABLED            개인 스트림 사용 여부 (기본 1)
+    USER_STREAM_MAX                동시에 유지할 계정 수 (기본 500)
+    USER_STREAM_IDLE               미사용 계정 연결 종료 시간(초, 기본 1800)
+    USER_STREAM_BALANCE_MAX_AGE    스트림 잔고를 그대로 쓸 최대 시간(초, 기본 300)
+    XT_SPOT_USER_WS_URL, XT_FUTURES_USER_WS_URL, BACKPACK_WS_URL
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from decimal import Decimal, InvalidOperation
+
+from market_stream import WEBSOCKETS_AVAILABLE, StreamConnection
+from position_book import position_book
+from symbol_registry import symbol_registry
+
+logger = logging.getLogger(__name__)
+
+USER_STREAM_URLS = {
+    ('xt', 'spot'): os.getenv('XT_SPOT_USER_WS_URL', 'wss://stream.xt.com/private'),
+    ('xt', 'futures'): os.getenv('XT_FUTURES_USER_WS_URL', 'wss://fstream.xt.com/ws/user'),
+    ('backpack', None): os.getenv('BACKPACK_WS_URL', 'wss://ws.backpack.exchange'),
+}
+USER_STREAM_MAX = int(os.getenv('USER_STREAM_MAX', '500'))
+USER_STREAM_IDLE = float(os.getenv('USER_STREAM_IDLE', '1800'))
+BALANCE_MAX_AGE = float(os.getenv('USER_STREAM_BALANCE_MAX_AGE', '300'))
+
+
+def _pick(data, *keys):
+    """처음으로 값이 있는 키의 값"""
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _merge_asset(balance, currency, values):
+    """잔고 스냅샷(REST 응답 형태)에 자산 하나의 변경 반영"""
+    if isinstance(balance, dict) and isinstance(balance.get('assets'), list):
+        balance = balance['assets']
+    if isinstance(balance, list):
+        for item in balance:
+            if str(_pick(item, 'currency', 'coin', 'asset') or '').lower() == currency:
+                item.update(values)
+                return
+        balance.append({'currency': currency, **values})
+    elif isinstance(balance, dict):
+        balance.update(values)
+
+
+class AccountState:
+    """계정 하나의 스트림 상태 (잔고, 최근 주문·체결)"""
+
+    def __init__(self, user_id, exchange, max_orders=200, max_fills=200):
+        self.user_id = user_id
+        self.exchange = exchange
+        self.balances = {}
+        self.orders = OrderedDict()
+        self.max_orders = max_orders
+        self.fills = deque(maxlen=max_fills)
+        self.pending_fills = deque()
+        self.fill_task = None
+        self.connections = []
+        self.last_used = time.monotonic()
+
+    @property
+    def live(self):
+        return bool(self.connections) and all(c.connected.is_set() for c in self.connections)
+
+    def balance(self, market_type, max_age):
+        """스트림이 연결되어 있고 max_age초 안에 채운 잔고 (없으면 None)"""
+        entry = self.balances.get(market_type)
+        if entry is None or not self.live or time.monotonic() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+    def set_balance(self, market_type, balance):
+        self.balances[market_type] = (balance, time.monotonic())
+
+    def apply_balance(self, market_type, currency, values):
+        """잔고 변경 메시지 반영 (스냅샷이 없으면 다음 REST 조회 때 채움)"""
+        entry = self.balances.get(market_type)
+        if entry is None:
+            return
+        _merge_asset(entry[0], currency, values)
+        self.balances[market_type] = (entry[0], time.monotonic())
+
+    def invalidate_balances(self):
+        self.balances.clear()
+
+    def apply_order(self, order_id, data):
+        if order_id is None:
+            return
+        self.orders.pop(order_id, None)
+        self.orders[order_id] = data
+        if len(self.orders) > self.max_orders:
+            self.orders.popitem(last=False)
+
+
+class UserStreamConnection(StreamConnection):
+    """계정 하나의 개인 스트림 연결"""
+
+    label = '개인 스트림'
+    private_topics = ()
+
+    def __init__(self, manager, url, account, trader, market_type=None):
+        super().__init__(manager, url)
+        self.account = account
+        self.trader = trader
+        self.market_type = market_type
+
+    def start(self):
+        self.topics.update(self.private_topics)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+
+class XtUserConnection(UserStreamConnection):
+    """XT 개인 스트림 (listen key 구독)"""
+
+    exchange = 'xt'
+    app_ping_interval = 15
+    private_topics = ('balance', 'order', 'trade')
+
+    def __init__(self, manager, url, account, trader, market_type):
+        super().__init__(manager, url, account, trader, market_type)
+        self.listen_key = None
+        self._next_id = 0
+
+    async def prepare(self):
+        self.listen_key = await self.trader.get_listen_key(self.market_type)
+        return self.url
+
+    def subscribe_message(self, topics):
+        self._next_id += 1
+        if self.market_type == 'spot':
+            return {'method': 'subscribe', 'params': topics, 'listenKey': self.listen_key, 'id': str(self._next_id)}
+        return {'method': 'SUBSCRIBE', 'params': [f"{topic}@{self.listen_key}" for topic in topics], 'id': str(self._next_id)}
+
+    def handle(self, message):
+        topic = str(message.get('topic') or '').split('@')[0]
+        data = message.get('data')
+        if not isinstance(data, dict):
+            return
+        if topic == 'balance':
+            currency = str(_pick(data, 'a', 'coin', 'currency') or '').lower()
+            if self.market_type == 'spot':
+                total, frozen = data.get('t'), data.get('f')
+                values = {'totalAmount': total, 'frozenAmount': frozen}
+                try:
+                    values['availableAmount'] = str(Decimal(str(total)) - Decimal(str(frozen)))
+                except (InvalidOperation, TypeError):
+                    pass
+            else:
+                values = {k: v for k, v in data.items() if k not in ('coin', 'underlyingType')}
+            self.account.apply_balance(self.market_type, currency, values)
+        elif topic == 'order':
+            self.account.apply_order(_pick(data, 'i', 'orderId'), data)
+        elif topic == 'trade':
+            order_id = _pick(data, 'i', 'orderId')
+            side = str(_pick(data, 'sd', 'orderSide', 'side') or '').lower()
+            if not side and 'b' in data:
+                side = 'buy' if data['b'] else 'sell'
+            self.manager.queue_fill(self.account, {
+                'symbol': symbol_registry.book_symbol('xt', self.market_type, str(_pick(data, 's', 'symbol') or '')),
+                'market_type': self.market_type,
+                'side': side,
+                'qty': _pick(data, 'q', 'quantity', 'executedQty'),
+                'price': _pick(data, 'p', 'price'),
+                'fee': _pick(data, 'fee', 'n') or 0,
+                'order_id': order_id,
+                'trade_id': _pick(data, 'tradeId', 'ti') or f"{order_id}:{_pick(data, 't', 'timestamp')}",
+            })
+
+
+class BackpackUserConnection(UserStreamConnection):
+    """Backpack 개인 스트림 (서명된 구독, 스팟·선물 공용)"""
+
+    exchange = 'backpack'
+    private_topics = ('account.orderUpdate',)
+
+    def subscribe_message(self, topics):
+        signer = self.trader.adapter.signer
+        signature, timestamp = signer.sign('subscribe')
+        return {
+            'method': 'SUBSCRIBE',
+            'params': topics,
+            'signature': [signer.api_key, signature, str(timestamp), str(signer.window)],
+        }
+
+    def handle(self, message):
+        stream = message.get('stream') or ''
+        data = message.get('data')
+        if not stream.startswith('account.orderUpdate') or not isinstance(data, dict):
+            return
+        self.account.apply_order(data.get('i'), data)
+        # 주문 접수·취소도 사용 가능 잔고를 바꾸므로 모든 주문 이벤트에서 잔고 캐시를 버림
+        self.account.invalidate_balances()
+        if data.get('e') != 'orderFill':
+            return
+        native = str(data.get('s') or '')
+        market_type = 'futures' if native.upper().endswith('_PERP') else 'spot'
+        fee = data.get('n') if str(data.get('N') or '').upper() == 'USDC' else 0
+        self.manager.queue_fill(self.account, {
+            'symbol': symbol_registry.book_symbol('backpack', market_type, native),
+            'market_type': market_type,
+            'side': 'buy' if data.get('S') == 'Bid' else 'sell',
+            'qty': data.get('l'),
+            'price': data.get('L'),
+            'fee': fee or 0,
+            'order_id': data.get('i'),
+            'trade_id': data.get('t'),
+        })
+
+
+class UserStreamManager:
+    """계정별 개인 스트림과 상태 캐시 관리자"""
+
+    def __init__(self, urls=None, max_accounts=USER_STREAM_MAX, idle_timeout=USER_STREAM_IDLE, balance_max_age=BALANCE_MAX_AGE):
+        self.urls = dict(USER_STREAM_URLS)
+        if urls:
+            self.urls.update(urls)
+        self.max_accounts = max_accounts
+        self.idle_timeout = idle_timeout
+        self.balance_max_age = balance_max_age
+        self.running = False
+        self.accounts = OrderedDict()
+        self.fills = 0
+        self._reaper = None
+
+    def start(self):
+        """스트림 사용 시작 (계정 연결은 ensure() 호출 시)"""
+        if not WEBSOCKETS_AVAILABLE:
+            logger.warning("websockets 라이브러리가 없어 개인 스트림을 사용하지 않습니다.")
+            return
+        self.running = True
+        if self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._reap_idle())
+
+    async def stop(self):
+        self.running = False
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        for key in list(self.accounts):
+            await self.close_account(key)
+
+    def ensure(self, user_id, trader):
+        """계정 개인 스트림 보장 (이벤트 루프 안에서 호출, 이미 있으면 사용 시각만 갱신)"""
+        if not self.running or not getattr(trader, 'api_key', None):
+            return
+        key = (trader.exchange, trader.api_key)
+        account = self.accounts.get(key)
+        if account is not None:
+            account.last_used = time.monotonic()
+            self.accounts.move_to_end(key)
+            return
+        account = self.accounts[key] = AccountState(user_id, trader.exchange)
+        if trader.exchange == 'xt':
+            account.connections = [
+                XtUserConnection(self, self.urls[('xt', market_type)], account, trader, market_type)
+                for market_type in ('spot', 'futures')
+            ]
+        elif trader.exchange == 'backpack':
+            account.connections = [BackpackUserConnection(self, self.urls[('backpack', None)], account, trader)]
+        for connection in account.connections:
+            connection.start()
+        while len(self.accounts) > self.max_accounts:
+            # 목록에서는 바로 빼고 연결 종료만 예약 (종료 태스크가 돌기 전에도 개수가 줄어야 함)
+            _, oldest = self.accounts.popitem(last=False)
+            asyncio.ensure_future(self._close_connections(oldest))
+
+    async def close_account(self, key):
+        account = self.accounts.pop(key, None)
+        if account is not None:
+            await self._close_connections(account)
+
+    async def _close_connections(self, account):
+        for connection in account.connections:
+            await connection.close()
+
+    async def remove_user(self, user_id, exchange=None):
+        """사용자 계정 스트림 종료 (API 키 변경 시)"""
+        for key, account in list(self.accounts.items()):
+            if account.user_id == user_id and (exchange is None or key[0] == exchange):
+                await self.close_account(key)
+
+    def balance(self, exchange, api_key, market_type):
+        """스트림으로 최신 상태가 유지되는 잔고 (없으면 None → REST 조회)"""
+        account = self.accounts.get((exchange, api_key))
+        if account is None:
+            return None
+        return account.balance(market_type, self.balance_max_age)
+
+    def store_balance(self, exchange, api_key, market_type, balance):
+        """REST로 받은 잔고를 스트림 변경의 기준 스냅샷으로 저장"""
+        account = self.accounts.get((exchange, api_key))
+        if account is not None:
+            account.set_balance(market_type, balance)
+
+    def orders(self, exchange, api_key):
+        """최근 주문 상태 {order_id: 메시지}"""
+        account = self.accounts.get((exchange, api_key))
+        return dict(account.orders) if account is not None else {}
+
+    def queue_fill(self, account, fill):
+        """체결을 계정별 순서대로 포지션 장부에 반영"""
+        account.fills.append(fill)
+        account.pending_fills.append(fill)
+        self.fills += 1
+        if account.fill_task is None or account.fill_task.done():
+            account.fill_task = asyncio.ensure_future(self._drain_fills(account))
+
+    async def _drain_fills(self, account):
+        while account.pending_fills:
+            fill = account.pending_fills.popleft()
+            try:
+                await position_book.record_stream_fill(
+                    account.user_id, account.exchange, fill['market_type'], fill['symbol'], fill['side'],
+                    fill['qty'], fill['price'], fill['fee'], fill['order_id'], fill['trade_id'])
+            except Exception as e:
+                logger.error(f"{account.exchange} 체결 반영 실패: {e}")
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 4, 60))
+            cutoff = time.monotonic() - self.idle_timeout
+            for key, account in list(self.accounts.items()):
+                if account.last_used < cutoff:
+                    logger.info(f"{key[0]} 개인 스트림 종료 (사용자 {account.user_id} 미사용)")
+                    await self.close_account(key)
+
+    def stats(self):
+        return {
+            'accounts': len(self.accounts),
+            'live': sum(1 for a in self.accounts.values() if a.live),
+            'connections': sum(len(a.connections) for a in self.accounts.values()),
+            'fills': self.fills,
+        }
+
+
+user_stream = UserStreamManager()
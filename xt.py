@@ -8,10 +8,11 @@ XT.com 통합 예제
 
 import time
 import logging
-import requests
+import http_client
 import hmac
 import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # pyxt 라이브러리 임포트 시도
@@ -85,9 +86,11 @@ class XTClient:
         if not PYXTLIB_AVAILABLE:
             return {"error": "pyxt library not available"}
         try:
-            spot_bal = self.spot_balance()
-            perp_bal = self.futures_balance()
-            return {"spot": spot_bal, "futures": perp_bal}
+            # 현물·선물 잔고를 동시에 조회
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                spot_future = executor.submit(self.spot_balance)
+                perp_future = executor.submit(self.futures_balance)
+                return {"spot": spot_future.result(), "futures": perp_future.result()}
         except Exception as e:
             return {"error": f"All balances error: {e}"}
 
@@ -193,7 +196,7 @@ class ManualXTAPITester:
                     print(f"  🔍 시도: {endpoint}")
                     print(f"    서명: {sig_data['sign_string']}")
                     
-                    response = requests.get(url, headers=headers, timeout=10)
+                    response = http_client.get_session(base_url).get(url, headers=headers, timeout=10)
                     print(f"    상태: {response.status_code}")
                     
                     if response.status_code == 200: